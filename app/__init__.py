@@ -1,11 +1,16 @@
 from flask import Flask
+from config import BROWSER_PREWARM
 from core.tracker import init_db
+from core.retention import start_retention_worker
+from core.outbox import start_outbox_sender
+from core.mail_ingest import start_mail_ingest_worker
 from app.routes.dashboard import dashboard_bp
 from app.routes.profile import profile_bp
 from app.routes.brokers import brokers_bp
 from app.routes.requests import requests_bp
 from app.routes.runner import runner_bp
 from app.routes.report import report_bp
+from app.routes.export import export_bp
 
 
 def create_app():
@@ -14,6 +19,14 @@ def create_app():
 
     # Init DB on startup
     init_db()
+    start_retention_worker()
+    start_outbox_sender()
+    start_mail_ingest_worker()
+    if BROWSER_PREWARM:
+        from brokers.handlers.browser_pool import get_browser_pool
+        pool = get_browser_pool()
+        if pool:
+            pool.prewarm()
 
     # Register blueprints
     app.register_blueprint(dashboard_bp)
@@ -22,5 +35,6 @@ def create_app():
     app.register_blueprint(requests_bp)
     app.register_blueprint(runner_bp)
     app.register_blueprint(report_bp)
+    app.register_blueprint(export_bp)
 
     return app
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template
 from brokers import load_registry
-from core.tracker import get_latest_per_broker
+from core.tracker import get_latest_per_broker, get_profile, get_exposures
+from brokers.handlers.base import profile_key
 
 brokers_bp = Blueprint("brokers", __name__)
 
@@ -9,6 +10,7 @@ brokers_bp = Blueprint("brokers", __name__)
 def brokers():
     registry = load_registry()
     latest = {r["broker_id"]: r for r in get_latest_per_broker()}
+    exposures = get_exposures(profile_key(get_profile()))
 
     enriched = []
     for broker in registry:
@@ -18,6 +20,7 @@ def brokers():
             "last_status": rec["status"] if rec else None,
             "last_submitted": rec["submitted_at"] if rec else None,
             "last_notes": rec["notes"] if rec else None,
+            "exposure": exposures.get(broker["id"]),
         })
 
     return render_template("brokers.html", brokers=enriched)
@@ -1,11 +1,14 @@
 from flask import Blueprint, render_template
-from core.tracker import get_stats, get_profile
+from core.tracker import get_stats, get_profile, get_captcha_totals, get_captcha_stats
 from brokers import load_registry
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 STATUS_ORDER = ["confirmed", "submitted", "manual_required", "error", "pending"]
 
+# Window for the CAPTCHA spend card
+CAPTCHA_DAYS = 30
+
 
 @dashboard_bp.route("/")
 def index():
@@ -27,4 +30,7 @@ def index():
         brokers_remaining=brokers_remaining,
         statuses=statuses,
         recent_runs=recent_runs,
+        captcha_days=CAPTCHA_DAYS,
+        captcha_totals=get_captcha_totals(since_days=CAPTCHA_DAYS),
+        captcha_brokers=get_captcha_stats(since_days=CAPTCHA_DAYS)[:5],
     )
@@ -0,0 +1,18 @@
+from flask import Blueprint, Response, request, stream_with_context, abort
+from core.transfer import export_lines, EXPORT_COLUMNS, FORMATS
+
+export_bp = Blueprint("export", __name__)
+
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@export_bp.route("/export/<table>")
+def export_table(table):
+    fmt = request.args.get("format", "ndjson")
+    if table not in EXPORT_COLUMNS or fmt not in FORMATS:
+        abort(404)
+    return Response(
+        stream_with_context(export_lines(table, fmt)),
+        mimetype=MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={table}.{fmt}"},
+    )
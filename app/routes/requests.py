@@ -1,5 +1,5 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from core.tracker import get_requests, update_request
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from core.tracker import get_requests, update_request, search_run_logs
 
 requests_bp = Blueprint("requests", __name__)
 
@@ -11,22 +11,49 @@ def requests_list():
     status_filter = request.args.get("status")
     broker_filter = request.args.get("broker_id")
     since_filter = request.args.get("since")
+    run_filter = request.args.get("run_id")
+    text_filter = (request.args.get("q") or "").strip()
 
     reqs = get_requests(
         broker_id=broker_filter or None,
         status=status_filter or None,
         since=since_filter or None,
+        run_id=run_filter or None,
+        text=text_filter or None,
     )
+    log_hits = search_run_logs(text_filter, since=since_filter or None) if text_filter else []
     return render_template(
         "requests.html",
         requests=reqs,
+        log_hits=log_hits,
         status_filter=status_filter,
         broker_filter=broker_filter,
         since_filter=since_filter,
+        text_filter=text_filter,
         valid_statuses=VALID_STATUSES,
     )
 
 
+@requests_bp.route("/search")
+def search():
+    """JSON full-text search over request notes and run logs: ?q=&since=&broker_id=&status="""
+    text = (request.args.get("q") or "").strip()
+    if not text:
+        return jsonify({"error": "Missing q parameter."}), 400
+    since = request.args.get("since") or None
+    limit = request.args.get("limit", 50, type=int)
+    reqs = get_requests(
+        broker_id=request.args.get("broker_id") or None,
+        status=request.args.get("status") or None,
+        since=since,
+        text=text,
+    )
+    return jsonify({
+        "requests": reqs[:limit],
+        "run_logs": search_run_logs(text, since=since, limit=limit),
+    })
+
+
 @requests_bp.route("/requests/<int:req_id>/update", methods=["POST"])
 def update_status(req_id):
     new_status = request.form.get("status")
@@ -1,13 +1,17 @@
 """
-Runner route — starts opt-out runs and streams live log via Server-Sent Events.
+Runner route — starts opt-out runs (or read-only exposure scans) and streams
+the live log via Server-Sent Events.
 Single-user app so we use module-level state for simplicity.
 """
 import queue
 import threading
 import json
-from flask import Blueprint, render_template, request, Response, stream_with_context, jsonify
+from flask import Blueprint, render_template, request, Response, stream_with_context, jsonify, abort
 from brokers import load_registry
 from core.engine import run_brokers
+from core.scanner import scan_brokers
+from core.tracker import get_run, iter_run_log
+from brokers.handlers.browser_pool import get_browser_pool
 
 runner_bp = Blueprint("runner", __name__)
 
@@ -19,6 +23,10 @@ _run_in_progress: bool = False
 @runner_bp.route("/run")
 def run_page():
     registry = load_registry()
+    # Someone on this page is about to start a run: get the browser ready
+    pool = get_browser_pool()
+    if pool and not _run_in_progress:
+        pool.prewarm()
     return render_template("runner.html", brokers=registry, in_progress=_run_in_progress)
 
 
@@ -30,6 +38,8 @@ def run_start():
         return jsonify({"error": "A run is already in progress."}), 409
 
     broker_ids = request.form.getlist("broker_ids") or None
+    mode = request.form.get("mode", "optout")
+    only_listed = request.form.get("only_listed") == "1"
     _run_queue = queue.Queue()
     _run_in_progress = True
 
@@ -39,7 +49,11 @@ def run_start():
             def log_callback(msg):
                 _run_queue.put({"msg": msg})
 
-            result = run_brokers(broker_ids=broker_ids, log_callback=log_callback)
+            if mode == "scan":
+                result = scan_brokers(broker_ids=broker_ids, log_callback=log_callback)
+            else:
+                result = run_brokers(broker_ids=broker_ids, log_callback=log_callback,
+                                     only_listed=only_listed)
             _run_queue.put({"msg": "─" * 60, "done": True, "result": result})
         except Exception as exc:
             _run_queue.put({"msg": f"FATAL ERROR: {exc}", "done": True})
@@ -83,3 +97,18 @@ def run_stream():
 @runner_bp.route("/run/status")
 def run_status():
     return jsonify({"in_progress": _run_in_progress})
+
+
+@runner_bp.route("/run/<run_id>/log")
+def run_log(run_id):
+    """Stream a stored run log as plain text. ?start= and ?end= select a line range."""
+    if not get_run(run_id):
+        abort(404)
+    start = request.args.get("start", 0, type=int)
+    end = request.args.get("end", None, type=int)
+
+    def generate():
+        for line in iter_run_log(run_id, max(start, 0), end):
+            yield line + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/plain")
@@ -1,13 +1,61 @@
 import json
+import threading
 from pathlib import Path
+from types import MappingProxyType
 
 REGISTRY_PATH = Path(__file__).parent / "registry.json"
 
 
-def load_registry() -> list:
-    with open(REGISTRY_PATH, encoding="utf-8") as f:
-        return json.load(f)["brokers"]
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
 
 
-def get_broker(broker_id: str) -> dict | None:
-    return next((b for b in load_registry() if b["id"] == broker_id), None)
+class Registry:
+    """
+    Parsed registry.json with lookup indexes. Everything it hands out is
+    read-only, so one instance can be shared by every request and run.
+    """
+
+    def __init__(self, brokers: list, mtime: int):
+        self.mtime = mtime
+        self.brokers = tuple(_freeze(b) for b in brokers)
+        self.by_id = MappingProxyType({b["id"]: b for b in self.brokers})
+
+        by_method, by_handler = {}, {}
+        for b in self.brokers:
+            by_method.setdefault(b.get("method", "manual"), []).append(b)
+            if b.get("handler"):
+                by_handler.setdefault(b["handler"], []).append(b)
+        self.by_method = MappingProxyType({k: tuple(v) for k, v in by_method.items()})
+        self.by_handler = MappingProxyType({k: tuple(v) for k, v in by_handler.items()})
+
+
+_cache: Registry = None
+_lock = threading.Lock()
+
+
+def get_registry() -> Registry:
+    """Return the cached Registry, re-parsing registry.json only when its mtime changes."""
+    global _cache
+    mtime = REGISTRY_PATH.stat().st_mtime_ns
+    cached = _cache
+    if cached is not None and cached.mtime == mtime:
+        return cached
+    with _lock:
+        if _cache is None or _cache.mtime != mtime:
+            with open(REGISTRY_PATH, encoding="utf-8") as f:
+                _cache = Registry(json.load(f)["brokers"], mtime)
+        return _cache
+
+
+def load_registry() -> tuple:
+    return get_registry().brokers
+
+
+def get_broker(broker_id: str):
+    return get_registry().by_id.get(broker_id)
@@ -1,40 +1,329 @@
 """Base class for all broker handlers."""
+import hashlib
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import quote_plus
+import sys
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import BLOCK_RESOURCES, BROWSER_STATE_TTL_HOURS, LISTING_URL_TTL_DAYS
+from core.tracker import (
+    get_browser_state, save_browser_state, delete_browser_state,
+    get_listing_urls, save_listing_url, delete_listing_urls,
+)
 
-def make_stealthy_page(playwright):
+# Resource types never needed to fill and submit an opt-out form
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+
+# Third-party ad / analytics hosts — these keep pages from ever reaching "networkidle"
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "googlesyndication.com", "googleadservices.com", "adservice.google.com",
+    "facebook.net", "facebook.com/tr", "connect.facebook.net", "hotjar.com",
+    "segment.io", "segment.com", "scorecardresearch.com", "quantserve.com",
+    "amazon-adsystem.com", "criteo.com", "criteo.net", "taboola.com",
+    "outbrain.com", "adnxs.com", "clarity.ms", "nr-data.net", "newrelic.com",
+    "mixpanel.com", "fullstory.com", "pubmatic.com", "rubiconproject.com",
+)
+
+# Captcha and challenge providers always load, whatever the type or overrides say
+ALWAYS_ALLOWED = (
+    "challenges.cloudflare.com", "google.com/recaptcha", "gstatic.com/recaptcha",
+    "recaptcha.net", "hcaptcha.com",
+)
+
+
+class ResourcePolicy:
+    """
+    Decides which requests a broker page may make, and counts what was blocked.
+
+    Per-broker overrides come from the registry entry's "resource_policy":
+        {"enabled": false}                 — load everything
+        {"block_types": ["image", ...]}   — replace BLOCKED_RESOURCE_TYPES
+        {"allow": ["cdn.example.com"]}    — URL substrings that always load
+        {"deny": ["widgets.example.com"]} — URL substrings that never load
+    """
+
+    def __init__(self, broker: dict = None):
+        overrides = (broker or {}).get("resource_policy") or {}
+        self.enabled = BLOCK_RESOURCES and overrides.get("enabled", True)
+        self.block_types = frozenset(overrides.get("block_types", BLOCKED_RESOURCE_TYPES))
+        self.allow = ALWAYS_ALLOWED + tuple(overrides.get("allow", ()))
+        self.deny = TRACKER_HOSTS + tuple(overrides.get("deny", ()))
+        self.stats = {"blocked": 0, "blocked_by_type": {}, "allowed": 0, "bytes_loaded": 0}
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if any(a in url for a in self.allow):
+            return False
+        return resource_type in self.block_types or any(d in url for d in self.deny)
+
+    def attach(self, page):
+        if not self.enabled:
+            return
+        page.route("**/*", self._route)
+        page.on("requestfinished", self._count_loaded)
+
+    def _route(self, route):
+        req = route.request
+        if self.should_block(req.url, req.resource_type):
+            self.stats["blocked"] += 1
+            by_type = self.stats["blocked_by_type"]
+            by_type[req.resource_type] = by_type.get(req.resource_type, 0) + 1
+            route.abort()
+        else:
+            self.stats["allowed"] += 1
+            route.continue_()
+
+    def _count_loaded(self, request):
+        # Blocked requests are never fetched, so only loaded bytes can be measured.
+        # sizes() counts what came over the wire, chunked or compressed bodies included
+        # (Content-Length is missing for those).
+        try:
+            sizes = request.sizes()
+        except Exception:
+            return  # page or context already closed
+        self.stats["bytes_loaded"] += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+
+
+# Default budget for one wait, overridable per broker and label with the
+# registry entry's "wait_budgets": {"<label>": ms}
+DEFAULT_WAIT_MS = 15000
+WAIT_POLL_MS = 100
+
+# Listings of one broker opened side by side in tabs of the same context,
+# overridable with the registry entry's "max_parallel_listings"
+MAX_PARALLEL_LISTINGS = 3
+
+
+# ── Batched DOM access ─────────────────────────────────────────────────────────
+# Each query_selector / fill is one round trip over the Playwright protocol.
+# probe() and fill_fields() do a whole table of them in one page.evaluate.
+
+_HAS_TEXT = re.compile(r"""^(.*?):has-text\((['"])(.*)\2\)$""")
+
+PROBE_JS = """
+(table) => {
+    const norm = (s) => (s || "").replace(/\\s+/g, " ").trim().toLowerCase();
+    const find = ([css, text]) => {
+        let els;
+        try { els = document.querySelectorAll(css || "*"); } catch (e) { return false; }
+        if (text === null) return els.length > 0;
+        return Array.from(els).some((el) => norm(el.textContent).includes(text));
+    };
+    const found = {};
+    for (const [key, candidates] of Object.entries(table)) {
+        const hit = candidates.find(([selector, parts]) => parts.some(find));
+        found[key] = hit ? hit[0] : null;
+    }
+    return found;
+}
+"""
+
+FILL_JS = """
+(fields) => {
+    const setValue = (el, value) => {
+        const proto = el.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        // The native setter keeps React/Vue controlled inputs in sync
+        Object.getOwnPropertyDescriptor(proto, "value").set.call(el, value);
+    };
+    const pickOption = (el, value) => {
+        const wanted = value.trim().toLowerCase();
+        const abbrev = value.trim().slice(0, 2).toUpperCase();
+        const options = Array.from(el.options);
+        const opt = options.find((o) => o.text.trim().toLowerCase() === wanted)
+            || options.find((o) => o.value.toLowerCase() === wanted)
+            || options.find((o) => o.value === abbrev);
+        if (opt) el.value = opt.value;
+        return !!opt;
+    };
+    const result = {};
+    for (const [selector, value] of fields) {
+        let el = null;
+        try { el = document.querySelector(selector); } catch (e) {}
+        result[selector] = !!el;
+        if (!el || !value) continue;
+        if (el.tagName === "SELECT") {
+            if (!pickOption(el, value)) continue;
+        } else {
+            el.focus();
+            setValue(el, value);
+            el.dispatchEvent(new Event("input", { bubbles: true }));
+        }
+        el.dispatchEvent(new Event("change", { bubbles: true }));
+    }
+    return result;
+}
+"""
+
+
+def _split_selector(selector: str) -> list:
+    """Split a selector list on top-level commas (not inside quotes or brackets)."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(selector):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(selector[start:i].strip())
+            start = i + 1
+    parts.append(selector[start:].strip())
+    return [p for p in parts if p]
+
+
+def selector_parts(selector: str) -> list:
+    """[css, text-or-None] pairs for a Playwright selector; supports a trailing :has-text('…')."""
+    parts = []
+    for part in _split_selector(selector):
+        m = _HAS_TEXT.match(part)
+        if m:
+            parts.append([m.group(1), " ".join(m.group(3).split()).lower()])
+        else:
+            parts.append([part, None])
+    return parts
+
+
+def probe(page, table: dict) -> dict:
+    """
+    Check many candidate selectors in one round trip.
+
+    `table` maps a name to a selector or a list of selectors in order of
+    preference. Returns {name: first selector that matches, or None}; the
+    returned selector can be passed straight to page.query_selector().
+    """
+    spec = {}
+    for key, candidates in table.items():
+        if isinstance(candidates, str):
+            candidates = [candidates]
+        spec[key] = [[c, selector_parts(c)] for c in candidates]
+    return page.evaluate(PROBE_JS, spec)
+
+
+def fill_fields(page, fields: dict) -> dict:
+    """
+    Fill many inputs/selects in one round trip. `fields` maps a CSS selector
+    to a value; empty values are skipped, selects are matched by option label,
+    value or two-letter abbreviation. Returns {selector: element found}.
+    """
+    return page.evaluate(FILL_JS, [[s, v or ""] for s, v in fields.items()])
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+def launch_browser(playwright):
+    """Launch headless real Chrome, falling back to the bundled Chromium."""
+    args = ["--disable-blink-features=AutomationControlled"]
+    try:
+        return playwright.chromium.launch(channel="chrome", headless=True, args=args)
+    except Exception:
+        return playwright.chromium.launch(headless=True, args=args)
+
+
+def new_stealthy_page(browser, policy: ResourcePolicy = None, storage_state: dict = None):
+    """
+    Open a page in a fresh context of `browser`, with playwright-stealth
+    applied if it is installed. If a ResourcePolicy is given, requests are
+    filtered through it; a saved storage_state (cookies + localStorage) is
+    loaded into the context. Returns (context, page).
+    """
+    context = browser.new_context(
+        user_agent=USER_AGENT,
+        viewport={"width": 1280, "height": 800},
+        locale="en-US",
+        storage_state=storage_state,
+    )
+    return context, _prepare_page(context.new_page(), _stealth(), policy)
+
+
+def make_stealthy_page(playwright, policy: ResourcePolicy = None, storage_state: dict = None):
     """
     Launch a stealthy browser page using real Chrome + playwright-stealth.
     Falls back to plain Chromium if Chrome or playwright-stealth is unavailable.
+    See new_stealthy_page() for `policy` and `storage_state`.
     Returns (browser, page).
     """
-    args = ["--disable-blink-features=AutomationControlled"]
+    browser = launch_browser(playwright)
+    _, page = new_stealthy_page(browser, policy, storage_state)
+    return browser, page
+
+
+def new_tab(page, policy: ResourcePolicy = None):
+    """
+    Open another page in `page`'s context — same cookies, storage and user
+    agent — with the same stealth patches and resource policy.
+    """
+    return _prepare_page(page.context.new_page(), _stealth(), policy)
+
 
+def _stealth():
     try:
         from playwright_stealth import Stealth
-        stealth = Stealth()
+        return Stealth()
     except ImportError:
-        stealth = None
+        return None
 
-    # Prefer real Chrome; fall back to bundled Chromium
-    try:
-        browser = playwright.chromium.launch(channel="chrome", headless=True, args=args)
-    except Exception:
-        browser = playwright.chromium.launch(headless=True, args=args)
-
-    page = browser.new_page(
-        user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
-        viewport={"width": 1280, "height": 800},
-        locale="en-US",
-    )
 
+def _prepare_page(page, stealth, policy: ResourcePolicy = None):
     if stealth:
         stealth.apply_stealth_sync(page)
 
-    return browser, page
+    if policy:
+        policy.attach(page)
+
+    return page
+
+
+@contextmanager
+def playwright_session():
+    """
+    Playwright for a handler: the browser pool's when the handler runs on the
+    pool thread (see browser_pool.py), otherwise a fresh one for this block.
+    """
+    from brokers.handlers.browser_pool import current_pool
+
+    pool = current_pool()
+    if pool:
+        yield pool.playwright()
+        return
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        yield p
+
+
+def combine_results(results: list) -> dict:
+    """A handler's return value for one or more listings — see BaseHandler.submit()."""
+    return results[0] if len(results) == 1 else {"results": results}
+
+
+def profile_key(profile: dict) -> str:
+    """Stable, non-reversible key for the profile a session or listing belongs to."""
+    identity = "|".join(
+        (profile.get(k) or "").strip().lower()
+        for k in ("first_name", "last_name", "email", "date_of_birth")
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def _slug(text: str) -> str:
+    return "-".join(text.lower().split())
+
+
+class TemplateValues(dict):
+    """Values for "{field}" templates in flows and registry specs; unknown fields render as ""."""
+    def __missing__(self, key):
+        return ""
 
 
 def is_bot_wall(title: str) -> bool:
@@ -48,17 +337,233 @@ class BaseHandler:
     def __init__(self, profile: dict, broker: dict):
         self.profile = profile
         self.broker = broker
+        self.resource_policy = ResourcePolicy(broker)
+        self.wait_timings = []
+        self.session_restored = False
+        self._preloading = {}   # tab → URL whose navigation for_each_listing() started
 
     def submit(self) -> dict:
         """
         Submit opt-out request.
         Returns: {"status": str, "notes": str}
         status values: submitted | confirmed | error | manual_required
+        A handler that opted out of several listings returns
+        {"results": [{"status", "notes"}, ...]}, one entry per listing.
         """
         raise NotImplementedError
 
     # ── Helpers ────────────────────────────────────────────────────────────────
 
+    def open_browser(self, playwright):
+        """
+        Open a stealthy page with this broker's resource-blocking policy and
+        the storage state saved by the last session, if any. On the browser
+        pool's thread the page comes from the warm browser and the first
+        value is its context; otherwise a browser is launched. Either way,
+        close_browser() closes what this opened. Returns (browser, page).
+        """
+        from brokers.handlers.browser_pool import current_pool
+
+        state = None
+        if BROWSER_STATE_TTL_HOURS > 0:
+            state = get_browser_state(self.broker["id"], self.profile_key)
+        self.session_restored = state is not None
+        pool = current_pool()
+        if pool:
+            return pool.new_page(self.resource_policy, state)
+        return make_stealthy_page(playwright, self.resource_policy, state)
+
+    def close_browser(self, browser, page):
+        """
+        Save the session's cookies and localStorage for the next run, then close
+        the browser (or, for a pooled page, its context). A session that ends on
+        a bot wall is not worth keeping, so its saved state is evicted instead.
+        """
+        try:
+            if BROWSER_STATE_TTL_HOURS > 0:
+                if is_bot_wall(page.title()):
+                    delete_browser_state(self.broker["id"], self.profile_key)
+                else:
+                    save_browser_state(self.broker["id"], self.profile_key,
+                                       page.context.storage_state(), BROWSER_STATE_TTL_HOURS)
+        except Exception:
+            pass  # never let state bookkeeping hide the handler's result
+        finally:
+            browser.close()
+
+    def for_each_listing(self, page, listings: list, opt_out, start_url=None) -> list:
+        """
+        Run opt_out(tab, listing) for every listing and return the results in
+        order. Up to max_parallel_listings tabs share the page's context: each
+        tab's navigation (to start_url(listing), default the listing itself)
+        is started before the first one is worked on, so the pages load side
+        by side while the handler works through them one at a time. A failure
+        on one listing is recorded as its result and doesn't stop the rest.
+        """
+        limit = max(1, int(self.broker.get("max_parallel_listings", MAX_PARALLEL_LISTINGS)))
+        start_url = start_url or (lambda listing: listing)
+        results = []
+        for i in range(0, len(listings), limit):
+            batch = listings[i:i + limit]
+            tabs = [page] + [new_tab(page, self.resource_policy) for _ in batch[1:]]
+            try:
+                for tab, listing in zip(tabs, batch):
+                    self._start_navigation(tab, start_url(listing))
+                for tab, listing in zip(tabs, batch):
+                    try:
+                        results.append(opt_out(tab, listing))
+                    except Exception as exc:
+                        results.append({"status": "manual_required",
+                                        "notes": f"Automation failed on {listing} ({exc})."})
+            finally:
+                self._preloading.clear()
+                for tab in tabs[1:]:
+                    tab.close()
+        return results
+
+    def _start_navigation(self, page, url: str):
+        # "commit" returns once the response starts; the page goes on loading
+        # in the background and goto() picks up the wait from there
+        try:
+            page.goto(url, timeout=30000, wait_until="commit")
+            self._preloading[page] = url
+        except Exception:
+            pass  # goto() navigates again and reports the failure
+
+    # ── Listing URL cache ──────────────────────────────────────────────────────
+    # Handlers that search for the person before opting out remember the
+    # listing they found, and go straight to it on the next run.
+
+    def cached_listing_urls(self) -> list:
+        if LISTING_URL_TTL_DAYS <= 0:
+            return []
+        return get_listing_urls(self.broker["id"], self.profile_key)
+
+    def cached_listing_url(self) -> str | None:
+        urls = self.cached_listing_urls()
+        return urls[0] if urls else None
+
+    def remember_listing_url(self, url: str):
+        if LISTING_URL_TTL_DAYS > 0 and url:
+            save_listing_url(self.broker["id"], self.profile_key, url, LISTING_URL_TTL_DAYS)
+
+    def forget_listing_url(self, url: str = None):
+        """Drop a listing URL that turned out to be stale (or all of them)."""
+        delete_listing_urls(self.broker["id"], self.profile_key, url)
+
+    @property
+    def profile_key(self) -> str:
+        return profile_key(self.profile)
+
+    @property
+    def resource_stats(self) -> dict:
+        return self.resource_policy.stats
+
+    # ── Waits ──────────────────────────────────────────────────────────────────
+    # Each wait targets the condition the next step actually needs and is
+    # recorded in self.wait_timings as {"label", "ms", "ok"} so budgets can be
+    # tuned per broker from real timings.
+
+    def wait_budget(self, label: str) -> int:
+        return int((self.broker.get("wait_budgets") or {}).get(label, DEFAULT_WAIT_MS))
+
+    def _record_wait(self, label: str, started: float, ok: bool) -> bool:
+        self.wait_timings.append({
+            "label": label,
+            "ms": int((time.monotonic() - started) * 1000),
+            "ok": ok,
+        })
+        return ok
+
+    def goto(self, page, url: str, ready: str = None, label: str = "load") -> bool:
+        """Navigate, returning as soon as the DOM is parsed and `ready` (a selector) exists."""
+        started = time.monotonic()
+        if self._preloading.pop(page, None) == url:
+            page.wait_for_load_state("domcontentloaded", timeout=30000)
+        else:
+            page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        if not ready:
+            return self._record_wait(label, started, True)
+        try:
+            page.wait_for_selector(ready, state="attached", timeout=self.wait_budget(label))
+            ok = True
+        except Exception:
+            ok = False  # caller decides; the bot-wall / missing-element checks follow
+        return self._record_wait(label, started, ok)
+
+    def wait_for(self, page, selector: str, label: str) -> bool:
+        """Wait until `selector` is attached to the DOM. Returns False on timeout."""
+        started = time.monotonic()
+        try:
+            page.wait_for_selector(selector, state="attached", timeout=self.wait_budget(label))
+            ok = True
+        except Exception:
+            ok = False
+        return self._record_wait(label, started, ok)
+
+    @staticmethod
+    def _present(page, selector: str) -> bool:
+        if not selector:
+            return False
+        try:
+            return page.query_selector(selector) is not None
+        except Exception:
+            return False  # mid-navigation: the old document is gone
+
+    def click_and_wait(self, page, element, label: str, ready: str = None) -> bool:
+        """Click `element` and wait for the outcome — see act_and_wait()."""
+        return self.act_and_wait(page, element.click, label, ready)
+
+    def act_and_wait(self, page, action, label: str, ready: str = None) -> bool:
+        """
+        Run `action` (a click, a key press), then wait for whichever comes
+        first: the URL changes, `ready` appears, or a non-GET request (form
+        POST / XHR) finishes. Returns False if none happened within budget.
+        """
+        before = page.url
+        posted = []
+
+        def on_finished(request):
+            if request.method != "GET":
+                posted.append(request)
+
+        page.on("requestfinished", on_finished)
+        started = time.monotonic()
+        deadline = started + self.wait_budget(label) / 1000
+        try:
+            action()
+            while True:
+                if posted or page.url != before or self._present(page, ready):
+                    return self._record_wait(label, started, True)
+                if time.monotonic() >= deadline:
+                    return self._record_wait(label, started, False)
+                page.wait_for_timeout(WAIT_POLL_MS)
+        finally:
+            page.remove_listener("requestfinished", on_finished)
+
+    # ── Profile fields ─────────────────────────────────────────────────────────
+
+    def template_values(self) -> dict:
+        values = TemplateValues({k: v or "" for k, v in self.profile.items()})
+        values.update({k: v for k, v in self.broker.items() if isinstance(v, str)})
+        values.update(
+            full_name=self.full_name,
+            email=self.email,
+            phone=self.phone,
+            address=self.address,
+            city=self.city,
+            state=self.state,
+            zip_code=self.zip_code,
+            zip=self.zip_code,
+            dob=self.dob,
+            # URL-ready variants for search URLs
+            name_slug=_slug(self.full_name),
+            state_slug=_slug(self.state),
+            full_name_q=quote_plus(self.full_name),
+            state_q=quote_plus(self.state),
+        )
+        return values
+
     @property
     def full_name(self) -> str:
         first = self.profile.get("first_name", "")
@@ -1,21 +1,24 @@
 """
 BeenVerified opt-out handler.
-Flow: search by name/state → select record → solve Turnstile → submit.
+Flow: search by name/state → select each record matching the profile → solve Turnstile → submit.
 Email verification is required to finalize removal.
 """
-from brokers.handlers.base import BaseHandler, make_stealthy_page, is_bot_wall
+from brokers.handlers.base import BaseHandler, is_bot_wall, fill_fields, combine_results, playwright_session
+from brokers.handlers.matcher import extract_candidates, rank_candidates, candidate_selector, candidate_label
 from brokers.handlers.capsolver_helper import (
-    extract_turnstile_sitekey, solve_turnstile, inject_turnstile_token,
+    extract_turnstile_sitekey, solve_turnstile_async, inject_turnstile_token,
 )
 
 SEARCH_URL = "https://www.beenverified.com/app/optout/search"
 OPT_OUT_URL = "https://www.beenverified.com/app/optout/search"
 
+RESULT_BUTTONS = "a:has-text('Opt Out'), button:has-text('Opt Out'), .optout-btn, .opt-out-btn"
+
 
 class Handler(BaseHandler):
     def submit(self) -> dict:
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
         except ImportError:
             return {
                 "status": "manual_required",
@@ -29,80 +32,34 @@ class Handler(BaseHandler):
             }
 
         try:
-            with sync_playwright() as p:
-                browser, page = make_stealthy_page(p)
-
-                page.goto(SEARCH_URL, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                # Solve Turnstile if present
-                if not self._maybe_solve_turnstile(page, SEARCH_URL):
-                    browser.close()
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
+
+                failure = self._search(page)
+                if failure:
+                    self.close_browser(browser, page)
+                    return failure
+
+                candidates = extract_candidates(page, RESULT_BUTTONS)
+                matches = rank_candidates(candidates, self.profile, self.broker.get("match_threshold"))
+                if candidates and not matches:
+                    self.close_browser(browser, page)
                     return {
                         "status": "manual_required",
-                        "notes": f"Cloudflare Turnstile could not be solved. Visit {OPT_OUT_URL} manually.",
+                        "notes": f"{len(candidates)} record(s) found but none matched your profile closely. "
+                                 f"Review them at {OPT_OUT_URL} and opt out manually if one is yours.",
                     }
 
-                # Fill the search form
-                first = self.profile.get("first_name", "")
-                last = self.profile.get("last_name", "")
-
-                first_el = page.query_selector("input[name='firstName'], input[placeholder*='First']")
-                last_el  = page.query_selector("input[name='lastName'],  input[placeholder*='Last']")
-                state_el = page.query_selector("select[name='state'], input[name='state']")
-
-                if first_el and first:
-                    first_el.fill(first)
-                if last_el and last:
-                    last_el.fill(last)
-                if state_el and self.state:
-                    tag = state_el.evaluate("el => el.tagName.toLowerCase()")
-                    if tag == "select":
-                        try:
-                            state_el.select_option(label=self.state)
-                        except Exception:
-                            state_el.select_option(value=self.state[:2].upper())
-                    else:
-                        state_el.fill(self.state)
-
-                submit = page.query_selector("button[type='submit'], input[type='submit']")
-                if not submit:
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": f"Could not find search form. Visit {OPT_OUT_URL} manually.",
-                    }
+                first, rest = (matches or [None])[0], matches[1:]
+                results = [self._opt_out(page, first)]
+                if rest:
+                    # The opt-out form replaced the results — every other match
+                    # gets its own tab that runs the search again.
+                    results += self.for_each_listing(page, rest, self._search_and_opt_out,
+                                                     start_url=lambda match: SEARCH_URL)
 
-                submit.click()
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                # Select the first result
-                result = (
-                    page.query_selector("a:has-text('Opt Out')")
-                    or page.query_selector("button:has-text('Opt Out')")
-                    or page.query_selector(".optout-btn, .opt-out-btn")
-                )
-                if result:
-                    result.click()
-                    page.wait_for_load_state("networkidle", timeout=20000)
-
-                # Fill email on the opt-out confirmation form
-                email_el = page.query_selector("input[type='email'], input[name='email']")
-                if email_el and self.email:
-                    email_el.fill(self.email)
-                    confirm = page.query_selector("button[type='submit'], input[type='submit']")
-                    if confirm:
-                        confirm.click()
-                        page.wait_for_timeout(3000)
-
-                browser.close()
-                return {
-                    "status": "submitted",
-                    "notes": (
-                        "Opt-out submitted to BeenVerified. "
-                        "Check your email and click the verification link to complete removal."
-                    ),
-                }
+                self.close_browser(browser, page)
+                return combine_results(results)
 
         except Exception as exc:
             return {
@@ -110,17 +67,93 @@ class Handler(BaseHandler):
                 "notes": f"Automation failed ({exc}). Visit {OPT_OUT_URL} manually.",
             }
 
-    def _maybe_solve_turnstile(self, page, url: str) -> bool:
-        """If a Turnstile is present, solve it via CapSolver. Returns True if clear to proceed."""
+    def _search(self, page) -> dict | None:
+        """Run the opt-out search. Returns None on success, or the result to give up with."""
+        self.goto(
+            page, SEARCH_URL, label="form",
+            ready="input[name='firstName'], input[placeholder*='First'], [data-sitekey]",
+        )
+
+        # Start solving the Turnstile (if present), then fill the search form meanwhile
+        pending = self._start_turnstile(page, SEARCH_URL)
+        fill_fields(page, {
+            "input[name='firstName'], input[placeholder*='First']": self.profile.get("first_name", ""),
+            "input[name='lastName'], input[placeholder*='Last']": self.profile.get("last_name", ""),
+            "select[name='state'], input[name='state']": self.state,
+        })
+
+        if not self._finish_turnstile(page, pending):
+            return {
+                "status": "manual_required",
+                "notes": f"Cloudflare Turnstile could not be solved. Visit {OPT_OUT_URL} manually.",
+            }
+
+        submit = page.query_selector("button[type='submit'], input[type='submit']")
+        if not submit:
+            return {
+                "status": "manual_required",
+                "notes": f"Could not find search form. Visit {OPT_OUT_URL} manually.",
+            }
+
+        self.click_and_wait(page, submit, "search_submit")
+        self.wait_for(page, "a:has-text('Opt Out'), button:has-text('Opt Out')", "search_results")
+        return None
+
+    def _search_and_opt_out(self, page, match: dict) -> dict:
+        """Search again in this tab, find the same record by its card text and opt out."""
+        failure = self._search(page)
+        if failure:
+            return failure
+        again = [c for c in extract_candidates(page, RESULT_BUTTONS) if c["text"] == match["text"]]
+        if not again:
+            return {
+                "status": "manual_required",
+                "notes": f"Could not find \"{candidate_label(match)}\" again. Visit {OPT_OUT_URL} manually.",
+            }
+        return self._opt_out(page, {**again[0], "score": match["score"]})
+
+    def _opt_out(self, page, match: dict = None) -> dict:
+        """Open the opt-out form for one matched record (if any) and confirm by email."""
+        if match:
+            self.click_and_wait(page, page.query_selector(candidate_selector(match)), "select_record",
+                                ready="input[type='email']")
+            self.wait_for(page, "input[type='email'], input[name='email']", "optout_form")
+
+        # Fill email on the opt-out confirmation form
+        filled = fill_fields(page, {"input[type='email'], input[name='email']": self.email})
+        if any(filled.values()) and self.email:
+            confirm = page.query_selector("button[type='submit'], input[type='submit']")
+            if confirm:
+                self.click_and_wait(page, confirm, "submit")
+
+        return {
+            "status": "submitted",
+            "notes": (
+                "Opt-out submitted to BeenVerified"
+                + (f" for \"{candidate_label(match)}\" (match score {match['score']})" if match else "")
+                + ". Check your email and click the verification link to complete removal."
+            ),
+        }
+
+    @staticmethod
+    def _start_turnstile(page, url: str):
+        """
+        If a Turnstile is present, start solving it via CapSolver. Returns None
+        when there is none, otherwise a Future resolving to the token (or None).
+        """
         turnstile = page.query_selector("[data-sitekey], iframe[src*='challenges.cloudflare']")
         if not turnstile:
-            return True  # No Turnstile — proceed normally
-
-        site_key = extract_turnstile_sitekey(page)
-        token = solve_turnstile(url, site_key) if site_key else None
+            return None  # No Turnstile — proceed normally
+        return solve_turnstile_async(url, extract_turnstile_sitekey(page))
+
+    @staticmethod
+    def _finish_turnstile(page, pending) -> bool:
+        """Wait for a solve started by _start_turnstile() and inject it. Returns True if clear to proceed."""
+        if pending is None:
+            return True
+        token = pending.result()
         if not token:
             return False
 
         inject_turnstile_token(page, token)
-        page.wait_for_timeout(2000)
         return True
@@ -0,0 +1,190 @@
+"""
+A warm browser shared by every broker of a run, and kept between runs.
+
+Launching the Playwright driver and Chrome costs a few seconds, which every
+broker used to pay on its own. The pool owns one Playwright instance and one
+browser on a dedicated thread (sync Playwright objects only work on the
+thread that created them), and runs browser handlers on that thread:
+
+    pool = get_browser_pool()          # None when BROWSER_IDLE_TIMEOUT is 0
+    result = pool.run(handler.submit)
+
+Inside a handler nothing changes: playwright_session() yields the pool's
+Playwright and BaseHandler.open_browser() takes a page from the pool — a
+pre-made stealth context when one is ready — instead of launching Chrome.
+Contexts a job took and didn't close — a handler that raised before its
+close_browser() — are closed when the job ends, so they don't pile up in the
+long-lived browser.
+Between jobs the pool tops up BROWSER_WARM_CONTEXTS spare contexts; after
+BROWSER_IDLE_TIMEOUT seconds without work it closes them, the browser and
+the driver, and starts again on the next job or prewarm().
+"""
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import BROWSER_IDLE_TIMEOUT, BROWSER_WARM_CONTEXTS
+from brokers.handlers.base import launch_browser, new_stealthy_page
+
+_local = threading.local()
+
+
+def current_pool():
+    """The pool whose thread is running the caller, or None."""
+    return getattr(_local, "pool", None)
+
+
+class BrowserPool:
+    def __init__(self, warm_contexts: int = BROWSER_WARM_CONTEXTS, idle_timeout: float = BROWSER_IDLE_TIMEOUT):
+        self.warm_contexts = max(0, warm_contexts)
+        self.idle_timeout = idle_timeout
+        self.stats = {"launches": 0, "warm_pages": 0, "cold_pages": 0, "shrinks": 0}
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Only touched on the pool thread
+        self._playwright = None
+        self._browser = None
+        self._warm = []          # [(context, page)] ready for the next broker
+        self._in_use = []        # contexts handed out during the current job
+        self._last_used = 0.0
+
+    # ── Any thread ─────────────────────────────────────────────────────────────
+
+    def run(self, fn, *args):
+        """
+        Run fn(*args) on the pool thread, in a copy of the caller's context
+        (context variables), and return its result (or raise its exception).
+        """
+        if current_pool() is self:
+            return fn(*args)
+        future = Future()
+        self._ensure_thread()
+        self._jobs.put((contextvars.copy_context(), fn, args, future))
+        return future.result()
+
+    def prewarm(self):
+        """Launch the browser and fill the spare contexts in the background."""
+        self._ensure_thread()
+        self._jobs.put(None)
+
+    def _ensure_thread(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="browser-pool", daemon=True)
+                self._thread.start()
+
+    # ── Pool thread ────────────────────────────────────────────────────────────
+
+    def _loop(self):
+        _local.pool = self
+        while True:
+            timeout = None
+            if self._browser:
+                timeout = max(0.0, self._last_used + self.idle_timeout - time.monotonic())
+            try:
+                job = self._jobs.get(timeout=timeout)
+            except queue.Empty:
+                self._shrink()
+                continue
+
+            if job is not None:
+                context, fn, args, future = job
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(context.run(fn, *args))
+                    except BaseException as exc:
+                        future.set_exception(exc)
+                    finally:
+                        self._close_leftovers()
+            self._last_used = time.monotonic()
+            if self._jobs.empty():
+                self._top_up()
+
+    def playwright(self):
+        """The pool's Playwright instance, started on first use."""
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+            self._playwright = sync_playwright().start()
+        return self._playwright
+
+    def browser(self):
+        """The pool's browser, (re)launched if it isn't running."""
+        if self._browser is None or not self._browser.is_connected():
+            self._warm.clear()
+            self._browser = launch_browser(self.playwright())
+            self.stats["launches"] += 1
+        return self._browser
+
+    def new_page(self, policy=None, storage_state: dict = None):
+        """
+        A stealthy page for one broker: a spare context if there is one and
+        no saved state has to be loaded, otherwise a new context. Returns
+        (context, page); closing the context hands nothing back — spares are
+        never reused across brokers, so no cookies leak between sites.
+        """
+        browser = self.browser()
+        if storage_state is None and self._warm:
+            context, page = self._warm.pop()
+            self.stats["warm_pages"] += 1
+            if policy:
+                policy.attach(page)
+        else:
+            self.stats["cold_pages"] += 1
+            context, page = new_stealthy_page(browser, policy, storage_state)
+        self._in_use.append(context)
+        return context, page
+
+    def _close_leftovers(self):
+        """Close the contexts the finished job took (a no-op for those it closed itself)."""
+        for context in self._in_use:
+            try:
+                context.close()
+            except Exception:
+                pass
+        self._in_use.clear()
+
+    def _top_up(self):
+        try:
+            browser = self.browser()
+            while len(self._warm) < self.warm_contexts:
+                self._warm.append(new_stealthy_page(browser))
+        except Exception:
+            pass  # Playwright or Chrome missing: handlers report it themselves
+
+    def _shrink(self):
+        for context, _ in self._warm:
+            try:
+                context.close()
+            except Exception:
+                pass
+        self._warm.clear()
+        try:
+            if self._browser:
+                self._browser.close()
+        except Exception:
+            pass
+        try:
+            if self._playwright:
+                self._playwright.stop()
+        except Exception:
+            pass
+        self._browser = self._playwright = None
+        self.stats["shrinks"] += 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool | None:
+    """The process-wide pool, or None if BROWSER_IDLE_TIMEOUT disables it."""
+    global _pool
+    if BROWSER_IDLE_TIMEOUT <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
@@ -1,5 +1,5 @@
 """
-CapSolver integration for automated CAPTCHA solving.
+CAPTCHA solving through CapSolver (or anything speaking its API).
 
 Supports:
   - reCAPTCHA v2 (checkbox)       → ReCaptchaV2TaskProxyLess
@@ -11,73 +11,413 @@ Usage:
     token = solve_recaptcha_v2("https://example.com", site_key)
     token = solve_turnstile("https://example.com", site_key)
 
-Returns None if CAPSOLVER_API_KEY is not set or solving fails.
+Returns None if no solver is configured or solving fails.
+
+The backend is picked with CAPTCHA_SOLVER in .env:
+  capsolver  (default) api.capsolver.com with CAPSOLVER_API_KEY
+  mock       the local stand-in in mock_solver.py — at CAPTCHA_SOLVER_URL,
+             or started in-process if that is empty
+CAPTCHA_SOLVER_URL also points the capsolver backend at a compatible service.
+
+A solve takes 3–120 s of polling. Handlers start it as soon as the sitekey is
+known and fill the form meanwhile:
+
+    pending = solve_turnstile_async(page.url, site_key)   # Future
+    fill_fields(page, {...})
+    token = pending.result()
+
+Async solves from every broker share one thread pool (SOLVER_THREADS).
+
+Every solve is recorded in the captcha_solves table with its task type,
+outcome, latency and estimated cost, attributed to the run, broker and
+profile set with solve_accounting() / solving_for(). A run's SolveBudget
+refuses further solves once its spend or solver-time cap is reached.
 """
+import contextvars
+import logging
+import re
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+import sys
+
 import requests
+from requests.adapters import HTTPAdapter
 
-# Loaded lazily so import never fails if config is missing
-_API_KEY = None
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import (
+    CAPSOLVER_API_KEY, CAPTCHA_SOLVER, CAPTCHA_SOLVER_URL, CAPTCHA_BUDGET_USD, CAPTCHA_BUDGET_SECONDS,
+)
+from core.tracker import get_sitekey, save_sitekey, record_captcha_solve
 
+logger = logging.getLogger(__name__)
 
-def _get_api_key() -> str | None:
-    global _API_KEY
-    if _API_KEY is None:
-        import sys
-        from pathlib import Path
-        sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-        try:
-            from config import CAPSOLVER_API_KEY
-            _API_KEY = CAPSOLVER_API_KEY or ""
-        except Exception:
-            _API_KEY = ""
-    return _API_KEY or None
+CAPSOLVER_URL = "https://api.capsolver.com"
+REQUEST_TIMEOUT = 15
+MAX_WAIT = 120
 
+# First poll after the learned typical solve time (this until one is known),
+# never sooner than FIRST_POLL_MIN; then every POLL_INTERVAL seconds
+FIRST_POLL_DEFAULT = 3.0
+FIRST_POLL_MIN = 1.0
+POLL_INTERVAL = 1.0
+EWMA_ALPHA = 0.3
 
-def _create_task(task: dict) -> str | None:
-    """Submit a task to CapSolver and return the task ID, or None on failure."""
-    api_key = _get_api_key()
-    if not api_key:
-        return None
-    try:
-        resp = requests.post(
-            "https://api.capsolver.com/createTask",
-            json={"clientKey": api_key, "task": task},
-            timeout=15,
+# Solves in flight at once across all brokers; each thread mostly sleeps between polls
+SOLVER_THREADS = 8
+
+# How long a solved token is accepted, per task type (seconds), and how much
+# of that must be left for a pooled token to still be handed out
+TOKEN_TTL = {"AntiTurnstileTaskProxyLess": 300, "ReCaptchaV2TaskProxyLess": 120}
+DEFAULT_TOKEN_TTL = 120
+TOKEN_MARGIN = 20
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Solver:
+    """A CAPTCHA solving backend. `billed` is False for backends that cost nothing (the mock)."""
+
+    billed = True
+
+    def solve(self, task: dict) -> str | None:
+        """Solve a CapSolver-style task ({"type", "websiteURL", "websiteKey"}); the token or None."""
+        raise NotImplementedError
+
+    def solve_with_outcome(self, task: dict) -> tuple:
+        """(token, outcome) — outcome "solved", "failed" or "timeout". Override to tell failures apart."""
+        token = self.solve(task)
+        return token, "solved" if token else "failed"
+
+    def stats(self) -> dict:
+        """{task type: {"solved", "failed", "timeout", "avg_ms", "typical_ms"}}"""
+        return {}
+
+
+class CapSolverClient(Solver):
+    """
+    Client for the CapSolver createTask / getTaskResult API at `api_url`:
+    one keep-alive session for every call, and poll timing learned from how
+    long each task type usually takes.
+
+    The first getTaskResult is sent when a solve of that type typically
+    finishes (an exponentially weighted average of past solves, 3 s until
+    there is one), then every POLL_INTERVAL seconds. stats() reports the
+    count, failures, timeouts and latency of the solves so far, per task type.
+    """
+
+    def __init__(self, api_key: str, api_url: str = CAPSOLVER_URL, billed: bool = True,
+                 max_wait: float = MAX_WAIT):
+        self.api_key = api_key
+        self.api_url = api_url.rstrip("/")
+        self.billed = billed
+        self.max_wait = max_wait
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SOLVER_THREADS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._typical = {}   # task type → smoothed solve time (s)
+        self._stats = {}     # task type → counters
+
+    def _call(self, method: str, payload: dict) -> dict:
+        resp = self.session.post(
+            f"{self.api_url}/{method}",
+            json={"clientKey": self.api_key, **payload},
+            timeout=REQUEST_TIMEOUT,
         )
-        data = resp.json()
+        return resp.json()
+
+    def create_task(self, task: dict) -> str | None:
+        """Submit a task and return the task ID, or None on failure."""
+        try:
+            data = self._call("createTask", {"task": task})
+        except Exception:
+            return None
         if data.get("errorId", 1) != 0:
             return None
         return data.get("taskId")
-    except Exception:
-        return None
 
-
-def _poll_result(task_id: str, max_wait: int = 120) -> str | None:
-    """Poll for the task result; return the solution token or None on timeout/error."""
-    api_key = _get_api_key()
-    if not api_key:
-        return None
-    deadline = time.time() + max_wait
-    while time.time() < deadline:
-        time.sleep(3)
-        try:
-            resp = requests.post(
-                "https://api.capsolver.com/getTaskResult",
-                json={"clientKey": api_key, "taskId": task_id},
-                timeout=15,
-            )
-            data = resp.json()
+    def poll_result(self, task_id: str, task_type: str, max_wait: float = None) -> tuple:
+        """
+        Poll until the task is solved (at most max_wait seconds, default the
+        client's). Returns (token, outcome) with outcome "solved", "failed"
+        or "timeout"; token is None unless solved.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        delay = self.first_poll_delay(task_type)
+        while True:
+            remaining = started + max_wait - time.monotonic()
+            if remaining <= 0:
+                return None, "timeout"
+            time.sleep(min(delay, remaining))
+            delay = POLL_INTERVAL
+            try:
+                data = self._call("getTaskResult", {"taskId": task_id})
+            except Exception:
+                return None, "failed"
             if data.get("errorId", 1) != 0:
-                return None
-            status = data.get("status")
-            if status == "ready":
+                return None, "failed"
+            if data.get("status") == "ready":
                 sol = data.get("solution", {})
-                return sol.get("gRecaptchaResponse") or sol.get("token")
+                token = sol.get("gRecaptchaResponse") or sol.get("token")
+                return token, "solved" if token else "failed"
             # status == "processing" → keep polling
-        except Exception:
-            return None
-    return None
+
+    def solve(self, task: dict) -> str | None:
+        """Create the task and wait for its token. Returns None if it failed or timed out."""
+        return self.solve_with_outcome(task)[0]
+
+    def solve_with_outcome(self, task: dict) -> tuple:
+        started = time.monotonic()
+        task_id = self.create_task(task)
+        if task_id:
+            token, outcome = self.poll_result(task_id, task["type"])
+        else:
+            token, outcome = None, "failed"
+        self._record(task["type"], outcome, time.monotonic() - started)
+        return token, outcome
+
+    def first_poll_delay(self, task_type: str) -> float:
+        with self._lock:
+            typical = self._typical.get(task_type)
+        if typical is None:
+            return FIRST_POLL_DEFAULT
+        return max(FIRST_POLL_MIN, typical * 0.9)
+
+    def _record(self, task_type: str, outcome: str, seconds: float):
+        with self._lock:
+            st = self._stats.setdefault(task_type, {"solved": 0, "failed": 0, "timeout": 0, "solve_ms": 0})
+            st[outcome] += 1
+            if outcome == "solved":
+                st["solve_ms"] += int(seconds * 1000)
+                prev = self._typical.get(task_type)
+                self._typical[task_type] = seconds if prev is None else prev + EWMA_ALPHA * (seconds - prev)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                task_type: {
+                    "solved": st["solved"],
+                    "failed": st["failed"],
+                    "timeout": st["timeout"],
+                    "avg_ms": st["solve_ms"] // st["solved"] if st["solved"] else None,
+                    "typical_ms": int(self._typical[task_type] * 1000) if task_type in self._typical else None,
+                }
+                for task_type, st in self._stats.items()
+            }
+
+
+# ── Backends ───────────────────────────────────────────────────────────────────
+
+def _capsolver_backend() -> Solver | None:
+    if not CAPSOLVER_API_KEY:
+        return None
+    return CapSolverClient(CAPSOLVER_API_KEY, CAPTCHA_SOLVER_URL or CAPSOLVER_URL)
+
+
+def _mock_backend() -> Solver:
+    url = CAPTCHA_SOLVER_URL
+    if not url:
+        from brokers.handlers.mock_solver import start_mock_solver
+        url = start_mock_solver()
+    return CapSolverClient("mock", url, billed=False)
+
+
+SOLVER_BACKENDS = {
+    "capsolver": _capsolver_backend,
+    "mock": _mock_backend,
+}
+
+_solver = None
+_solver_ready = False
+_solver_lock = threading.Lock()
+
+
+def get_solver() -> Solver | None:
+    """The configured backend (created on first use), or None if it isn't set up or CAPTCHA_SOLVER is unknown."""
+    global _solver, _solver_ready
+    with _solver_lock:
+        if not _solver_ready:
+            backend = SOLVER_BACKENDS.get(CAPTCHA_SOLVER)
+            if backend is None:
+                logger.error("Unknown CAPTCHA_SOLVER %r (expected one of: %s) — CAPTCHAs will not be solved",
+                             CAPTCHA_SOLVER, ", ".join(SOLVER_BACKENDS))
+            _solver = backend() if backend else None
+            _solver_ready = True
+        return _solver
+
+
+def set_solver(solver: Solver | None):
+    """Replace the configured backend (benchmarks, or a backend defined elsewhere)."""
+    global _solver, _solver_ready
+    with _solver_lock:
+        _solver, _solver_ready = solver, True
+
+
+def solver_stats() -> dict:
+    """Per-task-type solve statistics for this process (see Solver.stats)."""
+    solver = get_solver()
+    return solver.stats() if solver else {}
+
+
+# ── Accounting ─────────────────────────────────────────────────────────────────
+
+# Estimated USD per solved task (CapSolver list prices). Failed and timed-out
+# tasks aren't charged, and neither are solves by an unbilled backend (the
+# mock): those are recorded at cost 0 and don't count toward the budget.
+SOLVE_PRICES = {"AntiTurnstileTaskProxyLess": 0.0008, "ReCaptchaV2TaskProxyLess": 0.001}
+DEFAULT_SOLVE_PRICE = 0.001
+
+_budget = contextvars.ContextVar("captcha_budget", default=None)
+_broker = contextvars.ContextVar("captcha_broker", default=None)
+
+
+class SolveBudget:
+    """
+    A run's CAPTCHA spend: estimated cost and solver seconds used so far,
+    counts per outcome, and the caps (0 = none). A solve is refused when the
+    cost so far plus the solves in flight would pass max_cost, or the solver
+    time already used has reached max_seconds.
+    """
+
+    def __init__(self, run_id: str, profile_key: str = None,
+                 max_cost: float = CAPTCHA_BUDGET_USD, max_seconds: float = CAPTCHA_BUDGET_SECONDS):
+        self.run_id = run_id
+        self.profile_key = profile_key
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.cost = 0.0
+        self.seconds = 0.0
+        self.counts = {"solved": 0, "failed": 0, "timeout": 0, "over_budget": 0}
+        self._in_flight = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, price: float) -> bool:
+        with self._lock:
+            if self.max_cost and self.cost + self._in_flight + price > self.max_cost:
+                return False
+            if self.max_seconds and self.seconds >= self.max_seconds:
+                return False
+            self._in_flight += price
+            return True
+
+    def release(self, price: float):
+        with self._lock:
+            self._in_flight -= price
+
+    def add(self, outcome: str, seconds: float, cost: float):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            self.seconds += seconds
+            self.cost += cost
+
+    def totals(self) -> dict:
+        with self._lock:
+            return {**self.counts, "cost": round(self.cost, 4), "seconds": round(self.seconds, 1)}
+
+
+@contextmanager
+def solve_accounting(budget: SolveBudget):
+    """Account solves started inside the block (and the async ones they start) to `budget`'s run."""
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+@contextmanager
+def solving_for(broker_id: str):
+    """Attribute solves started inside the block to a broker."""
+    token = _broker.set(broker_id)
+    try:
+        yield
+    finally:
+        _broker.reset(token)
+
+
+def _account(budget: SolveBudget | None, task_type: str, outcome: str, seconds: float, cost: float,
+             billed: bool = True):
+    if budget and billed:
+        budget.add(outcome, seconds, cost)
+    try:
+        record_captcha_solve(budget.run_id if budget else None, _broker.get(),
+                             budget.profile_key if budget else None,
+                             task_type, outcome, int(seconds * 1000), cost)
+    except Exception:
+        pass  # accounting must never cost a solved token
+
+
+# ── Solving ────────────────────────────────────────────────────────────────────
+
+RECAPTCHA_V2 = "ReCaptchaV2TaskProxyLess"
+TURNSTILE = "AntiTurnstileTaskProxyLess"
+
+# Captcha kinds (sitekey cache, registry "captcha" specs) → CapSolver task types
+TASK_TYPES = {"turnstile": TURNSTILE, "recaptcha_v2": RECAPTCHA_V2}
+
+
+def _solve(task_type: str, page_url: str, site_key: str) -> str | None:
+    solver = get_solver()
+    if not solver or not site_key:
+        return None
+    budget = _budget.get()
+    billed = solver.billed
+    price = SOLVE_PRICES.get(task_type, DEFAULT_SOLVE_PRICE) if billed else 0.0
+    if budget and billed and not budget.reserve(price):
+        _account(budget, task_type, "over_budget", 0.0, 0.0)
+        return None
+    started = time.monotonic()
+    try:
+        token, outcome = solver.solve_with_outcome(
+            {"type": task_type, "websiteURL": page_url, "websiteKey": site_key}
+        )
+    finally:
+        if budget and billed:
+            budget.release(price)
+    _account(budget, task_type, outcome, time.monotonic() - started,
+             price if outcome == "solved" else 0.0, billed=billed)
+    return token
+
+
+def _solver_pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SOLVER_THREADS, thread_name_prefix="captcha")
+        return _executor
+
+
+def _done(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _pooled(task_type: str, page_url: str, site_key: str) -> Future | None:
+    token_pool.remember(task_type, page_url, site_key)
+    return token_pool.take(task_type, page_url, site_key)
+
+
+def _solve_async(task_type: str, page_url: str, site_key: str) -> Future:
+    pooled = _pooled(task_type, page_url, site_key)
+    if pooled:
+        return pooled
+    if not site_key or not get_solver():
+        return _done(None)  # nothing to wait for — don't occupy a solver thread
+    return _submit(_solve, task_type, page_url, site_key)
+
+
+def _submit(fn, *args) -> Future:
+    # Solver threads don't inherit the caller's context; carry the run budget
+    # and broker over so the solve is accounted to them
+    return _solver_pool().submit(contextvars.copy_context().run, fn, *args)
 
 
 def solve_recaptcha_v2(page_url: str, site_key: str) -> str | None:
@@ -85,14 +425,8 @@ def solve_recaptcha_v2(page_url: str, site_key: str) -> str | None:
     Solve a reCAPTCHA v2 challenge.
     Returns the g-recaptcha-response token, or None if unavailable.
     """
-    task_id = _create_task({
-        "type": "ReCaptchaV2TaskProxyLess",
-        "websiteURL": page_url,
-        "websiteKey": site_key,
-    })
-    if not task_id:
-        return None
-    return _poll_result(task_id)
+    pooled = _pooled(RECAPTCHA_V2, page_url, site_key)
+    return pooled.result() if pooled else _solve(RECAPTCHA_V2, page_url, site_key)
 
 
 def solve_turnstile(page_url: str, site_key: str) -> str | None:
@@ -100,14 +434,149 @@ def solve_turnstile(page_url: str, site_key: str) -> str | None:
     Solve a Cloudflare Turnstile challenge.
     Returns the cf-turnstile-response token, or None if unavailable.
     """
-    task_id = _create_task({
-        "type": "AntiTurnstileTaskProxyLess",
-        "websiteURL": page_url,
-        "websiteKey": site_key,
-    })
-    if not task_id:
+    pooled = _pooled(TURNSTILE, page_url, site_key)
+    return pooled.result() if pooled else _solve(TURNSTILE, page_url, site_key)
+
+
+def solve_recaptcha_v2_async(page_url: str, site_key: str) -> Future:
+    """Start solving a reCAPTCHA v2 in the shared solver pool. The Future resolves to the token or None."""
+    return _solve_async(RECAPTCHA_V2, page_url, site_key)
+
+
+def solve_turnstile_async(page_url: str, site_key: str) -> Future:
+    """Start solving a Turnstile in the shared solver pool. The Future resolves to the token or None."""
+    return _solve_async(TURNSTILE, page_url, site_key)
+
+
+# ── Token pool ─────────────────────────────────────────────────────────────────
+# Sitekeys are stable, so a run can solve ahead for the brokers it has queued
+# and hand the handler a finished token when it reaches the captcha.
+
+class TokenPool:
+    """
+    Tokens solved ahead of time, keyed by (task type, page URL, sitekey).
+    The page URL is compared without its query string. A token is only
+    handed out while it has at least TOKEN_MARGIN seconds of its validity
+    window (TOKEN_TTL) left; expired ones are dropped. Sitekeys seen by
+    solves are remembered per page so later brokers can prefetch them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = {}      # key → [(token, expires_at)]
+        self._pending = {}    # key → [Future] solving, not yet claimed
+        self._known = {}      # page URL → {key}
+        self.stats = {"prefetched": 0, "hits": 0, "expired": 0}
+
+    @staticmethod
+    def page(url: str) -> str:
+        parts = urlsplit(url or "")
+        return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+    @classmethod
+    def key(cls, task_type: str, page_url: str, site_key: str) -> tuple:
+        return task_type, cls.page(page_url), site_key
+
+    def remember(self, task_type: str, page_url: str, site_key: str):
+        if not site_key:
+            return
+        key = self.key(task_type, page_url, site_key)
+        with self._lock:
+            self._known.setdefault(key[1], set()).add(key)
+
+    def known_for(self, url: str) -> list:
+        """
+        Known (task type, page URL, sitekey) keys for the page at `url` — seen
+        by solves or in the sitekey cache. Other pages on the same host are
+        left out: their captchas are not ones this page will show.
+        """
+        origin, path = _page_parts(url)
+        keys = set()
+        for kind, task_type in TASK_TYPES.items():
+            site_key = get_sitekey(origin, path, kind)
+            if site_key:
+                keys.add(self.key(task_type, url, site_key))
+        with self._lock:
+            keys |= self._known.get(self.page(url), set())
+        return sorted(keys)
+
+    def prefetch(self, task_type: str, page_url: str, site_key: str, count: int = 1) -> int:
+        """Start solving until `count` tokens for this key are ready or on their way. Returns how many started."""
+        if not site_key or not get_solver():
+            return 0
+        key = self.key(task_type, page_url, site_key)
+        with self._lock:
+            self._evict(key)
+            missing = count - len(self._ready.get(key, ())) - len(self._pending.get(key, ()))
+            for _ in range(max(0, missing)):
+                future = _submit(_solve, task_type, page_url, site_key)
+                self._pending.setdefault(key, []).append(future)
+                future.add_done_callback(lambda f, key=key: self._finished(key, f))
+                self.stats["prefetched"] += 1
+        return max(0, missing)
+
+    def _finished(self, key: tuple, future: Future):
+        with self._lock:
+            pending = self._pending.get(key, [])
+            if future not in pending:
+                return  # already claimed by take()
+            pending.remove(future)
+            token = None if future.cancelled() or future.exception() else future.result()
+            if token:
+                expires_at = time.monotonic() + TOKEN_TTL.get(key[0], DEFAULT_TOKEN_TTL)
+                self._ready.setdefault(key, []).append((token, expires_at))
+            self._prune(key)
+
+    def _evict(self, key: tuple):
+        fresh = [(t, exp) for t, exp in self._ready.get(key, ()) if exp - time.monotonic() > TOKEN_MARGIN]
+        self.stats["expired"] += len(self._ready.get(key, ())) - len(fresh)
+        self._ready[key] = fresh
+        self._prune(key)
+
+    def _prune(self, key: tuple):
+        """Drop a key's empty lists, so keys seen once don't stay in the pool."""
+        if not self._ready.get(key):
+            self._ready.pop(key, None)
+        if not self._pending.get(key):
+            self._pending.pop(key, None)
+
+    def take(self, task_type: str, page_url: str, site_key: str) -> Future | None:
+        """A Future for a pooled token — ready or still solving — or None if there is none."""
+        if not site_key:
+            return None
+        key = self.key(task_type, page_url, site_key)
+        with self._lock:
+            self._evict(key)
+            if self._ready.get(key):
+                self.stats["hits"] += 1
+                token = self._ready[key].pop(0)[0]
+                self._prune(key)
+                return _done(token)
+            if self._pending.get(key):
+                self.stats["hits"] += 1
+                future = self._pending[key].pop(0)
+                self._prune(key)
+                return future
         return None
-    return _poll_result(task_id)
+
+
+token_pool = TokenPool()
+
+
+def prefetch_for_broker(broker: dict) -> int:
+    """
+    Start solving the captchas `broker` is known to show: its registry
+    "captcha" spec ({"type": "turnstile" | "recaptcha_v2", "sitekey", "url"}),
+    or sitekeys seen on its opt-out page earlier. Returns how many solves started.
+    """
+    spec = broker.get("captcha") or {}
+    url = spec.get("url") or broker.get("opt_out_url", "")
+    if spec.get("sitekey"):
+        task_type = TASK_TYPES.get(spec.get("type"), TURNSTILE)
+        keys = [token_pool.key(task_type, url, spec["sitekey"])]
+    else:
+        keys = token_pool.known_for(url)
+    return sum(token_pool.prefetch(*key) for key in keys)
 
 
 def inject_recaptcha_token(page, token: str):
@@ -130,8 +599,39 @@ def inject_turnstile_token(page, token: str):
     """)
 
 
-def extract_recaptcha_sitekey(page) -> str | None:
-    """Extract the reCAPTCHA v2 site key from the current page."""
+# ── Sitekey extraction ─────────────────────────────────────────────────────────
+# A broker's sitekey is a constant, so the one found on a page is cached in
+# SQLite per page (origin + path) and kind. Next time a single probe confirms
+# it is still on the page; the full scan — which for Turnstile serializes the
+# whole document — only runs on a miss or when the key has changed.
+
+SITEKEY_PROBE_JS = """
+(key) => {
+    if (document.querySelector(`[data-sitekey="${CSS.escape(key)}"]`)) return true;
+    for (const f of document.querySelectorAll("iframe[src]")) if (f.src.includes(key)) return true;
+    for (const s of document.scripts) if (!s.src && s.text.includes(key)) return true;
+    return false;
+}
+"""
+
+
+def _page_parts(url: str) -> tuple:
+    parts = urlsplit(url or "")
+    return f"{parts.scheme}://{parts.netloc}", parts.path or "/"
+
+
+def _cached_sitekey(page, kind: str, scan) -> str | None:
+    origin, path = _page_parts(page.url)
+    cached = get_sitekey(origin, path, kind)
+    if cached and page.evaluate(SITEKEY_PROBE_JS, cached):
+        return cached
+    site_key = scan(page)
+    if site_key and site_key != cached:
+        save_sitekey(origin, path, kind, site_key)
+    return site_key
+
+
+def _scan_recaptcha_sitekey(page) -> str | None:
     el = page.query_selector(".g-recaptcha[data-sitekey]")
     if el:
         return el.get_attribute("data-sitekey")
@@ -145,13 +645,21 @@ def extract_recaptcha_sitekey(page) -> str | None:
     return None
 
 
-def extract_turnstile_sitekey(page) -> str | None:
-    """Extract the Cloudflare Turnstile site key from the current page."""
+def _scan_turnstile_sitekey(page) -> str | None:
     el = page.query_selector("[data-sitekey]")
     if el:
         return el.get_attribute("data-sitekey")
     # Check script tags for sitekey
     content = page.content()
-    import re
     m = re.search(r"sitekey['\"]?\s*[:=]\s*['\"]([0-9a-zA-Z_\-]+)['\"]", content)
     return m.group(1) if m else None
+
+
+def extract_recaptcha_sitekey(page) -> str | None:
+    """Extract the reCAPTCHA v2 site key from the current page."""
+    return _cached_sitekey(page, "recaptcha_v2", _scan_recaptcha_sitekey)
+
+
+def extract_turnstile_sitekey(page) -> str | None:
+    """Extract the Cloudflare Turnstile site key from the current page."""
+    return _cached_sitekey(page, "turnstile", _scan_turnstile_sitekey)
@@ -3,8 +3,10 @@ Generic email opt-out handler.
 Used by any broker with method='email' in registry.json.
 Requires SMTP_USER and SMTP_PASS in .env to automate.
 Without SMTP, returns manual_required with the opt-out email address.
+
+The email is queued in the outbox (core/outbox.py) and sent in the
+background; the request stays "pending" until it has gone out.
 """
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from pathlib import Path
@@ -12,7 +14,8 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from brokers.handlers.base import BaseHandler
-from config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_CONFIGURED
+from config import SMTP_USER, SMTP_CONFIGURED
+from core.outbox import queue_email
 
 
 class Handler(BaseHandler):
@@ -50,36 +53,14 @@ class Handler(BaseHandler):
             msg["Subject"] = subject
             msg.attach(MIMEText(body, "plain"))
 
-            self._send(msg)
-            return {"status": "submitted", "notes": f"Opt-out email sent to {opt_out_email}"}
+            outbox_id = queue_email(self.broker["id"], msg)
+            return {
+                "status": "pending",
+                "notes": f"Opt-out email to {opt_out_email} queued for sending",
+                "outbox_id": outbox_id,
+            }
         except Exception as exc:
-            return {"status": "error", "notes": f"SMTP error: {exc}"}
-
-    def _send(self, msg):
-        """Try STARTTLS (port 587) first, fall back to SSL (port 465) on connection errors only."""
-        # Attempt 1: STARTTLS
-        starttls_failed = False
-        try:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as server:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(SMTP_USER, SMTP_PASS)
-                server.send_message(msg)
-            return
-        except smtplib.SMTPAuthenticationError:
-            # Auth failed — no point retrying with SSL, same creds won't work
-            raise
-        except (smtplib.SMTPException, OSError):
-            # Connection/TLS issue — try SSL instead
-            starttls_failed = True
-
-        # Attempt 2: SSL on port 465 (only if STARTTLS had a connection error)
-        if starttls_failed:
-            with smtplib.SMTP_SSL(SMTP_HOST, 465, timeout=30) as server:
-                server.ehlo()
-                server.login(SMTP_USER, SMTP_PASS)
-                server.send_message(msg)
+            return {"status": "error", "notes": f"Could not queue email: {exc}"}
 
     def _default_template(self) -> str:
         return (
@@ -1,17 +1,19 @@
 """
 FastPeopleSearch opt-out handler.
-Flow: search → find profile URL → submit removal request.
+Flow: search → keep every listing matching the profile → submit a removal request for each.
 Uses stealthy browser to bypass bot detection.
 """
-from brokers.handlers.base import BaseHandler, make_stealthy_page, is_bot_wall
+from brokers.handlers.base import BaseHandler, is_bot_wall, fill_fields, combine_results, playwright_session
+from brokers.handlers.matcher import extract_candidates, rank_candidates
 
 OPT_OUT_URL = "https://www.fastpeoplesearch.com/removal"
+RESULT_LINKS = "a.btn-primary, .card-block a[href*='/address/']"
 
 
 class Handler(BaseHandler):
     def submit(self) -> dict:
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
         except ImportError:
             return {
                 "status": "manual_required",
@@ -28,68 +30,81 @@ class Handler(BaseHandler):
         last = self.profile.get("last_name", "")
 
         try:
-            with sync_playwright() as p:
-                browser, page = make_stealthy_page(p)
-
-                # Step 1: Search
-                search_url = (
-                    f"https://www.fastpeoplesearch.com/name/{first}-{last}_{self.state}"
-                ).replace(" ", "-")
-
-                page.goto(search_url, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                if is_bot_wall(page.title()):
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": f"Site blocked automated access (Cloudflare). Visit {OPT_OUT_URL} manually.",
-                    }
-
-                cards = page.query_selector_all("a.btn-primary, .card-block a[href*='/address/']")
-                if not cards:
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": f"No listing found automatically. Visit {OPT_OUT_URL} manually.",
-                    }
-
-                profile_url = cards[0].get_attribute("href")
-                if not profile_url.startswith("http"):
-                    profile_url = "https://www.fastpeoplesearch.com" + profile_url
-
-                # Step 2: Removal form
-                page.goto(OPT_OUT_URL, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                if is_bot_wall(page.title()):
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": f"Removal page blocked by Cloudflare. Visit {OPT_OUT_URL} and paste: {profile_url}",
-                    }
-
-                url_input = page.query_selector(
-                    "input[type='url'], input[name*='url'], input[name*='URL']"
-                )
-                if url_input:
-                    url_input.fill(profile_url)
-                    page.keyboard.press("Enter")
-                    page.wait_for_timeout(3000)
-                    browser.close()
-                    return {
-                        "status": "submitted",
-                        "notes": f"Removal submitted for: {profile_url}",
-                    }
-
-                browser.close()
-                return {
-                    "status": "manual_required",
-                    "notes": f"Found profile at {profile_url}. Visit {OPT_OUT_URL} and paste the URL.",
-                }
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
+
+                profile_urls = self.cached_listing_urls()
+                if not profile_urls:
+                    # Step 1: Search
+                    search_url = (
+                        f"https://www.fastpeoplesearch.com/name/{first}-{last}_{self.state}"
+                    ).replace(" ", "-")
+
+                    self.goto(page, search_url, ready=RESULT_LINKS, label="search")
+
+                    if is_bot_wall(page.title()):
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": f"Site blocked automated access (Cloudflare). Visit {OPT_OUT_URL} manually.",
+                        }
+
+                    candidates = extract_candidates(page, RESULT_LINKS)
+                    if not candidates:
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": f"No listing found automatically. Visit {OPT_OUT_URL} manually.",
+                        }
+
+                    matches = rank_candidates(candidates, self.profile, self.broker.get("match_threshold"))
+                    if not matches:
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": f"{len(candidates)} listing(s) found but none matched your profile closely. "
+                                     f"Review them at {page.url} and submit yours at {OPT_OUT_URL}.",
+                        }
+
+                    profile_urls = [m["url"] for m in matches]
+                    for url in profile_urls:
+                        self.remember_listing_url(url)
+
+                # Step 2: Removal form, once per listing in its own tab
+                results = self.for_each_listing(page, profile_urls, self._remove,
+                                                start_url=lambda url: OPT_OUT_URL)
+                self.close_browser(browser, page)
+                return combine_results(results)
 
         except Exception as exc:
             return {
                 "status": "manual_required",
                 "notes": f"Automation failed ({exc}). Visit {OPT_OUT_URL} manually.",
             }
+
+    def _remove(self, page, profile_url: str) -> dict:
+        """Submit the removal form for one listing."""
+        self.goto(page, OPT_OUT_URL, ready="input[type='url'], input[name*='url'], input[name*='URL']",
+                  label="removal_form")
+
+        if is_bot_wall(page.title()):
+            return {
+                "status": "manual_required",
+                "notes": f"Removal page blocked by Cloudflare. Visit {OPT_OUT_URL} and paste: {profile_url}",
+            }
+
+        # fill_fields leaves the input focused, so Enter submits its form
+        filled = fill_fields(page, {
+            "input[type='url'], input[name*='url'], input[name*='URL']": profile_url,
+        })
+        if any(filled.values()):
+            self.act_and_wait(page, lambda: page.keyboard.press("Enter"), "submit")
+            return {
+                "status": "submitted",
+                "notes": f"Removal submitted for: {profile_url}",
+            }
+
+        return {
+            "status": "manual_required",
+            "notes": f"Found profile at {profile_url}. Visit {OPT_OUT_URL} and paste the URL.",
+        }
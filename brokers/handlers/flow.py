@@ -0,0 +1,345 @@
+"""
+Generic handler that runs a declarative broker flow.
+
+A flow is a JSON file in brokers/flows/ (named after the broker id, or the
+registry entry's "flow" key) listing the steps of an opt-out:
+
+    {
+      "requires": ["email"],
+      "requires_notes": "Email is required. Check your profile.",
+      "steps": [
+        {"goto": "{opt_out_url}"},
+        {"bot_wall": "Site blocked automated access. Visit {opt_out_url} manually."},
+        {"turnstile": "Turnstile could not be solved. Visit {opt_out_url} manually."},
+        {"fill": {"input[type='email'], input[name='email']": "{email}"}},
+        {"click": "button[type='submit'], input[type='submit']",
+         "missing": "Could not submit form. Visit {opt_out_url} manually."},
+        {"done": "Opt-out submitted."}
+      ]
+    }
+
+Each step is a dict whose first key names the operation. Strings are
+formatted with the profile fields and the broker's registry entry
+({first_name}, {email}, {state}, {opt_out_url}, {name}, ...). Flows are
+compiled once into Step objects and recompiled only when the file changes.
+
+Step operations:
+  goto         navigate and wait until the next step's elements exist
+  bot_wall     stop with manual_required if the page is a bot-detection wall
+  turnstile    solve the page's Cloudflare Turnstile, stopping with its notes if there is
+               none ("optional": true → skip if there is none, without waiting for it;
+               "callback": JS function to call with the token; "scan": true looks
+               for a sitekey in the page source too; "unlocks": selector that appears
+               once the page accepted the token)
+  recaptcha    solve a reCAPTCHA v2 if present
+
+  A captcha step only starts the solve. The fill/select_state/check steps after
+  it run while the solver works; the token is awaited and injected just before
+  the next step of any other kind (usually the submit click).
+  bail_if      stop with "notes" if a selector is present (e.g. an unsolvable CAPTCHA)
+  fill         {selector: value} — fill each field that exists and has a value
+               ("required": notes → stop if none of the fields exist)
+  select_state select the profile's state in a <select> (or fill an <input>)
+  check        tick a checkbox if present
+  click        click the first selector that exists (a list is tried in order) and wait
+               for a navigation, form POST or the next step's elements
+               ("missing": notes → stop if none exist, otherwise skip)
+  settle       wait for the next step's elements (e.g. results loaded by script)
+  wait         pause for N milliseconds (last resort)
+  done         stop with status "submitted" (or "status") and the given notes
+
+goto/click/settle accept "ready" (a selector to wait for instead of the next
+step's) and "label" (the name timings are recorded under and budgets are read
+from — see BaseHandler.wait_budget).
+"""
+import json
+import threading
+from pathlib import Path
+
+from brokers.handlers.base import BaseHandler, is_bot_wall, probe, fill_fields, playwright_session
+from brokers.handlers.capsolver_helper import (
+    extract_turnstile_sitekey, solve_turnstile_async, inject_turnstile_token,
+    extract_recaptcha_sitekey, solve_recaptcha_v2_async, inject_recaptcha_token,
+)
+
+FLOWS_DIR = Path(__file__).parent.parent / "flows"
+
+TURNSTILE_SELECTOR = "[data-sitekey], iframe[src*='challenges.cloudflare']"
+RECAPTCHA_SELECTOR = "iframe[src*='recaptcha'], .g-recaptcha"
+
+
+def _render(template: str, values: dict) -> str:
+    return template.format_map(values)
+
+
+def _manual(notes: str) -> dict:
+    return {"status": "manual_required", "notes": notes}
+
+
+# ── Steps ──────────────────────────────────────────────────────────────────────
+# run(handler, page, values) returns None to continue, or a result dict to stop
+# the flow. Steps that act on elements expose selectors(); the compiler hands
+# them to the preceding goto/click/settle as the condition to wait for, so no
+# step waits for networkidle or a fixed delay.
+
+class Step:
+    def __init__(self, arg, options: dict):
+        self.arg = arg
+        self.options = options
+        self.ready = options.get("ready")
+
+    def selectors(self) -> list:
+        """Selectors this step needs on the page, or [] if it doesn't need any."""
+        return []
+
+    def run(self, handler, page, values):
+        raise NotImplementedError
+
+
+class Goto(Step):
+    def run(self, handler, page, values):
+        handler.goto(page, _render(self.arg, values), ready=self.ready,
+                     label=self.options.get("label", "load"))
+
+
+class BotWall(Step):
+    def run(self, handler, page, values):
+        if is_bot_wall(page.title()):
+            return _manual(_render(self.arg, values))
+
+
+class Turnstile(Step):
+    def selectors(self):
+        # An optional widget (often skipped for a restored session) isn't waited for
+        return [] if self.options.get("optional") else [TURNSTILE_SELECTOR]
+
+    def run(self, handler, page, values):
+        # With "scan" the widget may be rendered from script: look for a sitekey even without a container
+        site_key = None
+        if self.options.get("scan") or page.query_selector(TURNSTILE_SELECTOR):
+            site_key = extract_turnstile_sitekey(page)
+        if not site_key:
+            return None if self.options.get("optional") else _manual(_render(self.arg, values))
+        pending = solve_turnstile_async(page.url, site_key)
+        handler.defer(lambda page: self.finish(handler, page, values, pending.result()))
+
+    def finish(self, handler, page, values, token):
+        if not token:
+            return _manual(_render(self.arg, values))
+        inject_turnstile_token(page, token)
+        callback = self.options.get("callback")
+        if callback:
+            page.evaluate(
+                "([fn, token]) => { if (typeof window[fn] === 'function') window[fn](token); }",
+                [callback, token],
+            )
+        if self.options.get("unlocks"):
+            handler.wait_for(page, self.options["unlocks"], "captcha_unlock")
+
+
+class Recaptcha(Step):
+    def run(self, handler, page, values):
+        if not page.query_selector(RECAPTCHA_SELECTOR):
+            return None
+        pending = solve_recaptcha_v2_async(page.url, extract_recaptcha_sitekey(page))
+        handler.defer(lambda page: self.finish(handler, page, values, pending.result()))
+
+    def finish(self, handler, page, values, token):
+        if not token:
+            return _manual(_render(self.arg, values))
+        inject_recaptcha_token(page, token)
+
+
+class BailIf(Step):
+    def run(self, handler, page, values):
+        if page.query_selector(self.arg):
+            return _manual(_render(self.options.get("notes", "Manual action required."), values))
+
+
+class Fill(Step):
+    def selectors(self):
+        return list(self.arg)
+
+    def run(self, handler, page, values):
+        found = fill_fields(page, {s: _render(t, values) for s, t in self.arg.items()})
+        if not any(found.values()) and self.options.get("required"):
+            return _manual(_render(self.options["required"], values))
+
+
+class SelectState(Step):
+    def selectors(self):
+        return [self.arg]
+
+    def run(self, handler, page, values):
+        fill_fields(page, {self.arg: values["state"]})
+
+
+class Check(Step):
+    def selectors(self):
+        return [self.arg]
+
+    def run(self, handler, page, values):
+        el = page.query_selector(self.arg)
+        if el:
+            el.check()
+
+
+class Click(Step):
+    def __init__(self, arg, options):
+        super().__init__([arg] if isinstance(arg, str) else list(arg), options)
+
+    def selectors(self):
+        return self.arg
+
+    def run(self, handler, page, values):
+        selector = probe(page, {"click": self.arg})["click"]
+        if selector:
+            handler.click_and_wait(page, page.query_selector(selector), self.options.get("label", "click"),
+                                   ready=self.ready)
+            return None
+        if self.options.get("missing"):
+            return _manual(_render(self.options["missing"], values))
+
+
+class Settle(Step):
+    """Wait for the elements the next step needs (e.g. search results rendered by XHR)."""
+    def run(self, handler, page, values):
+        if self.ready:
+            handler.wait_for(page, self.ready, self.options.get("label", "settle"))
+
+
+class Wait(Step):
+    def run(self, handler, page, values):
+        page.wait_for_timeout(int(self.arg))
+
+
+class Done(Step):
+    def run(self, handler, page, values):
+        return {
+            "status": self.options.get("status", "submitted"),
+            "notes": _render(self.arg, values),
+        }
+
+
+STEP_TYPES = {
+    "goto": Goto,
+    "bot_wall": BotWall,
+    "turnstile": Turnstile,
+    "recaptcha": Recaptcha,
+    "bail_if": BailIf,
+    "fill": Fill,
+    "select_state": SelectState,
+    "check": Check,
+    "click": Click,
+    "settle": Settle,
+    "wait": Wait,
+    "done": Done,
+}
+
+# Steps after which the page may change, so they wait for what comes next
+WAITING_STEPS = (Goto, Click, Settle)
+
+# Steps that only fill in the form — they run while a captcha is being solved
+FORM_STEPS = (Fill, SelectState, Check)
+
+
+# ── Compilation ────────────────────────────────────────────────────────────────
+
+class Flow:
+    def __init__(self, spec: dict):
+        self.requires = tuple(spec.get("requires", ()))
+        self.requires_notes = spec.get("requires_notes", "Required profile fields are missing. Check your profile.")
+        self.steps = tuple(self._compile_step(s) for s in spec["steps"])
+        self._link_waits()
+
+    @staticmethod
+    def _compile_step(spec: dict) -> Step:
+        op, arg = next(iter(spec.items()))
+        if op not in STEP_TYPES:
+            raise ValueError(f"Unknown flow step: {op}")
+        options = {k: v for k, v in spec.items() if k != op}
+        return STEP_TYPES[op](arg, options)
+
+    def _link_waits(self):
+        """Give each goto/click/settle the selectors of the next step that needs elements."""
+        for i, step in enumerate(self.steps):
+            if not isinstance(step, WAITING_STEPS) or step.ready:
+                continue
+            for later in self.steps[i + 1:]:
+                if later.selectors():
+                    step.ready = ", ".join(later.selectors())
+                    break
+                if isinstance(later, WAITING_STEPS):
+                    break
+
+
+_compiled: dict = {}
+_lock = threading.Lock()
+
+
+def load_flow(name: str) -> Flow:
+    """Compile brokers/flows/<name>.json, reusing the cached Flow until the file changes."""
+    path = FLOWS_DIR / f"{name}.json"
+    mtime = path.stat().st_mtime_ns
+    cached = _compiled.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _lock:
+        with open(path, encoding="utf-8") as f:
+            flow = Flow(json.load(f))
+        _compiled[name] = (mtime, flow)
+    return flow
+
+
+# ── Handler ────────────────────────────────────────────────────────────────────
+
+class Handler(BaseHandler):
+    def __init__(self, profile: dict, broker: dict):
+        super().__init__(profile, broker)
+        self._deferred = []
+
+    def defer(self, finish):
+        """Queue finish(page) — result dict or None — to run before the next non-form step."""
+        self._deferred.append(finish)
+
+    def _run_deferred(self, page) -> dict | None:
+        while self._deferred:
+            result = self._deferred.pop(0)(page)
+            if result:
+                return result
+        return None
+
+    def submit(self) -> dict:
+        opt_out_url = self.broker.get("opt_out_url", "")
+        try:
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
+        except ImportError:
+            return _manual(
+                f"Playwright not installed. Run: playwright install chromium. Manual URL: {opt_out_url}"
+            )
+
+        flow = load_flow(self.broker.get("flow") or self.broker["id"])
+        values = self.template_values()
+        if not all(values[field] for field in flow.requires):
+            return _manual(flow.requires_notes)
+
+        try:
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
+                try:
+                    for step in flow.steps:
+                        if not isinstance(step, FORM_STEPS):
+                            result = self._run_deferred(page)
+                            if result:
+                                return result
+                        result = step.run(self, page, values)
+                        if result:
+                            return result
+                    return self._run_deferred(page) or _manual(
+                        f"Flow ended without submitting. Visit {opt_out_url} manually."
+                    )
+                finally:
+                    self.close_browser(browser, page)
+
+        except Exception as exc:
+            return _manual(f"Automation failed ({exc}). Visit {opt_out_url} manually.")
@@ -0,0 +1,235 @@
+"""
+HTTP-only handler for brokers whose opt-out is a plain HTML form POST.
+
+A broker opts in with an "http_form" spec in registry.json:
+
+    "http_form": {
+      "url": "https://example.com/optout",      (default: opt_out_url)
+      "form_field": "email",                    pick the form that has this input
+      "fields": {"name": "{full_name}", "email": "{email}", "state": "{state}"},
+      "recaptcha": true,                        solve a reCAPTCHA v2 if the page has one
+                                                (only for brokers without a browser handler)
+      "success_text": ["request received"]      text that proves it worked (required)
+    }
+
+The page is fetched with a pooled requests.Session, hidden inputs (CSRF tokens,
+form nonces) are carried over from the form, the profile fields are filled in
+and the form is posted back. Only a response containing one of success_text
+counts as "submitted"; a spec without it is never used. Anything else means
+the engine falls back to the broker's Playwright handler, so a spec can be
+added optimistically — the worst case is one cheap GET before the browser starts.
+A success_text phrase that already appears on the form page proves nothing and
+is ignored. A form behind a reCAPTCHA is left to the browser handler when the
+broker has one, so the CAPTCHA is never solved twice for one opt-out.
+"""
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from brokers.handlers.base import BaseHandler, is_bot_wall, USER_AGENT
+from brokers.handlers.capsolver_helper import solve_recaptcha_v2
+
+REQUEST_TIMEOUT = 20
+
+# Statuses Cloudflare and friends answer with instead of the real page
+CHALLENGE_STATUSES = (403, 429, 503)
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    The calling thread's pooled session: keep-alive connections and a cookie
+    jar shared by every HTTP submission that thread makes.
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+        _local.session = session
+    return session
+
+
+# ── HTML parsing ───────────────────────────────────────────────────────────────
+
+class Form:
+    def __init__(self, attrs: dict):
+        self.action = attrs.get("action") or ""
+        self.method = (attrs.get("method") or "get").lower()
+        self.fields = {}       # name → default value, in document order
+        self.selects = {}      # name → [(value, label)]
+        self.recaptcha_sitekey = None
+
+
+class FormParser(HTMLParser):
+    """Collects every <form> with its inputs, selects and reCAPTCHA sitekey, plus the <title>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self.title = ""
+        self._form = None
+        self._select = None
+        self._option = None
+        self._in_title = False
+        self._sitekey = None   # widgets are sometimes rendered just outside the <form>
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title":
+            self._in_title = True
+        elif tag == "form":
+            self._form = Form(attrs)
+            self.forms.append(self._form)
+        if "data-sitekey" in attrs and "g-recaptcha" in (attrs.get("class") or ""):
+            self._sitekey = attrs["data-sitekey"]
+            if self._form:
+                self._form.recaptcha_sitekey = self._sitekey
+        if not self._form or not attrs.get("name") and tag != "option":
+            return
+        if tag == "input":
+            if attrs.get("type", "text").lower() in ("submit", "button", "image", "reset", "file"):
+                return
+            if attrs.get("type", "").lower() in ("checkbox", "radio") and "checked" not in attrs:
+                self._form.fields.setdefault(attrs["name"], None)
+                return
+            self._form.fields[attrs["name"]] = attrs.get("value") or ""
+        elif tag == "textarea":
+            self._form.fields[attrs["name"]] = ""
+        elif tag == "select":
+            self._select = attrs["name"]
+            self._form.fields[self._select] = ""
+            self._form.selects[self._select] = []
+        elif tag == "option" and self._select:
+            self._option = [attrs.get("value"), ""]
+            if "selected" in attrs:
+                self._form.fields[self._select] = attrs.get("value") or ""
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if self._option is not None:
+            self._option[1] += data
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "option" and self._option is not None:
+            value, label = self._option
+            label = label.strip()
+            self._form.selects[self._select].append((label if value is None else value, label))
+            self._option = None
+        elif tag == "select":
+            self._select = None
+        elif tag == "form":
+            if self._form and not self._form.recaptcha_sitekey:
+                self._form.recaptcha_sitekey = self._sitekey
+            self._form = None
+
+
+def parse_forms(html: str) -> FormParser:
+    parser = FormParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def _option_value(options: list, wanted: str) -> str:
+    """Match a profile value (e.g. "Texas" or "TX") to a <select>'s option value."""
+    wanted_lower = wanted.strip().lower()
+    for value, label in options:
+        if wanted_lower in (value.lower(), label.lower()):
+            return value
+    abbrev = wanted.strip()[:2].upper()
+    for value, _ in options:
+        if value.upper() == abbrev:
+            return value
+    return wanted
+
+
+# ── Handler ────────────────────────────────────────────────────────────────────
+
+class Handler(BaseHandler):
+    def submit(self) -> dict:
+        spec = self.broker.get("http_form") or {}
+        url = spec.get("url") or self.broker.get("opt_out_url", "")
+        if not url:
+            return {"status": "error", "notes": "No opt-out URL for the HTTP form."}
+        if not spec.get("success_text"):
+            return {"status": "error", "notes": "HTTP form spec has no success_text to confirm a submission."}
+
+        values = self.template_values()
+        missing = [f for f in self.broker.get("fields_required", []) if not values.get(f)]
+        if missing:
+            return {
+                "status": "manual_required",
+                "notes": f"Required profile fields are missing ({', '.join(missing)}). Check your profile.",
+            }
+
+        session = get_session()
+        resp = session.get(url, timeout=REQUEST_TIMEOUT)
+        page = parse_forms(resp.text)
+        if resp.status_code in CHALLENGE_STATUSES or is_bot_wall(page.title):
+            return {"status": "manual_required", "notes": f"Bot challenge on {url} (HTTP {resp.status_code})."}
+
+        form_field = spec.get("form_field")
+        forms = [f for f in page.forms if not form_field or form_field in f.fields]
+        if not forms:
+            return {"status": "error", "notes": f"Opt-out form not found on {resp.url}."}
+        form = forms[0]
+
+        # Phrases already on the form page would "confirm" a rejected post too
+        page_text = resp.text.lower()
+        confirmations = [t for t in spec["success_text"] if t.lower() not in page_text]
+        if not confirmations:
+            return {"status": "error", "notes": "Every success_text phrase also appears on the form page."}
+
+        # Start from the form's own values (hidden CSRF tokens, nonces, defaults)
+        data = {k: v for k, v in form.fields.items() if v is not None}
+        for name, template in spec.get("fields", {}).items():
+            value = template.format_map(values)
+            if not value:
+                continue
+            if name in form.selects:
+                value = _option_value(form.selects[name], value)
+            data[name] = value
+
+        if form.recaptcha_sitekey:
+            if self.broker.get("handler"):
+                return {"status": "manual_required", "notes": "Form has a reCAPTCHA; left to the browser handler."}
+            if not spec.get("recaptcha"):
+                return {"status": "manual_required", "notes": "Form has a reCAPTCHA the HTTP spec doesn't handle."}
+            token = solve_recaptcha_v2(resp.url, form.recaptcha_sitekey)
+            if not token:
+                return {"status": "manual_required", "notes": "reCAPTCHA could not be solved."}
+            data["g-recaptcha-response"] = token
+
+        action = urljoin(resp.url, form.action or resp.url)
+        if form.method == "post":
+            result = session.post(action, data=data, timeout=REQUEST_TIMEOUT, headers={"Referer": resp.url})
+        else:
+            result = session.get(action, params=data, timeout=REQUEST_TIMEOUT, headers={"Referer": resp.url})
+
+        return self._check_result(result, confirmations)
+
+    @staticmethod
+    def _check_result(resp, confirmations: list) -> dict:
+        if resp.status_code >= 400:
+            return {"status": "error", "notes": f"Form POST returned HTTP {resp.status_code}."}
+
+        body = resp.text
+        if any(t.lower() in body.lower() for t in confirmations):
+            return {"status": "submitted", "notes": "Opt-out form submitted over HTTP."}
+        if is_bot_wall(parse_forms(body).title):
+            return {"status": "manual_required", "notes": "Bot challenge after submitting the form."}
+        return {"status": "error", "notes": "Confirmation text not found after submitting the form."}
@@ -0,0 +1,247 @@
+"""
+Identity matching for search-result pages.
+
+Search handlers used to take the first result, which with a common name
+either opts out a stranger or misses the right record. Instead:
+
+    matches = find_matches(page, self.profile, "a[href*='/voter/']")
+    for m in matches:           # best first, all above the threshold
+        ... m["url"], m["score"], m["text"] ...
+
+find_matches() collects every candidate (the result link plus the text of
+the card around it) in one page.evaluate, then scores each card against the
+profile: name, age / date of birth, city, state and phone. Scores are
+normalised by the fields the profile actually has, so a sparse profile is not
+penalised for what it can't tell apart. A name alone is never enough: a card
+must also agree on the city, state, age or phone, whichever the profile has.
+A registry entry can override the threshold with "match_threshold".
+"""
+import re
+from datetime import date
+
+from brokers.handlers.base import selector_parts
+
+MATCH_THRESHOLD = 0.65
+
+# Most results a broker submits per run, however many pass the threshold
+MAX_MATCHES = 5
+
+WEIGHTS = {
+    "last_name": 0.30,
+    "first_name": 0.25,
+    "age": 0.15,
+    "city": 0.10,
+    "state": 0.10,
+    "phone": 0.20,
+}
+
+# An age that is clearly someone else's costs more than a missing one
+AGE_CONFLICT_PENALTY = 0.30
+
+STATE_CODES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "district of columbia": "DC",
+    "florida": "FL", "georgia": "GA", "hawaii": "HI", "idaho": "ID", "illinois": "IL",
+    "indiana": "IN", "iowa": "IA", "kansas": "KS", "kentucky": "KY", "louisiana": "LA",
+    "maine": "ME", "maryland": "MD", "massachusetts": "MA", "michigan": "MI", "minnesota": "MN",
+    "mississippi": "MS", "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY",
+    "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR",
+    "pennsylvania": "PA", "rhode island": "RI", "south carolina": "SC", "south dakota": "SD",
+    "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA",
+    "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+}
+
+# Walks up from each result link to the smallest ancestor that looks like a
+# whole result card (several lines of text), tags it so it can be clicked
+# later, and returns its text and link.
+EXTRACT_JS = """
+([parts, card]) => {
+    const norm = (s) => (s || "").replace(/\\s+/g, " ").trim().toLowerCase();
+    const seen = new Set();
+    const out = [];
+    for (const [css, text] of parts) {
+        let els;
+        try { els = document.querySelectorAll(css); } catch (e) { continue; }
+        for (const el of els) {
+            if (seen.has(el) || (text !== null && !norm(el.textContent).includes(text))) continue;
+            seen.add(el);
+            let box = card ? el.closest(card) : null;
+            if (!box) {
+                box = el;
+                for (let i = 0; i < 6 && box.parentElement; i++) {
+                    const t = box.innerText || "";
+                    if (t.length > 40 && t.includes("\\n")) break;
+                    box = box.parentElement;
+                }
+            }
+            const index = out.length;
+            el.setAttribute("data-incognish-candidate", String(index));
+            out.push({ index, url: el.href || null, text: box.innerText || box.textContent || "" });
+        }
+    }
+    return out;
+}
+"""
+
+
+def candidate_selector(candidate: dict) -> str:
+    """Selector for the element find_matches() tagged for this candidate."""
+    return f"[data-incognish-candidate='{candidate['index']}']"
+
+
+def candidate_label(candidate: dict) -> str:
+    """First line of a candidate's card, for log notes."""
+    lines = [l.strip() for l in candidate["text"].splitlines() if l.strip()]
+    return lines[0][:80] if lines else candidate.get("url") or "record"
+
+
+def extract_candidates(page, links: str, card: str = None) -> list:
+    """Every result link on the page with the text of its card: [{index, url, text}]."""
+    return page.evaluate(EXTRACT_JS, [selector_parts(links), card])
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _age(dob: str) -> int | None:
+    try:
+        born = date.fromisoformat(dob.strip()[:10])
+    except (ValueError, AttributeError):
+        return None
+    today = date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def _ages_in(text: str) -> list:
+    found = re.findall(r"\bage[:\s]+(\d{2,3})\b|\b(\d{2,3})\s*(?:years old|yrs|y/o)\b", text, re.I)
+    return [int(a or b) for a, b in found]
+
+
+def _city_hit(words: set, profile: dict) -> bool:
+    city = (profile.get("city") or "").strip().lower()
+    return bool(city) and set(city.split()) <= words
+
+
+def _state_hit(text: str, words: set, profile: dict) -> bool:
+    """
+    The full state name anywhere, or its two-letter code written as an address
+    writes it: upper case after a comma or the city, or before a ZIP. A bare
+    word would let "in", "or", "me" match Indiana, Oregon, Maine.
+    """
+    state = (profile.get("state") or "").strip()
+    if not state:
+        return False
+    if len(state) > 2 and set(state.lower().split()) <= words:
+        return True
+    code = STATE_CODES.get(state.lower(), state.upper() if len(state) == 2 else "")
+    if not code:
+        return False
+    city = (profile.get("city") or "").strip()
+    before = r",\s*" + (rf"|(?i:\b{re.escape(city)})\s+" if city else "")
+    return re.search(rf"(?:(?:{before}){code}|\b{code}\s+\d{{5}})\b", text) is not None
+
+
+def _age_hit(text: str, words: set, age: int) -> tuple:
+    """(hit, conflict): the card shows the profile's age or birth year / a clearly different age."""
+    ages = _ages_in(text)
+    hit = any(abs(a - age) <= 1 for a in ages) or str(date.today().year - age) in words
+    return hit, bool(ages) and not hit
+
+
+def _phone_digits(profile: dict) -> str:
+    return re.sub(r"\D", "", profile.get("phone") or "")[-7:]
+
+
+def location_matches(text: str, profile: dict) -> bool:
+    """Whether a card names the profile's city or state (True if the profile has neither)."""
+    if not (profile.get("city") or "").strip() and not (profile.get("state") or "").strip():
+        return True
+    words = _words(text)
+    return _city_hit(words, profile) or _state_hit(text, words, profile)
+
+
+def corroborated(text: str, profile: dict) -> bool:
+    """
+    Whether a card agrees with the profile on more than the name: its city,
+    state, age or phone. True if the profile has none of those to compare.
+    """
+    words = _words(text)
+    age = _age(profile.get("date_of_birth") or "")
+    digits = _phone_digits(profile)
+    checks = []
+    if (profile.get("city") or "").strip() or (profile.get("state") or "").strip():
+        checks.append(location_matches(text, profile))
+    if age is not None:
+        checks.append(_age_hit(text, words, age)[0])
+    if len(digits) == 7:
+        checks.append(digits in re.sub(r"\D", "", text))
+    return not checks or any(checks)
+
+
+def score_candidate(text: str, profile: dict) -> float:
+    """0..1 — how well a result card's text matches the profile."""
+    words = _words(text)
+    first = (profile.get("first_name") or "").strip().lower()
+    last = (profile.get("last_name") or "").strip().lower()
+    if not last or not set(last.split()) <= words:
+        return 0.0  # different surname: never a match
+
+    earned = possible = penalty = 0.0
+
+    def component(name, available, hit, partial=0.0):
+        nonlocal earned, possible
+        if not available:
+            return
+        possible += WEIGHTS[name]
+        earned += WEIGHTS[name] * (1.0 if hit else partial)
+
+    component("last_name", True, True)
+    initial = bool(first) and any(w == first[0] for w in words)
+    component("first_name", bool(first), first in words, partial=0.4 if initial else 0.0)
+
+    age = _age(profile.get("date_of_birth") or "")
+    if age is not None:
+        hit, conflict = _age_hit(text, words, age)
+        if conflict:
+            penalty += AGE_CONFLICT_PENALTY
+        component("age", True, hit)
+
+    component("city", bool((profile.get("city") or "").strip()), _city_hit(words, profile))
+    component("state", bool((profile.get("state") or "").strip()), _state_hit(text, words, profile))
+
+    digits = _phone_digits(profile)
+    component("phone", len(digits) == 7, len(digits) == 7 and digits in re.sub(r"\D", "", text))
+
+    return max(0.0, earned - penalty) / possible
+
+
+def rank_candidates(candidates: list, profile: dict, threshold: float = None) -> list:
+    """
+    Score candidates and keep those above the threshold that agree with the
+    profile on more than the name (see corroborated), best first (at most MAX_MATCHES).
+    """
+    threshold = MATCH_THRESHOLD if threshold is None else threshold
+    scored = [{**c, "score": round(score_candidate(c["text"], profile), 2)} for c in candidates]
+    matches = [c for c in scored if c["score"] >= threshold and corroborated(c["text"], profile)]
+    matches.sort(key=lambda c: -c["score"])
+    # A card often links to its record more than once; keep the best-scored copy
+    seen = set()
+    unique = []
+    for c in matches:
+        if c["url"] and c["url"] in seen:
+            continue
+        seen.add(c["url"])
+        unique.append(c)
+    return unique[:MAX_MATCHES]
+
+
+def find_matches(page, profile: dict, links: str, card: str = None, threshold: float = None) -> list:
+    """
+    Candidates on the current page that match the profile, best first:
+    [{index, url, text, score}]. `links` selects the result links (a
+    trailing :has-text('…') is supported), `card` the element around each
+    result if the default walk-up heuristic picks the wrong box.
+    """
+    return rank_candidates(extract_candidates(page, links, card), profile, threshold)
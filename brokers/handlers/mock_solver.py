@@ -0,0 +1,124 @@
+"""
+Local stand-in for the CapSolver API, for testing and load-testing CAPTCHA
+paths offline and for free.
+
+It speaks the same createTask / getTaskResult protocol, so the regular
+client works against it unchanged. Each task is "solved" after a latency
+drawn from [latency - jitter, latency + jitter] seconds; a fraction of tasks
+fail (errorId 1) or never finish (stay "processing" until the client gives up).
+Tasks are forgotten TASK_TTL seconds after they were created — by then the
+client has stopped polling — so "never" tasks don't accumulate under load.
+
+    python cli.py mock-solver --port 8765 --latency 4 --failure-rate 0.1
+
+and in .env:
+
+    CAPTCHA_SOLVER=mock
+    CAPTCHA_SOLVER_URL=http://127.0.0.1:8765
+
+With CAPTCHA_SOLVER=mock and no URL, a server is started in-process on a
+free port instead (start_mock_solver()).
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_TOKEN_PREFIX = "mock-token-"
+
+# The client's longest wait for one task (capsolver_helper.MAX_WAIT), with some slack
+TASK_TTL = 150
+
+
+class MockSolverServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 3.0, jitter: float = 1.0,
+                 failure_rate: float = 0.0, timeout_rate: float = 0.0, task_ttl: float = TASK_TTL):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.task_ttl = task_ttl
+        self.tasks = {}          # task id → {"created_at", "ready_at", "outcome", "type"}
+        self.lock = threading.Lock()
+        self.counts = {"created": 0, "polls": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create(self, task: dict) -> dict:
+        if not task.get("type") or not task.get("websiteKey"):
+            return {"errorId": 1, "errorCode": "ERROR_INVALID_TASK_DATA"}
+        roll = random.random()
+        if roll < self.failure_rate:
+            outcome = "failed"
+        elif roll < self.failure_rate + self.timeout_rate:
+            outcome = "never"
+        else:
+            outcome = "ready"
+        delay = max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        task_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            self.tasks[task_id] = {"created_at": now, "ready_at": now + delay, "outcome": outcome, "type": task["type"]}
+            self.counts["created"] += 1
+        return {"errorId": 0, "taskId": task_id}
+
+    def _expire(self, now: float):
+        for task_id in [k for k, t in self.tasks.items() if now - t["created_at"] > self.task_ttl]:
+            del self.tasks[task_id]
+
+    def result(self, task_id: str) -> dict:
+        with self.lock:
+            self.counts["polls"] += 1
+            self._expire(time.monotonic())
+            task = self.tasks.get(task_id)
+        if not task:
+            return {"errorId": 1, "errorCode": "ERROR_TASKID_INVALID"}
+        if task["outcome"] == "never" or time.monotonic() < task["ready_at"]:
+            return {"errorId": 0, "status": "processing"}
+        with self.lock:
+            self.tasks.pop(task_id, None)
+        if task["outcome"] == "failed":
+            return {"errorId": 1, "errorCode": "ERROR_CAPTCHA_UNSOLVABLE"}
+        token = MOCK_TOKEN_PREFIX + task_id
+        return {"errorId": 0, "status": "ready", "solution": {"token": token, "gRecaptchaResponse": token}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            body = {}
+        if self.path.rstrip("/").endswith("/createTask"):
+            out = self.server.create(body.get("task") or {})
+        elif self.path.rstrip("/").endswith("/getTaskResult"):
+            out = self.server.result(body.get("taskId") or "")
+        else:
+            out = {"errorId": 1, "errorCode": "ERROR_METHOD_NOT_FOUND"}
+        data = json.dumps(out).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def start_mock_solver(host: str = "127.0.0.1", port: int = 0, **options) -> str:
+    """Serve a MockSolverServer from a daemon thread and return its URL (port 0 = any free port)."""
+    server = MockSolverServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="mock-solver", daemon=True).start()
+    return server.url
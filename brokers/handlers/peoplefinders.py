@@ -3,9 +3,9 @@ PeopleFinders opt-out handler.
 Flow: navigate to opt-out page → solve Turnstile → fill form → submit.
 Email confirmation required to finalize removal.
 """
-from brokers.handlers.base import BaseHandler, make_stealthy_page, is_bot_wall
+from brokers.handlers.base import BaseHandler, is_bot_wall, probe, fill_fields, playwright_session
 from brokers.handlers.capsolver_helper import (
-    extract_turnstile_sitekey, solve_turnstile, inject_turnstile_token,
+    extract_turnstile_sitekey, solve_turnstile_async, inject_turnstile_token,
 )
 
 OPT_OUT_URL = "https://www.peoplefinders.com/manage"
@@ -14,7 +14,7 @@ OPT_OUT_URL = "https://www.peoplefinders.com/manage"
 class Handler(BaseHandler):
     def submit(self) -> dict:
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
         except ImportError:
             return {
                 "status": "manual_required",
@@ -31,70 +31,54 @@ class Handler(BaseHandler):
         last = self.profile.get("last_name", "")
 
         try:
-            with sync_playwright() as p:
-                browser, page = make_stealthy_page(p)
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
 
-                page.goto(OPT_OUT_URL, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
+                self.goto(
+                    page, OPT_OUT_URL, label="form",
+                    ready="input[name='firstName'], input[placeholder*='First'], input[name='fn'], [data-sitekey]",
+                )
 
                 if is_bot_wall(page.title()):
-                    browser.close()
+                    self.close_browser(browser, page)
                     return {
                         "status": "manual_required",
                         "notes": f"Site blocked automated access. Visit {OPT_OUT_URL} manually.",
                     }
 
-                # Solve Turnstile if present
+                # Start solving the Turnstile (if present) while the search form is filled
                 turnstile = page.query_selector("[data-sitekey], iframe[src*='challenges.cloudflare']")
+                site_key = extract_turnstile_sitekey(page) if turnstile else None
+                pending = solve_turnstile_async(OPT_OUT_URL, site_key) if site_key else None
+
+                fill_fields(page, {
+                    "input[name='firstName'], input[placeholder*='First'], input[name='fn']": first,
+                    "input[name='lastName'], input[placeholder*='Last'], input[name='ln']": last,
+                    "select[name='state'], input[name='state']": self.state,
+                    "input[type='email'], input[name='email']": self.email,
+                })
+
                 if turnstile:
-                    site_key = extract_turnstile_sitekey(page)
-                    token = solve_turnstile(OPT_OUT_URL, site_key) if site_key else None
+                    token = pending.result() if pending else None
                     if not token:
-                        browser.close()
+                        self.close_browser(browser, page)
                         return {
                             "status": "manual_required",
                             "notes": f"Turnstile could not be solved. Visit {OPT_OUT_URL} manually.",
                         }
                     inject_turnstile_token(page, token)
-                    page.wait_for_timeout(2000)
-
-                # Fill search form
-                first_el = page.query_selector("input[name='firstName'], input[placeholder*='First'], input[name='fn']")
-                last_el  = page.query_selector("input[name='lastName'],  input[placeholder*='Last'],  input[name='ln']")
-                state_el = page.query_selector("select[name='state'], input[name='state']")
-                email_el = page.query_selector("input[type='email'], input[name='email']")
-
-                if first_el and first:
-                    first_el.fill(first)
-                if last_el and last:
-                    last_el.fill(last)
-                if state_el and self.state:
-                    tag = state_el.evaluate("el => el.tagName.toLowerCase()")
-                    if tag == "select":
-                        try:
-                            state_el.select_option(label=self.state)
-                        except Exception:
-                            state_el.select_option(value=self.state[:2].upper())
-                    else:
-                        state_el.fill(self.state)
-                if email_el and self.email:
-                    email_el.fill(self.email)
 
                 submit = page.query_selector("button[type='submit'], input[type='submit']")
                 if submit:
-                    submit.click()
-                    page.wait_for_load_state("networkidle", timeout=20000)
+                    self.click_and_wait(page, submit, "search_submit")
+                    self.wait_for(page, "a:has-text('Opt Out'), button:has-text('Remove')", "search_results")
 
                     # Click opt-out on result if shown
-                    opt_btn = (
-                        page.query_selector("a:has-text('Opt Out')")
-                        or page.query_selector("button:has-text('Remove')")
-                    )
-                    if opt_btn:
-                        opt_btn.click()
-                        page.wait_for_timeout(3000)
-
-                    browser.close()
+                    found = probe(page, {"opt_out": ["a:has-text('Opt Out')", "button:has-text('Remove')"]})
+                    if found["opt_out"]:
+                        self.click_and_wait(page, page.query_selector(found["opt_out"]), "submit")
+
+                    self.close_browser(browser, page)
                     return {
                         "status": "submitted",
                         "notes": (
@@ -103,7 +87,7 @@ class Handler(BaseHandler):
                         ),
                     }
 
-                browser.close()
+                self.close_browser(browser, page)
                 return {
                     "status": "manual_required",
                     "notes": f"Could not find form. Visit {OPT_OUT_URL} manually.",
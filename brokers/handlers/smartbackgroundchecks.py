@@ -1,15 +1,18 @@
 """
 SmartBackgroundChecks opt-out handler.
-Flow: search by name/state → navigate to profile → click removal button.
+Flow: search by name/state → open every listing matching the profile → click removal button.
 An email confirmation may be sent to verify the removal.
 """
-from brokers.handlers.base import BaseHandler, make_stealthy_page, is_bot_wall
+from brokers.handlers.base import BaseHandler, is_bot_wall, probe, fill_fields, combine_results, playwright_session
+from brokers.handlers.matcher import extract_candidates, rank_candidates
+
+RESULT_LINKS = "a[href*='/people/']"
 
 
 class Handler(BaseHandler):
     def submit(self) -> dict:
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
         except ImportError:
             return {
                 "status": "manual_required",
@@ -28,98 +31,57 @@ class Handler(BaseHandler):
         state_slug = self.state.replace(" ", "-")
 
         try:
-            with sync_playwright() as p:
-                browser, page = make_stealthy_page(p)
-
-                # Step 1: Search for the person's listing
-                name_slug = f"{first}-{last}".replace(" ", "-")
-                search_url = (
-                    f"https://www.smartbackgroundchecks.com/people/{name_slug}/{state_slug}"
-                )
-                page.goto(search_url, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                if is_bot_wall(page.title()):
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": "Site is protected by Cloudflare and blocks automated access. "
-                                 "Visit https://www.smartbackgroundchecks.com/optout manually: "
-                                 "search your name, open your listing, click 'Request My Record To Be Removed'.",
-                    }
-
-                # Find a result card link
-                result_links = (
-                    page.query_selector_all("a[href*='/people/']")
-                    or page.query_selector_all(".result a, .card a, .person-card a")
-                )
-                # Filter out the search URL itself
-                profile_url = None
-                for link in result_links:
-                    href = link.get_attribute("href") or ""
-                    if "/people/" in href and state_slug.lower() in href.lower():
-                        profile_url = href
-                        break
-                if not profile_url and result_links:
-                    profile_url = result_links[0].get_attribute("href")
-
-                if not profile_url:
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": "No listing found automatically. "
-                                 "Visit https://www.smartbackgroundchecks.com/optout manually.",
-                    }
-
-                if not profile_url.startswith("http"):
-                    profile_url = "https://www.smartbackgroundchecks.com" + profile_url
-
-                # Step 2: Go to the profile page
-                page.goto(profile_url, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                # Step 3: Click the removal button
-                remove_btn = (
-                    page.query_selector("a:has-text('Remove')")
-                    or page.query_selector("button:has-text('Remove')")
-                    or page.query_selector("a:has-text('Opt Out')")
-                    or page.query_selector("a[href*='optout'], a[href*='opt-out']")
-                )
-
-                if not remove_btn:
-                    browser.close()
-                    return {
-                        "status": "manual_required",
-                        "notes": (
-                            f"Found profile at {profile_url} but could not locate the removal button. "
-                            "Click 'Request My Record To Be Removed' on that page."
-                        ),
-                    }
-
-                remove_btn.click()
-                page.wait_for_load_state("networkidle", timeout=20000)
-
-                # Step 4: Fill email if an opt-out form appears after clicking
-                email_input = page.query_selector(
-                    "input[type='email'], input[name='email'], input[name*='email']"
-                )
-                if email_input and self.email:
-                    email_input.fill(self.email)
-                    submit_btn = page.query_selector(
-                        "button[type='submit'], input[type='submit']"
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
+
+                profile_urls = self.cached_listing_urls()
+                if not profile_urls:
+                    # Step 1: Search for the person's listings
+                    name_slug = f"{first}-{last}".replace(" ", "-")
+                    search_url = (
+                        f"https://www.smartbackgroundchecks.com/people/{name_slug}/{state_slug}"
                     )
-                    if submit_btn:
-                        submit_btn.click()
-                        page.wait_for_timeout(3000)
-
-                browser.close()
-                return {
-                    "status": "submitted",
-                    "notes": (
-                        f"Removal request submitted for {profile_url}. "
-                        "Check your email and click the verification link if received."
-                    ),
-                }
+                    self.goto(page, search_url, ready="a[href*='/people/']", label="search")
+
+                    if is_bot_wall(page.title()):
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": "Site is protected by Cloudflare and blocks automated access. "
+                                     "Visit https://www.smartbackgroundchecks.com/optout manually: "
+                                     "search your name, open your listing, click 'Request My Record To Be Removed'.",
+                        }
+
+                    # Result cards link to /people/…; the search URL itself doesn't count
+                    candidates = [
+                        c for c in extract_candidates(page, RESULT_LINKS)
+                        if c["url"] and c["url"].rstrip("/") != page.url.rstrip("/")
+                    ]
+                    if not candidates:
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": "No listing found automatically. "
+                                     "Visit https://www.smartbackgroundchecks.com/optout manually.",
+                        }
+
+                    matches = rank_candidates(candidates, self.profile, self.broker.get("match_threshold"))
+                    if not matches:
+                        self.close_browser(browser, page)
+                        return {
+                            "status": "manual_required",
+                            "notes": f"{len(candidates)} listing(s) found but none matched your profile closely. "
+                                     f"Review them at {page.url} and remove yours manually.",
+                        }
+
+                    profile_urls = [m["url"] for m in matches]
+                    for url in profile_urls:
+                        self.remember_listing_url(url)
+
+                # Step 2: Remove each listing in its own tab
+                results = self.for_each_listing(page, profile_urls, self._remove)
+                self.close_browser(browser, page)
+                return combine_results(results)
 
         except Exception as exc:
             return {
@@ -129,3 +91,55 @@ class Handler(BaseHandler):
                     "Visit https://www.smartbackgroundchecks.com/optout manually."
                 ),
             }
+
+    def _remove(self, page, profile_url: str) -> dict:
+        """Request removal of one listing from its profile page."""
+        self.goto(page, profile_url, label="profile",
+                  ready="a:has-text('Remove'), button:has-text('Remove'), a[href*='optout']")
+
+        if is_bot_wall(page.title()):
+            return {
+                "status": "manual_required",
+                "notes": f"Site blocked automated access. Open {profile_url} and click "
+                         "'Request My Record To Be Removed'.",
+            }
+
+        # Click the removal button
+        found = probe(page, {
+            "remove": [
+                "a:has-text('Remove')", "button:has-text('Remove')",
+                "a:has-text('Opt Out')", "a[href*='optout'], a[href*='opt-out']",
+            ],
+        })
+
+        if not found["remove"]:
+            self.forget_listing_url(profile_url)
+            return {
+                "status": "manual_required",
+                "notes": (
+                    f"Found profile at {profile_url} but could not locate the removal button. "
+                    "Click 'Request My Record To Be Removed' on that page."
+                ),
+            }
+
+        self.click_and_wait(page, page.query_selector(found["remove"]), "remove",
+                            ready="input[type='email']")
+
+        # Fill email if an opt-out form appears after clicking
+        filled = fill_fields(page, {
+            "input[type='email'], input[name='email'], input[name*='email']": self.email,
+        })
+        if any(filled.values()) and self.email:
+            submit_btn = page.query_selector(
+                "button[type='submit'], input[type='submit']"
+            )
+            if submit_btn:
+                self.click_and_wait(page, submit_btn, "submit")
+
+        return {
+            "status": "submitted",
+            "notes": (
+                f"Removal request submitted for {profile_url}. "
+                "Check your email and click the verification link if received."
+            ),
+        }
@@ -0,0 +1,168 @@
+"""
+One SMTP connection shared by a batch of opt-out emails.
+
+Sending used to open a connection per message — TCP, EHLO, STARTTLS, login,
+and on failure the whole handshake again over SSL on 465. With many email
+brokers (and profiles) that is a TLS handshake and a login per email, which
+providers throttle. The outbox sender (core/outbox.py) sends each batch of
+due emails through one pool:
+
+    with SmtpPool() as pool:
+        pool.send_raw(to_addr, message)
+
+The pool logs in once and sends every message over the same connection,
+reconnecting when the server drops it (idle timeout, per-connection message
+limit) and retrying that message once — but only if the drop came before the
+message data was sent, so nothing goes out twice. The transport that worked —
+STARTTLS on SMTP_PORT or SSL on 465 — is remembered per host for the rest of
+the process, so later connections and runs skip the one that fails.
+"""
+import smtplib
+import threading
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS
+
+SSL_PORT = 465
+TIMEOUT = 30
+
+# Reconnect after this many messages; providers close or throttle long sessions
+MAX_MESSAGES_PER_CONNECTION = 50
+
+# (host, port) → "starttls" | "ssl", whichever connected last
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+class _DataTracking:
+    """Notes when a message's DATA command was issued, i.e. when resending could deliver it twice."""
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+
+class _SMTP(_DataTracking, smtplib.SMTP):
+    pass
+
+
+class _SMTP_SSL(_DataTracking, smtplib.SMTP_SSL):
+    pass
+
+
+class SmtpPool:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT,
+                 user: str = SMTP_USER, password: str = SMTP_PASS):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.stats = {"connections": 0, "sent": 0, "reconnects": 0}
+        self._server = None
+        self._sent_on_server = 0
+        self._lock = threading.Lock()
+
+    def send(self, msg):
+        """Send an email.message.Message (see _send)."""
+        self._send(lambda server: server.send_message(msg))
+
+    def send_raw(self, to_addr: str, message: str):
+        """Send an already serialized message to one recipient (see _send)."""
+        self._send(lambda server: server.sendmail(self.user, [to_addr], message.encode("utf-8")))
+
+    def _send(self, send):
+        """
+        Send over the shared connection, connecting (or reconnecting) as
+        needed. If the server dropped the connection before the message data
+        went out, it is sent once more on a fresh one. Every other error is
+        raised as it is; after a timeout or an error without a server reply
+        the connection is closed, since its state is unknown.
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                server = self._connection()
+                server.data_started = False
+                try:
+                    send(server)
+                    break
+                except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                    raise  # the server answered; the connection is still usable
+                except smtplib.SMTPServerDisconnected:
+                    self._close_server()
+                    if server.data_started or attempt == 2:
+                        raise
+                    self.stats["reconnects"] += 1
+                except (smtplib.SMTPException, OSError):
+                    self._close_server()
+                    raise
+            self._sent_on_server += 1
+            self.stats["sent"] += 1
+
+    def close(self):
+        with self._lock:
+            self._close_server()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connection(self):
+        if self._server is not None and self._sent_on_server >= MAX_MESSAGES_PER_CONNECTION:
+            self._close_server()
+        if self._server is None:
+            self._server = self._connect()
+            self._sent_on_server = 0
+            self.stats["connections"] += 1
+        return self._server
+
+    def _connect(self):
+        """Log in over the transport that worked last, else STARTTLS first, falling back to SSL on connection errors only."""
+        key = (self.host, self.port)
+        with _transports_lock:
+            known = _transports.get(key)
+        order = ["ssl", "starttls"] if known == "ssl" else ["starttls", "ssl"]
+        for i, transport in enumerate(order):
+            try:
+                server = self._open(transport)
+            except smtplib.SMTPAuthenticationError:
+                # Auth failed — no point retrying with the other transport, same creds won't work
+                raise
+            except (smtplib.SMTPException, OSError):
+                # Connection/TLS issue — try the other transport
+                if i == len(order) - 1:
+                    raise
+                continue
+            with _transports_lock:
+                _transports[key] = transport
+            return server
+
+    def _open(self, transport: str):
+        if transport == "ssl":
+            server = _SMTP_SSL(self.host, SSL_PORT, timeout=TIMEOUT)
+        else:
+            server = _SMTP(self.host, self.port, timeout=TIMEOUT)
+        try:
+            server.ehlo()
+            if transport == "starttls":
+                server.starttls()
+                server.ehlo()
+            server.login(self.user, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def _close_server(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
@@ -1,11 +1,11 @@
 """
 ThatsThem opt-out handler.
-Flow: fill the opt-out form → solve reCAPTCHA v2 via CapSolver (if configured) → submit.
+Flow: start solving reCAPTCHA v2 via CapSolver (if configured) → fill the opt-out form meanwhile → submit.
 Falls back to manual_required if CAPTCHA cannot be solved automatically.
 """
-from brokers.handlers.base import BaseHandler, make_stealthy_page, is_bot_wall
+from brokers.handlers.base import BaseHandler, is_bot_wall, probe, fill_fields, playwright_session
 from brokers.handlers.capsolver_helper import (
-    extract_recaptcha_sitekey, solve_recaptcha_v2, inject_recaptcha_token,
+    extract_recaptcha_sitekey, solve_recaptcha_v2_async, inject_recaptcha_token,
 )
 
 OPT_OUT_URL = "https://thatsthem.com/optout"
@@ -14,7 +14,7 @@ OPT_OUT_URL = "https://thatsthem.com/optout"
 class Handler(BaseHandler):
     def submit(self) -> dict:
         try:
-            from playwright.sync_api import sync_playwright
+            import playwright.sync_api  # noqa: F401 — only checks it is installed
         except ImportError:
             return {
                 "status": "manual_required",
@@ -28,52 +28,43 @@ class Handler(BaseHandler):
             }
 
         try:
-            with sync_playwright() as p:
-                browser, page = make_stealthy_page(p)
+            with playwright_session() as p:
+                browser, page = self.open_browser(p)
 
-                page.goto(OPT_OUT_URL, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=20000)
+                self.goto(page, OPT_OUT_URL, ready="input[name='name']", label="form")
 
                 if is_bot_wall(page.title()):
-                    browser.close()
+                    self.close_browser(browser, page)
                     return {
                         "status": "manual_required",
                         "notes": f"Site presented a bot-challenge page. Visit {OPT_OUT_URL} manually.",
                     }
 
-                # Fill confirmed field names from live page inspection
-                def fill(name: str, value: str):
-                    el = page.query_selector(f"input[name='{name}']")
-                    if el and value:
-                        el.fill(value)
-
-                fill("name", self.full_name)
-                fill("email", self.email)
-                fill("phone", self.phone)
-                fill("street", self.address)
-                fill("city", self.city)
-                fill("zip", self.zip_code)
-
-                state_el = page.query_selector("select[name='state']")
-                if state_el and self.state:
-                    try:
-                        state_el.select_option(label=self.state)
-                    except Exception:
-                        try:
-                            state_el.select_option(value=self.state[:2].upper())
-                        except Exception:
-                            pass
-
-                # Handle reCAPTCHA v2
-                captcha_el = page.query_selector(
-                    "iframe[src*='recaptcha'], .g-recaptcha, iframe[src*='captcha']"
-                )
-                if captcha_el:
-                    site_key = extract_recaptcha_sitekey(page)
-                    token = solve_recaptcha_v2(OPT_OUT_URL, site_key) if site_key else None
+                found = probe(page, {
+                    "captcha": "iframe[src*='recaptcha'], .g-recaptcha, iframe[src*='captcha']",
+                    "submit": "button[type='submit'], input[type='submit']",
+                })
+
+                # Start solving the reCAPTCHA v2 now; it runs while the form is filled
+                site_key = extract_recaptcha_sitekey(page) if found["captcha"] else None
+                pending = solve_recaptcha_v2_async(OPT_OUT_URL, site_key) if site_key else None
+
+                # Confirmed field names from live page inspection
+                fill_fields(page, {
+                    "input[name='name']": self.full_name,
+                    "input[name='email']": self.email,
+                    "input[name='phone']": self.phone,
+                    "input[name='street']": self.address,
+                    "input[name='city']": self.city,
+                    "input[name='zip']": self.zip_code,
+                    "select[name='state']": self.state,
+                })
+
+                if found["captcha"]:
+                    token = pending.result() if pending else None
 
                     if not token:
-                        browser.close()
+                        self.close_browser(browser, page)
                         return {
                             "status": "manual_required",
                             "notes": (
@@ -85,19 +76,16 @@ class Handler(BaseHandler):
                         }
 
                     inject_recaptcha_token(page, token)
-                    page.wait_for_timeout(1000)
 
-                submit_btn = page.query_selector("button[type='submit'], input[type='submit']")
-                if submit_btn:
-                    submit_btn.click()
-                    page.wait_for_timeout(3000)
-                    browser.close()
+                if found["submit"]:
+                    self.click_and_wait(page, page.query_selector(found["submit"]), "submit")
+                    self.close_browser(browser, page)
                     return {
                         "status": "submitted",
                         "notes": "Opt-out form submitted to ThatsThem.",
                     }
 
-                browser.close()
+                self.close_browser(browser, page)
                 return {
                     "status": "manual_required",
                     "notes": f"Could not find submit button. Visit {OPT_OUT_URL} manually.",
@@ -0,0 +1,187 @@
+"""
+Command-line maintenance tasks.
+
+    python cli.py export requests --format csv > requests.csv
+    python cli.py import requests requests.ndjson
+    python cli.py retention --days 180
+    python cli.py waits --broker thatsthem
+    python cli.py scan
+    python cli.py mock-solver --latency 4 --failure-rate 0.1
+    python cli.py send-mail
+    python cli.py ingest-mail --dry-run
+    python cli.py mock-imap ~/test-maildir --port 1143
+"""
+import argparse
+import sys
+
+from core.tracker import init_db
+
+
+def cmd_export(args):
+    from core.transfer import export_lines
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for line in export_lines(args.table, args.format):
+            out.write(line)
+    finally:
+        if args.output:
+            out.close()
+
+
+def cmd_import(args):
+    from core.transfer import read_rows, import_rows
+    fmt = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+    with open(args.file, encoding="utf-8", newline="") as f:
+        counts = import_rows(
+            args.table, read_rows(f, fmt), batch_size=args.batch_size,
+            log=lambda msg: print(msg, file=sys.stderr),
+        )
+    print(f"Done. {counts['inserted']} row(s) inserted into {args.table}, "
+          f"{counts['skipped']} already present, {counts['invalid']} invalid.")
+
+
+def cmd_retention(args):
+    from core.retention import apply_retention
+    summary = apply_retention(args.days, log=print, convert=True)
+    if not summary:
+        print("Nothing to archive.")
+
+
+def cmd_waits(args):
+    from core.tracker import get_wait_stats
+    rows = get_wait_stats(args.broker)
+    if not rows:
+        print("No wait timings recorded yet.")
+        return
+    print(f"{'broker':<24} {'wait':<16} {'count':>6} {'avg ms':>8} {'max ms':>8} {'timeouts':>9}")
+    for r in rows:
+        print(f"{r['broker_id']:<24} {r['label']:<16} {r['count']:>6} "
+              f"{r['avg_ms']:>8} {r['max_ms']:>8} {r['timeouts']:>9}")
+
+
+def cmd_scan(args):
+    from core.scanner import scan_brokers
+    scan_brokers(args.brokers or None, log_callback=print, workers=args.workers)
+
+
+def cmd_mock_solver(args):
+    from brokers.handlers.mock_solver import MockSolverServer
+    server = MockSolverServer(
+        (args.host, args.port), latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, timeout_rate=args.timeout_rate,
+    )
+    print(f"Mock CAPTCHA solver on {server.url} — set CAPTCHA_SOLVER=mock and "
+          f"CAPTCHA_SOLVER_URL={server.url} in .env. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.counts['created']} task(s), {server.counts['polls']} poll(s).")
+
+
+def cmd_send_mail(args):
+    from config import SMTP_CONFIGURED
+    from core.outbox import get_outbox_sender, STALE_SENDING_SECONDS
+    from core.tracker import get_outbox_counts, requeue_stale_emails
+    if not SMTP_CONFIGURED:
+        print("SMTP_USER and SMTP_PASS are not set in .env.")
+        return
+    requeue_stale_emails(STALE_SENDING_SECONDS)
+    sender = get_outbox_sender()
+    sender.send_due(log=print)
+    counts = get_outbox_counts()
+    print(f"Done. {sender.stats['sent']} sent, {sender.stats['retried']} to retry later, "
+          f"{sender.stats['failed']} failed; {counts.get('queued', 0)} still queued.")
+
+
+def cmd_ingest_mail(args):
+    from config import MAIL_SOURCE
+    from core.mail_ingest import ingest_mail
+    if not (args.source or MAIL_SOURCE):
+        print("Set MAIL_SOURCE in .env or pass --source.")
+        return
+    summary = ingest_mail(args.source, dry_run=args.dry_run, log=print)
+    verb = "would be confirmed" if args.dry_run else "confirmed"
+    print(f"Done. {summary['messages']} new message(s), {summary['matched']} verification email(s), "
+          f"{summary['matched'] if args.dry_run else summary['confirmed']} request(s) {verb}, "
+          f"{summary['failed']} link(s) failed.")
+
+
+def cmd_mock_imap(args):
+    from core.mock_imap import MockImapServer, load_messages
+    server = MockImapServer((args.host, args.port), load_messages(args.mailbox))
+    print(f"Mock IMAP server on {server.url} with {len(server.messages)} message(s) — "
+          f"set MAIL_SOURCE={server.url} in .env. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.counts['sessions']} session(s), {server.counts['fetches']} fetch(es).")
+
+
+def main(argv=None):
+    from core.transfer import EXPORT_COLUMNS, FORMATS, IMPORT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(prog="incognish")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="stream a table as NDJSON or CSV")
+    p.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    p.add_argument("--format", choices=FORMATS, default="ndjson")
+    p.add_argument("-o", "--output", help="write to a file instead of stdout")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="bulk-load a table from NDJSON or CSV")
+    p.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    p.add_argument("file")
+    p.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    p.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("retention", help="archive old history now")
+    p.add_argument("--days", type=int, help="default: RETENTION_DAYS from .env")
+    p.set_defaults(func=cmd_retention)
+
+    p = sub.add_parser("scan", help="check which brokers list you, without opting out")
+    p.add_argument("brokers", nargs="*", help="broker ids (default: all with a search definition)")
+    p.add_argument("--workers", type=int, help="parallel searches (default: SCAN_WORKERS from .env)")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("waits", help="show how long handler waits take per broker")
+    p.add_argument("--broker", help="only this broker id")
+    p.set_defaults(func=cmd_waits)
+
+    p = sub.add_parser("mock-solver", help="serve a fake CapSolver API for offline CAPTCHA testing")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=3.0, help="seconds until a task is solved")
+    p.add_argument("--jitter", type=float, default=1.0, help="± seconds around --latency")
+    p.add_argument("--failure-rate", type=float, default=0.0, help="fraction of tasks that fail")
+    p.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of tasks never solved")
+    p.set_defaults(func=cmd_mock_solver)
+
+    p = sub.add_parser("send-mail", help="send the opt-out emails due in the outbox now")
+    p.set_defaults(func=cmd_send_mail)
+
+    p = sub.add_parser("ingest-mail", help="confirm requests from verification emails in the mailbox")
+    p.add_argument("--source", help="Maildir, mbox or imap(s):// URL (default: MAIL_SOURCE from .env)")
+    p.add_argument("--dry-run", action="store_true", help="only show what would be confirmed")
+    p.set_defaults(func=cmd_ingest_mail)
+
+    p = sub.add_parser("mock-imap", help="serve a Maildir or mbox over IMAP for offline testing")
+    p.add_argument("mailbox", help="Maildir directory or mbox file")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=1143)
+    p.set_defaults(func=cmd_mock_imap)
+
+    args = parser.parse_args(argv)
+    init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
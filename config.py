@@ -15,7 +15,69 @@ SMTP_PASS = os.getenv("SMTP_PASS", "")
 
 SMTP_CONFIGURED = bool(SMTP_USER and SMTP_PASS)
 
+# Opt-out emails are queued and sent in the background at most this many per
+# minute (0 = a safe default for the SMTP_HOST provider, see core/outbox.py)
+SMTP_RATE_PER_MINUTE = float(os.getenv("SMTP_RATE_PER_MINUTE", "0"))
+
+# Optional: mailbox read for broker verification emails (core/mail_ingest.py).
+# A Maildir directory, an mbox file, or imaps://user@host/INBOX (imap:// for
+# no TLS). IMAP_PASS defaults to SMTP_PASS — usually the same account.
+MAIL_SOURCE = os.getenv("MAIL_SOURCE", "").strip()
+IMAP_PASS = os.getenv("IMAP_PASS", "") or SMTP_PASS
+# How often the web app checks the mailbox (seconds, 0 = only via the CLI),
+# and how far back IMAP searches go
+MAIL_INGEST_INTERVAL = int(os.getenv("MAIL_INGEST_INTERVAL", "900"))
+MAIL_LOOKBACK_DAYS = int(os.getenv("MAIL_LOOKBACK_DAYS", "14"))
+
 # Optional: CapSolver API key for automated CAPTCHA solving
 # Get yours at https://capsolver.com — ~$0.80/1000 Turnstile, $1/1000 reCAPTCHA v2
 CAPSOLVER_API_KEY = os.getenv("CAPSOLVER_API_KEY", "")
-CAPSOLVER_CONFIGURED = bool(CAPSOLVER_API_KEY)
+
+# Solver backend: "capsolver", or "mock" — a local fake for offline testing
+# (see brokers/handlers/mock_solver.py). CAPTCHA_SOLVER_URL overrides the API
+# endpoint; for "mock" without a URL, a mock server is started in-process.
+CAPTCHA_SOLVER = os.getenv("CAPTCHA_SOLVER", "capsolver").strip().lower()
+CAPTCHA_SOLVER_URL = os.getenv("CAPTCHA_SOLVER_URL", "")
+CAPSOLVER_CONFIGURED = bool(CAPSOLVER_API_KEY) or CAPTCHA_SOLVER == "mock"
+
+# Solve CAPTCHAs of brokers queued in a run ahead of time, for sitekeys already
+# known (registry "captcha" spec, or seen on an earlier solve). Only the next
+# CAPTCHA_PREFETCH_AHEAD browser brokers are solved for, so tokens don't expire
+# before their handlers get to them
+CAPTCHA_PREFETCH = os.getenv("CAPTCHA_PREFETCH", "1") != "0"
+CAPTCHA_PREFETCH_AHEAD = int(os.getenv("CAPTCHA_PREFETCH_AHEAD", "2"))
+
+# Per-run caps on CAPTCHA solving: estimated spend in USD and total solver
+# time in seconds. Once either is reached, further solves in the run are
+# skipped (0 = no cap)
+CAPTCHA_BUDGET_USD = float(os.getenv("CAPTCHA_BUDGET_USD", "0"))
+CAPTCHA_BUDGET_SECONDS = float(os.getenv("CAPTCHA_BUDGET_SECONDS", "0"))
+
+# Optional: retention — requests, runs and snapshots older than this many days
+# are moved into per-month archive databases under db/archive/ (0 = keep all hot)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+ARCHIVE_DIR = BASE_DIR / "db" / "archive"
+
+# Block images, fonts, media and ad/analytics trackers on broker pages
+# (captcha providers always load; per-broker overrides in registry.json)
+BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "1") != "0"
+
+# Keep each broker's cookies/localStorage (e.g. Cloudflare clearance) between
+# runs for this many hours, so challenges aren't re-solved every time (0 = off)
+BROWSER_STATE_TTL_HOURS = float(os.getenv("BROWSER_STATE_TTL_HOURS", "24"))
+
+# Remember the listing (profile page) URL a broker search found for this many
+# days, so reruns skip the search step (0 = always search)
+LISTING_URL_TTL_DAYS = float(os.getenv("LISTING_URL_TTL_DAYS", "30"))
+
+# Exposure scans: broker searches checked at once, and how long a
+# "not listed" result lets opt-out runs skip that broker
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))
+SCAN_FRESH_DAYS = float(os.getenv("SCAN_FRESH_DAYS", "30"))
+
+# Browser pool: one warm browser shared by every broker of a run and kept for
+# this many idle seconds afterwards (0 = launch a browser per broker), with a
+# few spare stealth contexts ready; optionally launched when the web app starts
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+BROWSER_WARM_CONTEXTS = int(os.getenv("BROWSER_WARM_CONTEXTS", "2"))
+BROWSER_PREWARM = os.getenv("BROWSER_PREWARM", "0") != "0"
@@ -9,8 +9,20 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from core.tracker import add_request, get_profile, save_run
-from brokers import load_registry
+from config import SCAN_FRESH_DAYS, CAPTCHA_PREFETCH, CAPTCHA_PREFETCH_AHEAD
+from core.tracker import (
+    add_request, get_profile, start_run, append_run_log, finish_run, record_wait_timings,
+    get_exposures, link_outbox_request,
+)
+from brokers import get_registry
+from brokers.handlers.base import profile_key
+from brokers.handlers.browser_pool import get_browser_pool
+from brokers.handlers.capsolver_helper import (
+    solver_stats, prefetch_for_broker, SolveBudget, solve_accounting, solving_for,
+)
+
+# Log lines buffered in memory before a compressed chunk is written to the DB
+LOG_CHUNK_LINES = 100
 
 
 def _load_handler(broker: dict):
@@ -25,81 +37,228 @@ def _load_handler(broker: dict):
         return None
 
 
-def run_brokers(broker_ids: list = None, log_callback=None) -> dict:
+def _log_resource_stats(log, name: str, stats: dict):
+    if not stats["blocked"]:
+        return
+    by_type = ", ".join(f"{n} {t}" for t, n in sorted(stats["blocked_by_type"].items()))
+    log(
+        f"[{name}] Blocked {stats['blocked']} request(s) ({by_type}); "
+        f"loaded {stats['allowed']} request(s), {stats['bytes_loaded'] // 1024} KB"
+    )
+
+
+def _log_solver_stats(log, before: dict, after: dict):
+    """One line per CAPTCHA task type solved during the run."""
+    for task_type, st in after.items():
+        prev = before.get(task_type, {})
+        counts = {k: st[k] - prev.get(k, 0) for k in ("solved", "failed", "timeout")}
+        if not any(counts.values()):
+            continue
+        typical = f", typically {st['typical_ms'] / 1000:.1f}s" if st["typical_ms"] else ""
+        log(f"CAPTCHA {task_type}: {counts['solved']} solved, {counts['failed']} failed, "
+            f"{counts['timeout']} timed out{typical}")
+
+
+def _log_captcha_budget(log, budget: SolveBudget):
+    totals = budget.totals()
+    attempts = sum(totals[k] for k in ("solved", "failed", "timeout"))
+    if attempts:
+        log(f"CAPTCHA spend: {totals['solved']}/{attempts} solved, ~${totals['cost']:.4f}, "
+            f"{totals['seconds']:.0f}s solver time")
+    if totals["over_budget"]:
+        cap = []
+        if budget.max_cost:
+            cap.append(f"${budget.max_cost:g}")
+        if budget.max_seconds:
+            cap.append(f"{budget.max_seconds:g}s")
+        log(f"CAPTCHA budget ({' / '.join(cap)}) reached — skipped {totals['over_budget']} solve(s)")
+
+
+def _try_http_form(profile: dict, broker: dict, log, final: bool) -> dict | None:
+    """
+    Submit through the HTTP fast path (brokers/handlers/http_form.py).
+    Returns the result, or None if it didn't go through and a browser
+    handler should try instead. With `final`, whatever happened is the result.
+    """
+    from brokers.handlers.http_form import Handler as HttpFormHandler
+
+    name = broker["name"]
+    try:
+        result = HttpFormHandler(profile, broker).submit()
+    except Exception as exc:
+        result = {"status": "error", "notes": f"HTTP submission failed ({exc})"}
+    if final or result.get("status") in ("submitted", "confirmed"):
+        return result
+    log(f"[{name}] HTTP fast path: {result.get('notes', '')} — falling back to browser")
+    return None
+
+
+def run_brokers(broker_ids: list = None, log_callback=None, only_listed: bool = False) -> dict:
     """
     Run opt-out submissions for the given broker IDs (or all if None).
     log_callback(msg: str) is called for each log line — used for live streaming.
+    With only_listed, brokers where a recent exposure scan found no listing
+    are skipped (brokers never scanned, or scanned inconclusively, still run).
     Returns a summary dict.
     """
     profile = get_profile()
-    registry = load_registry()
+    registry = get_registry()
     run_id = str(uuid.uuid4())[:8]
-    log_lines = []
+    pending_lines = []
+    log_state = {"seq": 0, "written": 0}
     succeeded = 0
     failed = 0
+    queued = 0
 
     if not profile:
         msg = "ERROR: No profile found. Please fill in your profile first."
         if log_callback:
             log_callback(msg)
-        return {"run_id": run_id, "log": [msg], "succeeded": 0, "failed": 0}
+        return {"run_id": run_id, "log_lines": 1, "succeeded": 0, "failed": 0, "queued": 0}
 
     brokers = (
-        registry
+        registry.brokers
         if not broker_ids
-        else [b for b in registry if b["id"] in broker_ids]
+        else [registry.by_id[b] for b in dict.fromkeys(broker_ids) if b in registry.by_id]
     )
+    skipped = []
+    if only_listed:
+        exposures = get_exposures(profile_key(profile), since_days=SCAN_FRESH_DAYS)
+        skipped = [b for b in brokers if exposures.get(b["id"], {}).get("status") == "not_listed"]
+        brokers = [b for b in brokers if b not in skipped]
+
+    def flush_log():
+        if not pending_lines:
+            return
+        append_run_log(run_id, log_state["seq"], log_state["written"], pending_lines)
+        log_state["seq"] += 1
+        log_state["written"] += len(pending_lines)
+        pending_lines.clear()
 
     def log(msg: str):
-        log_lines.append(msg)
+        # One stored line per physical line, so chunk offsets and line numbers
+        # stay right for multi-line messages (exceptions, tracebacks)
+        pending_lines.extend(str(msg).split("\n"))
+        if len(pending_lines) >= LOG_CHUNK_LINES:
+            flush_log()
         if log_callback:
             log_callback(msg)
 
-    log(f"Run ID: {run_id} — processing {len(brokers)} broker(s)")
-    log("─" * 60)
-
-    for broker in brokers:
-        name = broker["name"]
-        method = broker.get("method", "manual")
-
-        HandlerClass = _load_handler(broker)
-
-        if HandlerClass:
-            try:
-                handler = HandlerClass(profile, broker)
-                result = handler.submit()
-                status = result.get("status", "submitted")
-                notes = result.get("notes", "")
-                log(f"[{name}] {status.upper()} — {notes}")
-            except Exception as exc:
-                status = "error"
-                notes = str(exc)
-                log(f"[{name}] ERROR — {exc}")
-        elif method == "manual":
-            status = "manual_required"
-            url = broker.get("opt_out_url", "")
-            notes = f"Manual opt-out required. URL: {url}"
-            log(f"[{name}] MANUAL REQUIRED — {url}")
-        else:
-            status = "manual_required"
-            notes = f"No handler available. Visit: {broker.get('opt_out_url', 'N/A')}"
-            log(f"[{name}] NO HANDLER — marked for manual action")
-
-        add_request(broker["id"], name, method, status, notes, run_id)
-
-        if status in ("submitted", "confirmed"):
-            succeeded += 1
-        else:
-            failed += 1
-
-    log("─" * 60)
-    log(f"Done. Submitted: {succeeded} | Manual/Error: {failed}")
-
-    save_run(run_id, len(brokers), succeeded, failed, log_lines)
+    start_run(run_id, len(brokers))
+    try:
+        # Browser handlers run on the pool's warm browser; start it while the
+        # first brokers (HTTP forms, emails) are still being handled.
+        pool = get_browser_pool()
+        browser_brokers = [b for b in brokers if b.get("handler") and b.get("method") == "web_form"]
+        pool_before = dict(pool.stats) if pool else {}
+        solves_before = solver_stats()
+        if pool and browser_brokers:
+            pool.prewarm()
+
+        # Every CAPTCHA solved from here on — prefetches, handlers — is recorded
+        # against this run and counted toward its budget
+        budget = SolveBudget(run_id, profile_key(profile))
+        with solve_accounting(budget):
+            log(f"Run ID: {run_id} — processing {len(brokers)} broker(s)")
+            if skipped:
+                log(f"Skipping {len(skipped)} broker(s) where the last scan found no listing: "
+                    + ", ".join(b["name"] for b in skipped))
+            log("─" * 60)
+
+            for i, broker in enumerate(brokers):
+                name = broker["name"]
+                method = broker.get("method", "manual")
+
+                # Solve the captchas of the next few browser brokers while this
+                # one runs, so tokens are ready — and not yet expired — when
+                # their handlers get there
+                if CAPTCHA_PREFETCH:
+                    upcoming = [b for b in brokers[i:] if b in browser_brokers][:CAPTCHA_PREFETCH_AHEAD]
+                    prefetched = 0
+                    for b in upcoming:
+                        with solving_for(b["id"]):
+                            prefetched += prefetch_for_broker(b)
+                    if prefetched:
+                        log(f"Solving {prefetched} CAPTCHA(s) ahead for queued brokers")
+
+                HandlerClass = _load_handler(broker)
+                result = None
+                if broker.get("http_form"):
+                    with solving_for(broker["id"]):
+                        result = _try_http_form(profile, broker, log, final=HandlerClass is None)
+
+                # A handler may return one result, or {"results": [...]} with one entry
+                # per matched listing — each becomes its own request.
+                if result:
+                    outcomes = result.get("results") or [result]
+                    for r in outcomes:
+                        log(f"[{name}] {r.get('status', 'submitted').upper()} (HTTP) — {r.get('notes', '')}")
+                elif HandlerClass:
+                    handler = None
+                    try:
+                        handler = HandlerClass(profile, broker)
+                        with solving_for(broker["id"]):
+                            if pool and broker in browser_brokers:
+                                result = pool.run(handler.submit)
+                            else:
+                                result = handler.submit()
+                        if handler.session_restored:
+                            log(f"[{name}] Reused saved browser session")
+                        outcomes = result.get("results") or [result]
+                        for r in outcomes:
+                            log(f"[{name}] {r.get('status', 'submitted').upper()} — {r.get('notes', '')}")
+                        _log_resource_stats(log, name, handler.resource_stats)
+                    except Exception as exc:
+                        outcomes = [{"status": "error", "notes": str(exc)}]
+                        log(f"[{name}] ERROR — {exc}")
+                    finally:
+                        # Timeouts that ended in an exception are the timings worth keeping
+                        if handler is not None:
+                            record_wait_timings(run_id, broker["id"], handler.wait_timings)
+                elif method == "manual":
+                    url = broker.get("opt_out_url", "")
+                    outcomes = [{"status": "manual_required", "notes": f"Manual opt-out required. URL: {url}"}]
+                    log(f"[{name}] MANUAL REQUIRED — {url}")
+                else:
+                    outcomes = [{
+                        "status": "manual_required",
+                        "notes": f"No handler available. Visit: {broker.get('opt_out_url', 'N/A')}",
+                    }]
+                    log(f"[{name}] NO HANDLER — marked for manual action")
+
+                for r in outcomes:
+                    status = r.get("status", "submitted")
+                    request_id = add_request(broker["id"], name, method, status, r.get("notes", ""), run_id)
+
+                    if r.get("outbox_id"):
+                        # Email waiting in the outbox: the sender settles the request's status
+                        link_outbox_request(r["outbox_id"], request_id)
+                        queued += 1
+                    elif status in ("submitted", "confirmed"):
+                        succeeded += 1
+                    else:
+                        failed += 1
+
+        log("─" * 60)
+        if pool:
+            used = {k: pool.stats[k] - pool_before[k] for k in pool_before}
+            if used["warm_pages"] or used["cold_pages"]:
+                log(f"Browser pool: {used['warm_pages']} prewarmed / {used['cold_pages']} new page(s), "
+                    f"{used['launches']} browser launch(es)")
+        _log_solver_stats(log, solves_before, solver_stats())
+        _log_captcha_budget(log, budget)
+        queued_note = f" | Emails queued: {queued}" if queued else ""
+        log(f"Done. Submitted: {succeeded}{queued_note} | Manual/Error: {failed}")
+    finally:
+        # Whatever happened, keep the log written so far and close the run
+        flush_log()
+        finish_run(run_id, succeeded, failed, total=succeeded + failed + queued)
     return {
         "run_id": run_id,
-        "log": log_lines,
+        "log_lines": log_state["written"],
         "succeeded": succeeded,
         "failed": failed,
-        "total": len(brokers),
+        "queued": queued,
+        "total": succeeded + failed + queued,
+        "captcha": budget.totals(),
     }
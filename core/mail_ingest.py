@@ -0,0 +1,387 @@
+"""
+mail_ingest.py — confirms opt-outs from their verification emails.
+
+Several brokers (BeenVerified, PeopleFinders, ClustrMaps, …) only act on an
+opt-out once the link in their verification email is clicked. This reads the
+mailbox in MAIL_SOURCE — a Maildir, an mbox file or an IMAP folder — and for
+every new message:
+
+  1. matches the sender's domain to a broker (its website / opt-out URL, or
+     the registry entry's "verification": {"from": "mailer.example.com"});
+     when brokers share a site (Intelius and ZabaSearch both opt out through
+     PeopleConnect), "verification.from", "verification.link" or the broker's
+     name in the email must single one out, or the email is left unmatched,
+  2. picks the confirmation link — a link to one of the broker's sites that
+     looks like verify / confirm / opt-out, or one matching "verification.link",
+  3. assigns it to that broker's oldest request still "submitted" before the
+     email arrived.
+
+The links are then followed concurrently with the pooled HTTP session and
+every request whose link answered is set to "confirmed" in one transaction.
+Messages that were handled (or are not verification emails) are remembered
+in mail_seen and skipped from then on; a link that failed is tried again on
+the next pass.
+
+    python cli.py ingest-mail [--source PATH|URL] [--dry-run]
+
+The web app checks the mailbox every MAIL_INGEST_INTERVAL seconds. For IMAP
+without a real account, core/mock_imap.py serves a Maildir or mbox over IMAP.
+"""
+import email
+import hashlib
+import imaplib
+import logging
+import mailbox
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email import policy
+from email.utils import parseaddr, parsedate_to_datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import MAIL_SOURCE, IMAP_PASS, MAIL_INGEST_INTERVAL, MAIL_LOOKBACK_DAYS
+from core.tracker import (
+    get_seen_mail_keys, mark_mail_seen, get_awaiting_confirmation, confirm_requests,
+)
+from brokers import get_registry
+from brokers.handlers.http_form import get_session, REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Links followed at once (each thread has its own pooled session)
+CONFIRM_WORKERS = 4
+
+# Subject or body words that make a broker's email a verification email
+VERIFY_WORDS = re.compile(r"verif|confirm|activat|complete your|opt.?out|removal", re.I)
+# Words in a link (URL or anchor text) that point at the confirmation
+LINK_WORDS = re.compile(r"verif|confirm|activat|opt.?out|remov|suppress", re.I)
+SKIP_LINKS = re.compile(r"unsubscribe|privacy|terms|/help|support|login|sign.?in|facebook|twitter|instagram", re.I)
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+
+# A verification email with no request waiting is looked at again on later
+# passes for this long, in case its request is recorded after it arrives
+UNMATCHED_RETRY = timedelta(hours=24)
+
+
+# ── Sources ────────────────────────────────────────────────────────────────────
+# Each source yields (key, raw message bytes) for messages not in `seen`.
+# Keys are stable per source: Maildir keys, Message-IDs, IMAP UIDs.
+
+def _message_key(raw: bytes) -> str:
+    msg = email.message_from_bytes(raw, policy=policy.compat32)
+    message_id = (msg.get("Message-ID") or "").strip()
+    return message_id or hashlib.sha1(raw).hexdigest()
+
+
+class MaildirSource:
+    def __init__(self, path: str):
+        self.name = f"maildir:{path}"
+        self.box = mailbox.Maildir(path, factory=None, create=False)
+
+    def unseen(self, seen: set):
+        for key in self.box.iterkeys():
+            if key not in seen:
+                yield key, self.box.get_bytes(key)
+
+
+class MboxSource:
+    def __init__(self, path: str):
+        self.name = f"mbox:{path}"
+        self.box = mailbox.mbox(path, create=False)
+
+    def unseen(self, seen: set):
+        for key in self.box.iterkeys():
+            raw = self.box.get_bytes(key)
+            msg_key = _message_key(raw)
+            if msg_key not in seen:
+                yield msg_key, raw
+
+
+class ImapSource:
+    """An IMAP folder. Messages of the last MAIL_LOOKBACK_DAYS are fetched with BODY.PEEK, so they stay unread."""
+
+    def __init__(self, url: str, password: str = IMAP_PASS, lookback_days: int = MAIL_LOOKBACK_DAYS):
+        parts = urlsplit(url)
+        self.ssl = parts.scheme == "imaps"
+        self.host = parts.hostname
+        self.port = parts.port or (993 if self.ssl else 143)
+        self.user = unquote(parts.username or "")
+        self.password = unquote(parts.password or "") or password
+        self.folder = unquote(parts.path.lstrip("/")) or "INBOX"
+        self.lookback_days = lookback_days
+        self.name = f"imap:{self.user}@{self.host}/{self.folder}"
+
+    def unseen(self, seen: set):
+        imap = imaplib.IMAP4_SSL(self.host, self.port) if self.ssl else imaplib.IMAP4(self.host, self.port)
+        try:
+            imap.login(self.user, self.password)
+            imap.select(self.folder, readonly=True)
+            validity = (imap.response("UIDVALIDITY")[1] or [b"0"])[0].decode()
+            since = (datetime.now() - timedelta(days=self.lookback_days)).strftime("%d-%b-%Y")
+            _, data = imap.uid("SEARCH", None, "SINCE", since)
+            for uid in (data[0] or b"").split():
+                key = f"{validity}:{uid.decode()}"
+                if key in seen:
+                    continue
+                _, fetched = imap.uid("FETCH", uid, "(BODY.PEEK[])")
+                raw = next((item[1] for item in fetched if isinstance(item, tuple)), None)
+                if raw:
+                    yield key, raw
+        finally:
+            try:
+                imap.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+
+
+def open_source(spec: str = MAIL_SOURCE):
+    """The mailbox MAIL_SOURCE (or `spec`) names; ValueError if it can't be read."""
+    if spec.startswith(("imap://", "imaps://")):
+        return ImapSource(spec)
+    path = Path(spec).expanduser()
+    if path.is_dir() and (path / "cur").is_dir():
+        return MaildirSource(str(path))
+    if path.is_file():
+        return MboxSource(str(path))
+    raise ValueError(f"MAIL_SOURCE {spec!r} is not a Maildir, an mbox file or an imap(s):// URL")
+
+
+# ── Matching ───────────────────────────────────────────────────────────────────
+
+class _Anchors(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []      # [(href, text)]
+        self._open = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._open = [dict(attrs).get("href") or "", ""]
+
+    def handle_data(self, data):
+        if self._open is not None:
+            self._open[1] += data
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._open is not None:
+            self.links.append((self._open[0], self._open[1].strip()))
+            self._open = None
+
+
+def _site(host: str) -> str:
+    """Registrable part of a host name, roughly: mail.beenverified.com → beenverified.com."""
+    return ".".join((host or "").lower().rstrip(".").split(".")[-2:])
+
+
+def broker_sites(broker: dict) -> set:
+    spec = broker.get("verification") or {}
+    sites = {_site(urlsplit(broker.get(k) or "").hostname) for k in ("website", "opt_out_url")}
+    if spec.get("from"):
+        sites.add(_site(spec["from"].split("@")[-1]))
+    return sites - {""}
+
+
+def _bodies(msg) -> tuple:
+    text, html = [], []
+    for part in msg.walk():
+        if part.get_content_maintype() == "multipart":
+            continue
+        try:
+            content = part.get_content()
+        except (LookupError, ValueError):
+            continue
+        if not isinstance(content, str):
+            continue
+        (html if part.get_content_type() == "text/html" else text).append(content)
+    return "\n".join(text), "\n".join(html)
+
+
+def _links(msg) -> list:
+    """[(href, anchor text)] of the HTML part's anchors, then the bare URLs of the text part."""
+    text, html = _bodies(msg)
+    anchors = _Anchors()
+    anchors.feed(html)
+    return anchors.links + [(url, "") for url in URL_RE.findall(text)]
+
+
+def confirmation_links(msg, broker: dict) -> list:
+    """
+    Candidate confirmation URLs in the message, most likely first: links
+    matching "verification.link" if the broker has one, otherwise links to
+    one of the broker's sites that look like a confirmation.
+    """
+    sites = broker_sites(broker)
+    pattern = (broker.get("verification") or {}).get("link")
+    found = []
+    for href, label in _links(msg):
+        href = href.strip()
+        if not href.startswith(("http://", "https://")) or href in found:
+            continue
+        if SKIP_LINKS.search(href) or SKIP_LINKS.search(label):
+            continue
+        if pattern:
+            ok = re.search(pattern, href)
+        else:
+            ok = (LINK_WORDS.search(href) or LINK_WORDS.search(label)) and _site(urlsplit(href).hostname) in sites
+        if ok:
+            found.append(href)
+    return found
+
+
+def _from_matches(broker: dict, sender: str) -> bool:
+    """Whether the sender is the broker's "verification.from" (an address, or a domain and its subdomains)."""
+    expected = ((broker.get("verification") or {}).get("from") or "").lower()
+    if not expected:
+        return False
+    if "@" in expected:
+        return sender == expected
+    domain = sender.rpartition("@")[2]
+    return domain == expected or domain.endswith("." + expected)
+
+
+def match_broker(msg, brokers_by_site: dict) -> dict | None:
+    """
+    The broker the message is from. Brokers sharing the sender's site are
+    told apart by "verification.from", then "verification.link", then their
+    name in the message; None if that leaves no single broker.
+    """
+    sender = parseaddr(msg.get("From") or "")[1].lower()
+    candidates = brokers_by_site.get(_site(sender.rpartition("@")[2]), [])
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+
+    hrefs = [href for href, _ in _links(msg)]
+    content = " ".join((str(msg.get("Subject") or ""),) + _bodies(msg)).lower()
+
+    def link_matches(broker):
+        pattern = (broker.get("verification") or {}).get("link")
+        return bool(pattern) and any(re.search(pattern, href) for href in hrefs)
+
+    for test in (lambda b: _from_matches(b, sender), link_matches, lambda b: b["name"].lower() in content):
+        hits = [b for b in candidates if test(b)]
+        if len(hits) == 1:
+            return hits[0]
+    return None
+
+
+def _received(msg) -> datetime:
+    try:
+        when = parsedate_to_datetime(str(msg.get("Date") or ""))
+    except (TypeError, ValueError):
+        when = None
+    if when is None:
+        return datetime.now(timezone.utc)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def _submitted(request: dict) -> datetime:
+    return datetime.fromisoformat(request["submitted_at"]).replace(tzinfo=timezone.utc)
+
+
+# ── Confirming ─────────────────────────────────────────────────────────────────
+
+def follow_link(urls: list) -> tuple:
+    """GET the candidates in order until one answers. Returns (url, None) or (None, error)."""
+    error = "no confirmation link found"
+    for url in urls:
+        try:
+            resp = get_session().get(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+        except Exception as exc:
+            error = f"{urlsplit(url).hostname}: {exc}"
+            continue
+        if resp.status_code < 400:
+            return resp.url, None
+        error = f"{urlsplit(url).hostname} answered HTTP {resp.status_code}"
+    return None, error
+
+
+def ingest_mail(source: str = None, dry_run: bool = False, log=None) -> dict:
+    """
+    Read new messages from the mailbox, confirm the requests their
+    verification links belong to, and return counts: messages, matched,
+    confirmed, failed (links to retry next time).
+    """
+    log = log or (lambda msg: None)
+    src = open_source(source or MAIL_SOURCE)
+    brokers_by_site = {}
+    for broker in get_registry().brokers:
+        for site in broker_sites(broker):
+            brokers_by_site.setdefault(site, []).append(broker)
+
+    seen_entries = []
+    found = []            # [(msg_key, broker, received, links)]
+    count = 0
+    for key, raw in src.unseen(get_seen_mail_keys(src.name)):
+        count += 1
+        msg = email.message_from_bytes(raw, policy=policy.default)
+        broker = match_broker(msg, brokers_by_site)
+        links = confirmation_links(msg, broker) if broker else []
+        subject = str(msg.get("Subject") or "")
+        if not broker or not links or not VERIFY_WORDS.search(subject + " " + _bodies(msg)[0][:2000]):
+            seen_entries.append({"msg_key": key, "broker_id": broker and broker["id"], "outcome": "ignored"})
+            continue
+        found.append((key, broker, _received(msg), links))
+
+    # Each email confirms the oldest request of its broker submitted before it
+    waiting = get_awaiting_confirmation({b["id"] for _, b, _, _ in found})
+    jobs = []
+    for key, broker, received, links in sorted(found, key=lambda f: f[2]):
+        queue = waiting.get(broker["id"], [])
+        request = next((r for r in queue if _submitted(r) <= received + timedelta(minutes=5)), None)
+        if request is None:
+            if datetime.now(timezone.utc) - received > UNMATCHED_RETRY:
+                seen_entries.append({"msg_key": key, "broker_id": broker["id"], "outcome": "no_request"})
+            log(f"[{broker['name']}] Verification email with no submitted request waiting — skipped")
+            continue
+        queue.remove(request)
+        jobs.append((key, broker, request, links))
+
+    summary = {"messages": count, "matched": len(jobs), "confirmed": 0, "failed": 0}
+    if dry_run:
+        for _, broker, request, links in jobs:
+            log(f"[{broker['name']}] Would confirm request #{request['id']} via {links[0]}")
+        return summary
+
+    confirmations = []
+    with ThreadPoolExecutor(max_workers=CONFIRM_WORKERS) as pool:
+        results = pool.map(lambda job: follow_link(job[3]), jobs)
+        for (key, broker, request, _), (url, error) in zip(jobs, results):
+            if error:
+                summary["failed"] += 1
+                log(f"[{broker['name']}] Could not confirm request #{request['id']}: {error}")
+                continue
+            confirmations.append((request["id"], f"Confirmed via verification email ({urlsplit(url).hostname})"))
+            seen_entries.append({"msg_key": key, "broker_id": broker["id"],
+                                 "request_id": request["id"], "outcome": "confirmed"})
+            log(f"[{broker['name']}] Confirmed request #{request['id']}")
+
+    confirm_requests(confirmations)
+    mark_mail_seen(src.name, seen_entries)
+    summary["confirmed"] = len(confirmations)
+    return summary
+
+
+def start_mail_ingest_worker():
+    """Check the mailbox now and then every MAIL_INGEST_INTERVAL seconds in a daemon thread."""
+    if not MAIL_SOURCE or MAIL_INGEST_INTERVAL <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                ingest_mail()
+            except Exception:
+                logger.exception("Mail ingestion failed")
+            time.sleep(MAIL_INGEST_INTERVAL)
+
+    thread = threading.Thread(target=loop, name="mail-ingest", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,116 @@
+"""
+Local stand-in for an IMAP server, for testing mail ingestion offline.
+
+Serves the messages of a Maildir or mbox as one read-only folder, speaking
+just the part of IMAP4rev1 that core/mail_ingest.py uses: CAPABILITY, LOGIN
+(any credentials), SELECT / EXAMINE, UID SEARCH (every message — SINCE is
+ignored), UID FETCH of the whole message, NOOP and LOGOUT. No TLS.
+
+    python cli.py mock-imap ~/test-maildir --port 1143
+
+and in .env:
+
+    MAIL_SOURCE=imap://test@127.0.0.1:1143/INBOX
+"""
+import mailbox
+import re
+import socketserver
+import threading
+from pathlib import Path
+
+UIDVALIDITY = 1
+
+
+def load_messages(path: str) -> list:
+    """Raw messages of a Maildir directory or mbox file, in a stable order."""
+    p = Path(path).expanduser()
+    box = mailbox.Maildir(str(p), factory=None, create=False) if p.is_dir() else mailbox.mbox(str(p), create=False)
+    return [box.get_bytes(key) for key in sorted(box.iterkeys(), key=str)]
+
+
+class MockImapServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, messages: list):
+        super().__init__(address, _Handler)
+        self.messages = messages       # UID n is messages[n - 1]
+        self.counts = {"sessions": 0, "fetches": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"imap://test@{host}:{port}/INBOX"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def send(self, line: str):
+        self.wfile.write(line.encode("utf-8") + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.counts["sessions"] += 1
+        self.send("* OK [CAPABILITY IMAP4rev1] mock IMAP ready")
+        for raw in self.rfile:
+            parts = raw.decode("utf-8", "replace").strip().split()
+            if len(parts) < 2:
+                continue
+            tag, command, args = parts[0], parts[1].upper(), parts[2:]
+            if command == "UID" and args:
+                command, args = "UID " + args[0].upper(), args[1:]
+            if command == "LOGOUT":
+                self.send("* BYE mock IMAP closing")
+                self.send(f"{tag} OK LOGOUT completed")
+                return
+            handler = getattr(self, "cmd_" + command.replace(" ", "_"), None)
+            if handler is None:
+                self.send(f"{tag} BAD unknown command {command}")
+                continue
+            handler(args)
+            self.send(f"{tag} OK {command} completed")
+
+    def cmd_CAPABILITY(self, args):
+        self.send("* CAPABILITY IMAP4rev1")
+
+    def cmd_LOGIN(self, args):
+        pass
+
+    def cmd_NOOP(self, args):
+        pass
+
+    def cmd_SELECT(self, args):
+        self.send(f"* {len(self.server.messages)} EXISTS")
+        self.send(f"* OK [UIDVALIDITY {UIDVALIDITY}] UIDs valid")
+
+    cmd_EXAMINE = cmd_SELECT
+
+    def cmd_UID_SEARCH(self, args):
+        uids = " ".join(str(i + 1) for i in range(len(self.server.messages)))
+        self.send(f"* SEARCH {uids}".rstrip())
+
+    def cmd_UID_FETCH(self, args):
+        for uid in _uid_set(args[0] if args else "", len(self.server.messages)):
+            data = self.server.messages[uid - 1]
+            with self.server.lock:
+                self.server.counts["fetches"] += 1
+            self.wfile.write(f"* {uid} FETCH (UID {uid} BODY[] {{{len(data)}}}\r\n".encode() + data + b")\r\n")
+
+
+def _uid_set(spec: str, last: int) -> list:
+    uids = []
+    for part in spec.split(","):
+        m = re.fullmatch(r"(\d+|\*)(?::(\d+|\*))?", part)
+        if not m:
+            continue
+        lo = last if m.group(1) == "*" else int(m.group(1))
+        hi = lo if m.group(2) is None else (last if m.group(2) == "*" else int(m.group(2)))
+        uids.extend(u for u in range(min(lo, hi), max(lo, hi) + 1) if 1 <= u <= last)
+    return uids
+
+
+def start_mock_imap(path: str, host: str = "127.0.0.1", port: int = 0) -> str:
+    """Serve a MockImapServer for `path` from a daemon thread and return its MAIL_SOURCE URL (port 0 = any free port)."""
+    server = MockImapServer((host, port), load_messages(path))
+    threading.Thread(target=server.serve_forever, name="mock-imap", daemon=True).start()
+    return server.url
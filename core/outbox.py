@@ -0,0 +1,168 @@
+"""
+outbox.py — delivers opt-out emails in the background.
+
+The email handler only writes the message to the outbox table (queue_email)
+and the run moves on with the request "pending". A daemon thread sends the
+queue over one SMTP connection (brokers/handlers/smtp_pool.py), at most
+SMTP_RATE_PER_MINUTE messages a minute — or the provider's known limit —
+and retries failed attempts with exponential backoff. When an email goes
+out its request becomes "submitted"; when it fails for good, "error".
+
+Queued emails live in the database, so whatever is left when the app stops
+is sent after the next start (or with `python cli.py send-mail`).
+"""
+import logging
+import smtplib
+import threading
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import SMTP_HOST, SMTP_RATE_PER_MINUTE, SMTP_CONFIGURED
+from core.tracker import (
+    enqueue_email, claim_email, finish_email, requeue_stale_emails, next_email_due,
+)
+from brokers.handlers.smtp_pool import SmtpPool
+
+logger = logging.getLogger(__name__)
+
+# Messages per minute by SMTP host, when SMTP_RATE_PER_MINUTE isn't set.
+# Well under the providers' documented limits, which also count other mail.
+PROVIDER_RATE_LIMITS = {
+    "smtp.gmail.com": 20,
+    "smtp.office365.com": 15,
+    "smtp-mail.outlook.com": 15,
+    "smtp.mail.yahoo.com": 10,
+    "smtp.zoho.com": 10,
+}
+DEFAULT_RATE_PER_MINUTE = 10
+
+# Attempts per email, and the wait before retry n: RETRY_BASE_SECONDS * 2^(n-1)
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+
+# An email still "sending" after this long was abandoned by a stopped sender
+STALE_SENDING_SECONDS = 600
+
+# How often the sender looks for due emails without being woken
+POLL_SECONDS = 60
+
+
+def rate_per_minute(host: str = SMTP_HOST) -> float:
+    return SMTP_RATE_PER_MINUTE or PROVIDER_RATE_LIMITS.get(host.lower(), DEFAULT_RATE_PER_MINUTE)
+
+
+def _permanent(exc: Exception) -> bool:
+    """Rejections that will fail the same way every time: refused recipients and 5xx replies (but not login)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False  # fixable in .env without re-queueing
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+class OutboxSender:
+    def __init__(self, host: str = SMTP_HOST):
+        self.host = host
+        self.interval = 60.0 / rate_per_minute(host)
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._last_sent = 0.0
+
+    def start(self):
+        """Start the background thread (once)."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="outbox", daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        """Something was queued: look at the outbox now instead of at the next poll."""
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                requeue_stale_emails(STALE_SENDING_SECONDS)
+                self.send_due()
+                wait = next_email_due()
+            except Exception:
+                logger.exception("Outbox delivery failed")
+                wait = None
+            self._wake.wait(POLL_SECONDS if wait is None else min(wait, POLL_SECONDS))
+
+    def send_due(self, log=None) -> int:
+        """Send every email that is due, throttled, over one connection. Returns how many were attempted."""
+        attempted = 0
+        with self._send_lock, SmtpPool(self.host) as pool:
+            while True:
+                row = claim_email()
+                if row is None:
+                    return attempted
+                self._throttle()
+                self._deliver(pool, row, log)
+                attempted += 1
+
+    def _throttle(self):
+        wait = self._last_sent + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_sent = time.monotonic()
+
+    def _deliver(self, pool: SmtpPool, row: dict, log=None):
+        try:
+            pool.send_raw(row["to_addr"], row["message"])
+        except Exception as exc:
+            attempt = row["attempts"] + 1
+            error = str(exc) or type(exc).__name__
+            if _permanent(exc) or attempt >= MAX_ATTEMPTS:
+                finish_email(row["id"], "failed", error)
+                self.stats["failed"] += 1
+                if log:
+                    log(f"Email to {row['to_addr']} failed: {error}")
+            else:
+                retry_in = min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+                finish_email(row["id"], "failed", error, retry_in=retry_in)
+                self.stats["retried"] += 1
+                if log:
+                    log(f"Email to {row['to_addr']} failed ({error}) — retrying in {retry_in}s")
+            return
+        finish_email(row["id"], "sent")
+        self.stats["sent"] += 1
+        if log:
+            log(f"Email sent to {row['to_addr']}")
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_outbox_sender() -> OutboxSender:
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = OutboxSender()
+        return _sender
+
+
+def queue_email(broker_id: str, msg) -> int:
+    """Put an email.message.Message in the outbox and wake a running sender. Returns the outbox id."""
+    outbox_id = enqueue_email(broker_id, msg["To"], msg.as_string())
+    get_outbox_sender().notify()
+    return outbox_id
+
+
+def start_outbox_sender():
+    """Deliver queued emails from a daemon thread, starting with any left from before."""
+    if not SMTP_CONFIGURED:
+        return None
+    sender = get_outbox_sender()
+    sender.start()
+    return sender
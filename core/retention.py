@@ -0,0 +1,184 @@
+"""
+retention.py — moves old history out of the hot database.
+
+Requests, runs (with their log chunks) and snapshots older than RETENTION_DAYS
+are copied into one SQLite archive per month (db/archive/YYYY-MM.db) and
+deleted from tracker.db. The read functions in tracker.py search the archives
+too, so history stays visible. The latest request per broker is never archived
+so the dashboard and brokers page keep showing the current status.
+
+The hot database uses incremental auto-vacuum so space freed by archiving is
+released a batch at a time. Databases created before that need one full
+VACUUM to switch over; it locks the whole database while it rewrites it, so
+it is only done from the CLI (`python cli.py retention`), never by the
+background worker while runs may be in progress.
+"""
+import logging
+import threading
+import time
+import zlib
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import RETENTION_DAYS, ARCHIVE_DIR
+from core.tracker import get_db, unindex_run_log, ARCHIVE_SCHEMA
+
+# Pages released per incremental_vacuum call (4 KiB each by default)
+VACUUM_PAGES = 2000
+
+# How often the background worker re-applies the policy
+RETENTION_INTERVAL_SECONDS = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+_OLD_REQUESTS = """
+    FROM requests
+    WHERE submitted_at < :cutoff
+      AND (:month IS NULL OR strftime('%Y-%m', submitted_at) = :month)
+      AND id NOT IN (SELECT MAX(id) FROM requests GROUP BY broker_id)
+"""
+
+_OLD_RUNS = """
+    FROM runs
+    WHERE started_at < :cutoff AND strftime('%Y-%m', started_at) = :month
+"""
+
+_OLD_SNAPSHOTS = """
+    FROM snapshots
+    WHERE taken_at < :cutoff AND strftime('%Y-%m', taken_at) = :month
+"""
+
+
+def _months_to_archive(conn, cutoff: str) -> list:
+    rows = conn.execute(
+        """
+        SELECT strftime('%Y-%m', submitted_at) """ + _OLD_REQUESTS + """
+        UNION
+        SELECT strftime('%Y-%m', started_at) FROM runs WHERE started_at < :cutoff
+        UNION
+        SELECT strftime('%Y-%m', taken_at) FROM snapshots WHERE taken_at < :cutoff
+        """,
+        {"cutoff": cutoff, "month": None},
+    ).fetchall()
+    return sorted(r[0] for r in rows if r[0])
+
+
+def _archive_month(conn, month: str, cutoff: str) -> dict:
+    """Move one month of old rows into its archive database. Idempotent if interrupted."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    params = {"cutoff": cutoff, "month": month}
+
+    conn.execute("ATTACH DATABASE ? AS arc", (str(ARCHIVE_DIR / f"{month}.db"),))
+    try:
+        conn.executescript(ARCHIVE_SCHEMA.format(db="arc"))
+
+        moved = conn.execute(
+            "INSERT OR IGNORE INTO arc.requests SELECT id, broker_id, broker_name, submitted_at, "
+            "method, status, notes, confirmed_at, next_check_at, run_id " + _OLD_REQUESTS,
+            params,
+        ).rowcount
+        conn.execute("DELETE " + _OLD_REQUESTS, params)
+
+        run_ids = [r["id"] for r in conn.execute("SELECT id " + _OLD_RUNS, params)]
+        for run_id in run_ids:
+            conn.execute(
+                "INSERT OR IGNORE INTO arc.runs SELECT id, started_at, completed_at, total, "
+                "succeeded, failed FROM runs WHERE id=?",
+                (run_id,),
+            )
+            legacy = conn.execute("SELECT log FROM runs WHERE id=?", (run_id,)).fetchone()["log"]
+            if legacy is not None:
+                # Logs from before chunked storage become a single compressed chunk
+                conn.execute(
+                    "INSERT OR IGNORE INTO arc.run_log_chunks VALUES (?, 0, 0, ?, ?)",
+                    (run_id, legacy.count("\n") + 1, zlib.compress(legacy.encode("utf-8"))),
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO arc.run_log_chunks "
+                "SELECT run_id, seq, first_line, line_count, data FROM run_log_chunks WHERE run_id=?",
+                (run_id,),
+            )
+            unindex_run_log(conn, run_id)
+            conn.execute("DELETE FROM run_log_chunks WHERE run_id=?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE id=?", (run_id,))
+
+        snapshots = 0
+        for row in conn.execute("SELECT id, taken_at, label, data " + _OLD_SNAPSHOTS, params).fetchall():
+            conn.execute(
+                "INSERT OR IGNORE INTO arc.snapshots VALUES (?, ?, ?, ?)",
+                (row["id"], row["taken_at"], row["label"],
+                 zlib.compress((row["data"] or "[]").encode("utf-8"))),
+            )
+            snapshots += 1
+        conn.execute("DELETE " + _OLD_SNAPSHOTS, params)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE arc")
+
+    return {"requests": moved, "runs": len(run_ids), "snapshots": snapshots}
+
+
+def _incremental_vacuum(conn, pages: int = VACUUM_PAGES, convert: bool = False, log=None):
+    """
+    Release free pages back to the filesystem a batch at a time. A database
+    not yet in incremental mode is only converted (full VACUUM) with `convert`.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        if not convert:
+            return
+        if log:
+            log("Converting the database to incremental vacuum (one-time full VACUUM)...")
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+
+
+def apply_retention(days: int = None, log=None, convert: bool = False) -> dict:
+    """
+    Archive everything older than `days` (defaults to RETENTION_DAYS) and
+    vacuum the hot database. Returns counts per archived month. `convert`
+    allows the one-time full VACUUM of an older database — offline use only.
+    """
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return {}
+
+    conn = get_db()
+    cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{int(days)} days",)).fetchone()[0]
+    summary = {}
+    try:
+        for month in _months_to_archive(conn, cutoff):
+            summary[month] = _archive_month(conn, month, cutoff)
+            if log:
+                counts = summary[month]
+                log(f"Archived {month}: {counts['requests']} request(s), "
+                    f"{counts['runs']} run(s), {counts['snapshots']} snapshot(s)")
+        _incremental_vacuum(conn, convert=convert, log=log)
+    finally:
+        conn.close()
+    return summary
+
+
+def start_retention_worker():
+    """Apply the retention policy now and then once a day in a daemon thread."""
+    if RETENTION_DAYS <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                apply_retention()
+            except Exception:
+                logger.exception("Retention failed")
+            time.sleep(RETENTION_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=loop, name="retention", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,254 @@
+"""
+scanner.py — read-only exposure scan.
+
+Checks, for every broker with a "search" spec in registry.json, whether the
+profile has a listing there — without opting out of anything:
+
+    "search": {
+      "url": "https://voterrecords.com/voters/{name_slug}/{state_slug}",
+      "listing": "/voter/",          regex matched against the links on the results page
+      "ready": "a[href*='/voter/']"  optional: element to wait for when a browser is needed
+    }
+
+Searches are fetched concurrently with plain HTTP requests; only brokers that
+answer with a bot challenge are retried in a (rate-limited) headless browser.
+Each result link is scored with the text of its card by the same matcher the
+opt-out handlers use (brokers/handlers/matcher.py, honouring the broker's
+"match_threshold") and must name the profile's city or state, so a page of
+namesakes counts as not listed. Results only go to the exposures table: the
+opt-out handlers run their own search and matching rather than trusting a
+scan hit, which would skip both.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import SCAN_WORKERS
+from core.tracker import get_profile, save_exposure
+from brokers import get_registry
+from brokers.handlers.base import BaseHandler, is_bot_wall, profile_key
+from brokers.handlers.http_form import get_session, CHALLENGE_STATUSES, REQUEST_TIMEOUT
+from brokers.handlers.matcher import extract_candidates, rank_candidates, location_matches
+
+# Headless browsers are expensive — at most this many scan fallbacks at once
+BROWSER_SLOTS = 2
+
+_browser_slots = threading.BoundedSemaphore(BROWSER_SLOTS)
+
+
+# Tags that start a new line of text, like innerText
+BLOCK_TAGS = {
+    "address", "article", "br", "dd", "div", "dl", "dt", "footer", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "ol", "p", "section", "table", "td", "th", "tr", "ul",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class _Element:
+    __slots__ = ("tag", "parent", "parts", "urls")
+
+    def __init__(self, tag, parent):
+        self.tag = tag
+        self.parent = parent
+        self.parts = []
+        self.urls = set()   # listing URLs linked from inside this element
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class _ResultLinks(HTMLParser):
+    """
+    Listing links with the text of the card around it — the HTTP counterpart
+    of matcher.extract_candidates(). A link's card is its largest ancestor (at
+    most six up, below <body>) that links to no other listing.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._in_title = False
+        self._root = _Element(None, None)
+        self._open = [self._root]
+        self._links = []   # (href, element)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        if tag in BLOCK_TAGS:
+            self._open[-1].parts.append("\n")
+        if tag in VOID_TAGS:
+            return
+        el = _Element(tag, self._open[-1])
+        self._open.append(el)
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self._links.append((href, el))
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        if tag not in (el.tag for el in self._open[1:]):
+            return  # stray end tag
+        while True:
+            el = self._close()
+            if el.tag == tag:
+                break
+        if tag in BLOCK_TAGS:
+            self._open[-1].parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        self._open[-1].parts.append(data)
+
+    def _close(self) -> _Element:
+        el = self._open.pop()
+        el.parent.parts.append(el.text)
+        return el
+
+    def candidates(self, base_url: str, pattern: str) -> list:
+        """[{index, url, text}] for links matching `pattern`, like matcher.extract_candidates()."""
+        while len(self._open) > 1:
+            self._close()
+        regex = re.compile(pattern)
+        links = [(urljoin(base_url, href), el) for href, el in self._links]
+        links = [(url, el) for url, el in links if regex.search(url)]
+        for url, el in links:
+            node = el
+            while node is not None:
+                node.urls.add(url)
+                node = node.parent
+        out = []
+        for url, el in links:
+            box = el
+            for _ in range(6):
+                parent = box.parent
+                if parent is None or parent.tag in (None, "html", "body") or parent.urls - {url}:
+                    break
+                box = parent
+            out.append({"index": len(out), "url": url, "text": box.text.strip()})
+        return out
+
+
+def _match_listings(candidates: list, pattern: str, search_url: str, profile: dict, threshold=None) -> list:
+    """
+    Result links that match the listing pattern and the profile, best first.
+    Besides the matcher's threshold, the card must name the profile's city or
+    state — a name alone is not enough to call the profile listed.
+    """
+    regex = re.compile(pattern)
+    results = [c for c in candidates if c["url"] and c["url"] != search_url and regex.search(c["url"])]
+    return [m for m in rank_candidates(results, profile, threshold) if location_matches(m["text"], profile)]
+
+
+def _fetch_http(url: str, pattern: str):
+    """Returns the result links with their cards, or None if the site wants a real browser."""
+    resp = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    if resp.status_code in CHALLENGE_STATUSES:
+        return None
+    parser = _ResultLinks()
+    parser.feed(resp.text)
+    parser.close()
+    if is_bot_wall(parser.title):
+        return None
+    if resp.status_code >= 400 and resp.status_code != 404:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    return parser.candidates(resp.url, pattern)
+
+
+def _fetch_browser(handler: BaseHandler, url: str, ready: str = None):
+    """Returns the result links with their cards, or None if the browser hit a bot wall too."""
+    from playwright.sync_api import sync_playwright
+
+    with _browser_slots, sync_playwright() as p:
+        browser, page = handler.open_browser(p)
+        try:
+            handler.goto(page, url, ready=ready, label="scan")
+            if is_bot_wall(page.title()):
+                return None
+            return extract_candidates(page, "a[href]")
+        finally:
+            handler.close_browser(browser, page)
+
+
+def scan_broker(profile: dict, broker: dict) -> dict:
+    """
+    Check one broker. Returns {"status": listed | not_listed | unknown,
+    "listing_url", "notes", "via": "http" | "browser"}.
+    """
+    spec = broker["search"]
+    handler = BaseHandler(profile, broker)
+    url = spec["url"].format_map(handler.template_values())
+
+    via = "http"
+    try:
+        fetched = _fetch_http(url, spec["listing"])
+        if fetched is None:
+            via = "browser"
+            fetched = _fetch_browser(handler, url, spec.get("ready"))
+    except ImportError:
+        return {"status": "unknown", "listing_url": None, "via": via,
+                "notes": "Search needs a browser and Playwright is not installed."}
+    except Exception as exc:
+        return {"status": "unknown", "listing_url": None, "via": via, "notes": f"Search failed ({exc})."}
+
+    if fetched is None:
+        return {"status": "unknown", "listing_url": None, "via": via, "notes": "Search blocked by a bot wall."}
+
+    matches = _match_listings(fetched, spec["listing"], url, profile, broker.get("match_threshold"))
+    if matches:
+        notes = f"{len(matches)} matching listings" if len(matches) > 1 else ""
+        return {"status": "listed", "listing_url": matches[0]["url"], "via": via, "notes": notes}
+    return {"status": "not_listed", "listing_url": None, "via": via, "notes": ""}
+
+
+def scan_brokers(broker_ids: list = None, log_callback=None, workers: int = None) -> dict:
+    """
+    Scan the given broker IDs (or all) concurrently and store the results.
+    log_callback(msg: str) is called for each log line. Returns a summary dict.
+    """
+    log = log_callback or (lambda msg: None)
+    profile = get_profile()
+    if not profile:
+        log("ERROR: No profile found. Please fill in your profile first.")
+        return {"mode": "scan", "listed": 0, "not_listed": 0, "unknown": 0, "skipped": 0, "total": 0}
+
+    registry = get_registry()
+    brokers = (
+        registry.brokers
+        if not broker_ids
+        else [registry.by_id[b] for b in dict.fromkeys(broker_ids) if b in registry.by_id]
+    )
+    scannable = [b for b in brokers if b.get("search")]
+    summary = {"mode": "scan", "listed": 0, "not_listed": 0, "unknown": 0,
+               "skipped": len(brokers) - len(scannable), "total": len(brokers)}
+
+    log(f"Scanning {len(scannable)} broker(s) for listings "
+        f"({summary['skipped']} without a search definition skipped)")
+    log("─" * 60)
+
+    key = profile_key(profile)
+    with ThreadPoolExecutor(max_workers=workers or SCAN_WORKERS, thread_name_prefix="scan") as pool:
+        futures = {pool.submit(scan_broker, profile, b): b for b in scannable}
+        for future in as_completed(futures):
+            broker = futures[future]
+            result = future.result()
+            save_exposure(broker["id"], key, result["status"], result["listing_url"], result["notes"])
+            summary[result["status"]] += 1
+            detail = result["listing_url"] or result["notes"]
+            log(f"[{broker['name']}] {result['status'].upper().replace('_', ' ')} "
+                f"via {result['via']}" + (f" — {detail}" if detail else ""))
+
+    log("─" * 60)
+    log(f"Done. Listed: {summary['listed']} | Not listed: {summary['not_listed']} | "
+        f"Unknown: {summary['unknown']}")
+    return summary
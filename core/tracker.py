@@ -4,12 +4,13 @@ Every function opens its own connection so it's thread-safe.
 """
 import sqlite3
 import json
+import zlib
 from pathlib import Path
 
 # Import here to avoid circular; config is at project root
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import DB_PATH
+from config import DB_PATH, ARCHIVE_DIR
 
 
 # ── Connection ─────────────────────────────────────────────────────────────────
@@ -18,12 +19,75 @@ def get_db():
     DB_PATH.parent.mkdir(exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    # Must precede WAL to apply to a new database; older ones are converted by
+    # `python cli.py retention` (see core/retention.py)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("PRAGMA journal_mode=WAL")   # safe for multi-thread reads
     return conn
 
 
+def get_archive_db(path):
+    """Read-only connection to one monthly archive database."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def archive_paths(since: str = None) -> list:
+    """Monthly archive files (db/archive/YYYY-MM.db), newest first, optionally from `since` on."""
+    if not ARCHIVE_DIR.exists():
+        return []
+    paths = sorted(ARCHIVE_DIR.glob("????-??.db"), reverse=True)
+    if since:
+        paths = [p for p in paths if p.stem >= since[:7]]
+    return paths
+
+
 # ── Schema ─────────────────────────────────────────────────────────────────────
 
+# Tables of a monthly archive database. Same columns as the hot tables, except
+# snapshots.data is zlib-compressed and runs carry no legacy log column.
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {db}.requests (
+        id               INTEGER PRIMARY KEY,
+        broker_id        TEXT NOT NULL,
+        broker_name      TEXT NOT NULL,
+        submitted_at     TEXT,
+        method           TEXT,
+        status           TEXT,
+        notes            TEXT,
+        confirmed_at     TEXT,
+        next_check_at    TEXT,
+        run_id           TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS {db}.runs (
+        id           TEXT PRIMARY KEY,
+        started_at   TEXT,
+        completed_at TEXT,
+        total        INTEGER,
+        succeeded    INTEGER,
+        failed       INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS {db}.run_log_chunks (
+        run_id      TEXT NOT NULL,
+        seq         INTEGER NOT NULL,
+        first_line  INTEGER NOT NULL,
+        line_count  INTEGER NOT NULL,
+        data        BLOB NOT NULL,
+        PRIMARY KEY (run_id, seq)
+    );
+
+    CREATE TABLE IF NOT EXISTS {db}.snapshots (
+        id       INTEGER PRIMARY KEY,
+        taken_at TEXT,
+        label    TEXT,
+        data     BLOB
+    );
+"""
+
+
 def init_db():
     conn = get_db()
     conn.executescript("""
@@ -62,11 +126,262 @@ def init_db():
             failed       INTEGER DEFAULT 0,
             log          TEXT
         );
+
+        CREATE TABLE IF NOT EXISTS run_log_chunks (
+            id          INTEGER PRIMARY KEY,
+            run_id      TEXT NOT NULL,
+            seq         INTEGER NOT NULL,
+            first_line  INTEGER NOT NULL,
+            line_count  INTEGER NOT NULL,
+            data        BLOB NOT NULL,
+            UNIQUE (run_id, seq)
+        );
+
+        CREATE TABLE IF NOT EXISTS wait_timings (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id      TEXT,
+            broker_id   TEXT NOT NULL,
+            label       TEXT NOT NULL,
+            ms          INTEGER NOT NULL,
+            ok          INTEGER NOT NULL,
+            recorded_at TEXT DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_wait_timings_broker ON wait_timings (broker_id, label);
+
+        CREATE TABLE IF NOT EXISTS browser_state (
+            broker_id   TEXT NOT NULL,
+            profile_key TEXT NOT NULL,
+            state       TEXT NOT NULL,
+            saved_at    TEXT DEFAULT (datetime('now')),
+            expires_at  TEXT NOT NULL,
+            PRIMARY KEY (broker_id, profile_key)
+        );
+
+        CREATE TABLE IF NOT EXISTS listing_urls (
+            broker_id   TEXT NOT NULL,
+            profile_key TEXT NOT NULL,
+            url         TEXT NOT NULL,
+            found_at    TEXT DEFAULT (datetime('now')),
+            expires_at  TEXT NOT NULL,
+            PRIMARY KEY (broker_id, profile_key, url)
+        );
+
+        CREATE TABLE IF NOT EXISTS exposures (
+            broker_id   TEXT NOT NULL,
+            profile_key TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            listing_url TEXT,
+            notes       TEXT,
+            checked_at  TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (broker_id, profile_key)
+        );
+
+        CREATE TABLE IF NOT EXISTS sitekeys (
+            origin      TEXT NOT NULL,
+            path        TEXT NOT NULL,
+            kind        TEXT NOT NULL,
+            sitekey     TEXT NOT NULL,
+            seen_at     TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (origin, path, kind)
+        );
+
+        CREATE TABLE IF NOT EXISTS captcha_solves (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id      TEXT,
+            broker_id   TEXT,
+            profile_key TEXT,
+            task_type   TEXT NOT NULL,
+            outcome     TEXT NOT NULL,
+            ms          INTEGER NOT NULL,
+            cost        REAL NOT NULL DEFAULT 0,
+            solved_at   TEXT DEFAULT (datetime('now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_captcha_solves_run ON captcha_solves (run_id);
+
+        CREATE TABLE IF NOT EXISTS outbox (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id      INTEGER,
+            broker_id       TEXT,
+            to_addr         TEXT NOT NULL,
+            message         TEXT NOT NULL,
+            status          TEXT NOT NULL DEFAULT 'queued',
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT DEFAULT (datetime('now')),
+            claimed_at      TEXT,
+            last_error      TEXT,
+            created_at      TEXT DEFAULT (datetime('now')),
+            sent_at         TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+
+        CREATE TABLE IF NOT EXISTS mail_seen (
+            source      TEXT NOT NULL,
+            msg_key     TEXT NOT NULL,
+            broker_id   TEXT,
+            request_id  INTEGER,
+            outcome     TEXT NOT NULL,
+            seen_at     TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (source, msg_key)
+        );
     """)
     conn.commit()
+    _migrate_run_log_chunks(conn)
+    _init_fts(conn)
     conn.close()
 
 
+def _migrate_run_log_chunks(conn):
+    """
+    Give run_log_chunks from older databases an explicit id column. Their
+    implicit rowid keyed run_log_fts but could change on VACUUM; the rowids
+    are kept as ids so the index stays valid.
+    """
+    columns = [r["name"] for r in conn.execute("PRAGMA table_info(run_log_chunks)")]
+    if "id" in columns:
+        return
+    conn.executescript("""
+        BEGIN;
+        ALTER TABLE run_log_chunks RENAME TO run_log_chunks_old;
+        CREATE TABLE run_log_chunks (
+            id          INTEGER PRIMARY KEY,
+            run_id      TEXT NOT NULL,
+            seq         INTEGER NOT NULL,
+            first_line  INTEGER NOT NULL,
+            line_count  INTEGER NOT NULL,
+            data        BLOB NOT NULL,
+            UNIQUE (run_id, seq)
+        );
+        INSERT INTO run_log_chunks (id, run_id, seq, first_line, line_count, data)
+        SELECT rowid, run_id, seq, first_line, line_count, data FROM run_log_chunks_old;
+        DROP TABLE run_log_chunks_old;
+        COMMIT;
+    """)
+
+
+# ── Full-text search index ─────────────────────────────────────────────────────
+# requests_fts mirrors requests.broker_name/notes through triggers.
+# run_log_fts is contentless (the text lives compressed in run_log_chunks);
+# its rowid is the chunk's id. Archived rows are not indexed.
+
+def _init_fts(conn):
+    existed = fts_enabled(conn)
+    try:
+        conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS requests_fts USING fts5(
+                broker_name, notes, content='requests', content_rowid='id'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS requests_fts_insert AFTER INSERT ON requests BEGIN
+                INSERT INTO requests_fts (rowid, broker_name, notes)
+                VALUES (new.id, new.broker_name, new.notes);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS requests_fts_delete AFTER DELETE ON requests BEGIN
+                INSERT INTO requests_fts (requests_fts, rowid, broker_name, notes)
+                VALUES ('delete', old.id, old.broker_name, old.notes);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS requests_fts_update
+            AFTER UPDATE OF broker_name, notes ON requests BEGIN
+                INSERT INTO requests_fts (requests_fts, rowid, broker_name, notes)
+                VALUES ('delete', old.id, old.broker_name, old.notes);
+                INSERT INTO requests_fts (rowid, broker_name, notes)
+                VALUES (new.id, new.broker_name, new.notes);
+            END;
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS run_log_fts USING fts5(text, content='');
+        """)
+    except sqlite3.OperationalError:
+        return  # SQLite built without FTS5 — search falls back to LIKE
+
+    if not existed:
+        # First start with FTS: index what is already there
+        conn.execute("INSERT INTO requests_fts (requests_fts) VALUES ('rebuild')")
+        for row in conn.execute("SELECT id, data FROM run_log_chunks").fetchall():
+            conn.execute(
+                "INSERT INTO run_log_fts (rowid, text) VALUES (?, ?)",
+                (row["id"], zlib.decompress(row["data"]).decode("utf-8")),
+            )
+        conn.commit()
+
+
+def fts_enabled(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='run_log_fts'"
+    ).fetchone() is not None
+
+
+def unindex_run_log(conn, run_id):
+    """Drop a run's chunks from run_log_fts (contentless tables need the original text)."""
+    if not fts_enabled(conn):
+        return
+    for row in conn.execute(
+        "SELECT id, data FROM run_log_chunks WHERE run_id=?", (run_id,)
+    ).fetchall():
+        conn.execute(
+            "INSERT INTO run_log_fts (run_log_fts, rowid, text) VALUES ('delete', ?, ?)",
+            (row["id"], zlib.decompress(row["data"]).decode("utf-8")),
+        )
+
+
+def _search_terms(text: str) -> list:
+    return [t for t in text.lower().split() if t]
+
+
+def _fts_query(terms: list) -> str:
+    """Each word becomes a quoted prefix term, so user input can't break FTS syntax."""
+    return " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+
+
+def search_run_logs(text: str, since=None, limit: int = 50) -> list:
+    """
+    Return log lines containing every word of `text`, newest runs first:
+    [{"run_id", "started_at", "line_no", "line"}].
+    """
+    terms = _search_terms(text)
+    if not terms:
+        return []
+    conn = get_db()
+    if fts_enabled(conn):
+        query = (
+            "SELECT c.run_id, c.first_line, c.data, runs.started_at "
+            "FROM run_log_fts f "
+            "JOIN run_log_chunks c ON c.id = f.rowid "
+            "JOIN runs ON runs.id = c.run_id "
+            "WHERE run_log_fts MATCH ?"
+        )
+        params = [_fts_query(terms)]
+    else:
+        query = (
+            "SELECT c.run_id, c.first_line, c.data, runs.started_at "
+            "FROM run_log_chunks c JOIN runs ON runs.id = c.run_id WHERE 1=1"
+        )
+        params = []
+    if since:
+        query += " AND runs.started_at>=?"
+        params.append(since)
+    query += " ORDER BY runs.started_at DESC, c.seq"
+
+    hits = []
+    try:
+        for row in conn.execute(query, params):
+            lines = zlib.decompress(row["data"]).decode("utf-8").split("\n")
+            for i, line in enumerate(lines):
+                lowered = line.lower()
+                if all(t in lowered for t in terms):
+                    hits.append({
+                        "run_id": row["run_id"],
+                        "started_at": row["started_at"],
+                        "line_no": row["first_line"] + i,
+                        "line": line,
+                    })
+                    if len(hits) >= limit:
+                        return hits
+    finally:
+        conn.close()
+    return hits
+
+
 # ── Profile ────────────────────────────────────────────────────────────────────
 
 def get_profile() -> dict:
@@ -90,9 +405,9 @@ def save_profile(data: dict):
 
 # ── Requests ───────────────────────────────────────────────────────────────────
 
-def add_request(broker_id, broker_name, method, status, notes="", run_id=None):
+def add_request(broker_id, broker_name, method, status, notes="", run_id=None) -> int:
     conn = get_db()
-    conn.execute(
+    cur = conn.execute(
         """INSERT INTO requests
                (broker_id, broker_name, submitted_at, method, status, notes, run_id)
            VALUES (?, ?, datetime('now'), ?, ?, ?, ?)""",
@@ -100,54 +415,124 @@ def add_request(broker_id, broker_name, method, status, notes="", run_id=None):
     )
     conn.commit()
     conn.close()
+    return cur.lastrowid
 
 
 def update_request(request_id: int, status: str, notes: str = None):
-    conn = get_db()
     if notes is not None:
-        conn.execute(
-            "UPDATE requests SET status=?, notes=? WHERE id=?",
-            (status, notes, request_id),
-        )
+        query, params = "UPDATE requests SET status=?, notes=? WHERE id=?", (status, notes, request_id)
     else:
-        conn.execute("UPDATE requests SET status=? WHERE id=?", (status, request_id))
+        query, params = "UPDATE requests SET status=? WHERE id=?", (status, request_id)
+
+    conn = get_db()
+    updated = conn.execute(query, params).rowcount
+    conn.commit()
+    conn.close()
+    if updated:
+        return
+
+    # Archived requests are edited in place in their monthly archive
+    for path in archive_paths():
+        arc = sqlite3.connect(path)
+        updated = arc.execute(query, params).rowcount
+        arc.commit()
+        arc.close()
+        if updated:
+            return
+
+
+def confirm_requests(confirmations: list):
+    """Mark requests confirmed in one transaction: [(request_id, notes)]."""
+    if not confirmations:
+        return
+    conn = get_db()
+    conn.executemany(
+        "UPDATE requests SET status='confirmed', confirmed_at=datetime('now'), notes=? WHERE id=?",
+        [(notes, request_id) for request_id, notes in confirmations],
+    )
     conn.commit()
     conn.close()
 
 
-def get_requests(broker_id=None, status=None, since=None, run_id=None) -> list:
+def get_awaiting_confirmation(broker_ids) -> dict:
+    """Submitted requests per broker, oldest first: {broker_id: [request]}."""
+    broker_ids = list(broker_ids)
+    if not broker_ids:
+        return {}
+    conn = get_db()
+    rows = conn.execute(
+        f"SELECT * FROM requests WHERE status='submitted' "
+        f"AND broker_id IN ({', '.join('?' * len(broker_ids))}) ORDER BY submitted_at, id",
+        broker_ids,
+    ).fetchall()
+    conn.close()
+    waiting = {}
+    for r in rows:
+        waiting.setdefault(r["broker_id"], []).append(dict(r))
+    return waiting
+
+
+def get_requests(broker_id=None, status=None, since=None, run_id=None, text=None) -> list:
+    """Requests matching all filters, newest first. `text` searches broker name and notes."""
     conn = get_db()
-    query = "SELECT * FROM requests WHERE 1=1"
+    where = " WHERE 1=1"
     params = []
     if broker_id:
-        query += " AND broker_id=?"
+        where += " AND broker_id=?"
         params.append(broker_id)
     if status:
-        query += " AND status=?"
+        where += " AND status=?"
         params.append(status)
     if since:
-        query += " AND submitted_at>=?"
+        where += " AND submitted_at>=?"
         params.append(since)
     if run_id:
-        query += " AND run_id=?"
+        where += " AND run_id=?"
         params.append(run_id)
-    query += " ORDER BY submitted_at DESC"
-    rows = conn.execute(query, params).fetchall()
+
+    # Archives have no FTS index, so they are filtered with LIKE
+    like_where, like_params = where, list(params)
+    terms = _search_terms(text or "")
+    for term in terms:
+        like_where += " AND (broker_name || ' ' || COALESCE(notes, '')) LIKE ?"
+        like_params.append(f"%{term}%")
+    order = " ORDER BY submitted_at DESC"
+
+    if terms and fts_enabled(conn):
+        query = (
+            "SELECT requests.* FROM requests "
+            "JOIN requests_fts ON requests_fts.rowid = requests.id"
+            + where + " AND requests_fts MATCH ?" + order
+        )
+        rows = conn.execute(query, params + [_fts_query(terms)]).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM requests" + like_where + order, like_params).fetchall()
+    rows = [dict(r) for r in rows]
     conn.close()
-    return [dict(r) for r in rows]
+
+    archived = archive_paths(since)
+    for path in archived:
+        arc = get_archive_db(path)
+        rows.extend(dict(r) for r in arc.execute(
+            "SELECT * FROM requests" + like_where + order, like_params
+        ).fetchall())
+        arc.close()
+    if archived:
+        rows.sort(key=lambda r: r["submitted_at"] or "", reverse=True)
+    return rows
 
 
 def get_latest_per_broker() -> list:
-    """Return the most recent request for each broker."""
+    """Return the most recent request for each broker (the highest id, so one row even when a run recorded several)."""
     conn = get_db()
     rows = conn.execute("""
         SELECT r.*
         FROM requests r
         INNER JOIN (
-            SELECT broker_id, MAX(submitted_at) AS max_at
+            SELECT MAX(id) AS max_id
             FROM requests
             GROUP BY broker_id
-        ) latest ON r.broker_id = latest.broker_id AND r.submitted_at = latest.max_at
+        ) latest ON r.id = latest.max_id
         ORDER BY r.broker_name
     """).fetchall()
     conn.close()
@@ -161,18 +546,15 @@ def get_stats() -> dict:
     total = conn.execute("SELECT COUNT(DISTINCT broker_id) FROM requests").fetchone()[0]
     statuses = conn.execute("""
         SELECT status, COUNT(*) AS cnt
-        FROM (
-            SELECT broker_id, status
-            FROM requests r1
-            WHERE submitted_at = (
-                SELECT MAX(submitted_at) FROM requests r2
-                WHERE r2.broker_id = r1.broker_id
-            )
-        )
+        FROM requests
+        WHERE id IN (SELECT MAX(id) FROM requests GROUP BY broker_id)
         GROUP BY status
     """).fetchall()
     recent_runs = conn.execute(
-        "SELECT * FROM runs ORDER BY started_at DESC LIMIT 5"
+        "SELECT id, started_at, completed_at, total, succeeded, failed, "
+        "(SELECT COUNT(*) FROM captcha_solves WHERE run_id=runs.id AND outcome='solved') AS captchas, "
+        "(SELECT COALESCE(SUM(cost), 0) FROM captcha_solves WHERE run_id=runs.id) AS captcha_cost "
+        "FROM runs ORDER BY started_at DESC LIMIT 5"
     ).fetchall()
     conn.close()
     return {
@@ -183,24 +565,505 @@ def get_stats() -> dict:
 
 
 # ── Runs ───────────────────────────────────────────────────────────────────────
+# Run logs are written while the run progresses as zlib-compressed chunks of
+# lines in run_log_chunks. runs.log is only populated by older versions and is
+# still read as a fallback for those rows.
+
+def start_run(run_id, total):
+    conn = get_db()
+    conn.execute(
+        """INSERT OR REPLACE INTO runs (id, started_at, total)
+           VALUES (?, datetime('now'), ?)""",
+        (run_id, total),
+    )
+    conn.commit()
+    conn.close()
+
+
+def append_run_log(run_id, seq: int, first_line: int, lines: list):
+    """Store one compressed chunk of log lines for a run."""
+    text = "\n".join(lines)
+    conn = get_db()
+    cur = conn.execute(
+        """INSERT INTO run_log_chunks
+               (run_id, seq, first_line, line_count, data)
+           VALUES (?, ?, ?, ?, ?)""",
+        (run_id, seq, first_line, len(lines), zlib.compress(text.encode("utf-8"))),
+    )
+    if fts_enabled(conn):
+        conn.execute(
+            "INSERT INTO run_log_fts (rowid, text) VALUES (?, ?)",
+            (cur.lastrowid, text),
+        )
+    conn.commit()
+    conn.close()
+
 
-def save_run(run_id, total, succeeded, failed, log_lines: list):
+def finish_run(run_id, succeeded, failed, total=None):
+    """Close a run. `total` is the number of requests it recorded (one broker can yield several)."""
     conn = get_db()
     conn.execute(
-        """INSERT OR REPLACE INTO runs
-               (id, started_at, completed_at, total, succeeded, failed, log)
-           VALUES (?, datetime('now'), datetime('now'), ?, ?, ?, ?)""",
-        (run_id, total, succeeded, failed, "\n".join(log_lines)),
+        "UPDATE runs SET completed_at=datetime('now'), succeeded=?, failed=?, "
+        "total=COALESCE(?, total) WHERE id=?",
+        (succeeded, failed, total, run_id),
     )
     conn.commit()
     conn.close()
 
 
 def get_run(run_id) -> dict | None:
+    """Run metadata plus its log line count — the log itself is read with iter_run_log()."""
+    conn = get_db()
+    row = conn.execute(
+        """SELECT id, started_at, completed_at, total, succeeded, failed,
+                  (SELECT COALESCE(SUM(line_count), 0) FROM run_log_chunks
+                   WHERE run_id=runs.id) AS log_lines,
+                  log IS NOT NULL AS legacy_log
+           FROM runs WHERE id=?""",
+        (run_id,),
+    ).fetchone()
+    conn.close()
+    if row:
+        return dict(row)
+
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        row = arc.execute(
+            """SELECT id, started_at, completed_at, total, succeeded, failed,
+                      (SELECT COALESCE(SUM(line_count), 0) FROM run_log_chunks
+                       WHERE run_id=runs.id) AS log_lines,
+                      0 AS legacy_log
+               FROM runs WHERE id=?""",
+            (run_id,),
+        ).fetchone()
+        arc.close()
+        if row:
+            return dict(row)
+    return None
+
+
+def _iter_chunk_lines(conn, run_id, start, end):
+    query = (
+        "SELECT first_line, data FROM run_log_chunks "
+        "WHERE run_id=? AND first_line + line_count > ?"
+    )
+    params = [run_id, start]
+    if end is not None:
+        query += " AND first_line < ?"
+        params.append(end)
+    query += " ORDER BY seq"
+    for row in conn.execute(query, params):
+        lines = zlib.decompress(row["data"]).decode("utf-8").split("\n")
+        lo = max(start - row["first_line"], 0)
+        hi = len(lines) if end is None else max(end - row["first_line"], 0)
+        yield from lines[lo:hi]
+
+
+def iter_run_log(run_id, start: int = 0, end: int = None):
+    """
+    Yield log lines [start, end) of a run, decompressing only the chunks that
+    overlap the range. Falls back to the legacy runs.log column, then to the
+    monthly archives.
+    """
+    conn = get_db()
+    try:
+        run = conn.execute("SELECT log FROM runs WHERE id=?", (run_id,)).fetchone()
+        if run:
+            if run["log"] is not None:
+                yield from run["log"].split("\n")[start:end]
+            else:
+                yield from _iter_chunk_lines(conn, run_id, start, end)
+            return
+    finally:
+        conn.close()
+
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        try:
+            if arc.execute("SELECT 1 FROM runs WHERE id=?", (run_id,)).fetchone():
+                yield from _iter_chunk_lines(arc, run_id, start, end)
+                return
+        finally:
+            arc.close()
+
+
+# ── Wait timings ───────────────────────────────────────────────────────────────
+# How long each handler wait took (see BaseHandler.goto / act_and_wait), used
+# to tune the per-broker "wait_budgets" in registry.json.
+
+def record_wait_timings(run_id, broker_id: str, timings: list):
+    if not timings:
+        return
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO wait_timings (run_id, broker_id, label, ms, ok) VALUES (?, ?, ?, ?, ?)",
+        [(run_id, broker_id, t["label"], t["ms"], int(t["ok"])) for t in timings],
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_wait_stats(broker_id: str = None) -> list:
+    """Per broker and wait label: count, average/max milliseconds and timeouts."""
+    query = """
+        SELECT broker_id, label, COUNT(*) AS count,
+               CAST(AVG(ms) AS INTEGER) AS avg_ms, MAX(ms) AS max_ms,
+               SUM(ok = 0) AS timeouts
+        FROM wait_timings
+    """
+    params = []
+    if broker_id:
+        query += " WHERE broker_id=?"
+        params.append(broker_id)
+    query += " GROUP BY broker_id, label ORDER BY broker_id, label"
+    conn = get_db()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+# ── Browser state ──────────────────────────────────────────────────────────────
+# Playwright storage state (cookies + localStorage) saved per broker and
+# profile after a session, and restored into the next one.
+
+def get_browser_state(broker_id: str, profile_key: str) -> dict | None:
     conn = get_db()
-    row = conn.execute("SELECT * FROM runs WHERE id=?", (run_id,)).fetchone()
+    conn.execute("DELETE FROM browser_state WHERE expires_at <= datetime('now')")
+    conn.commit()
+    row = conn.execute(
+        "SELECT state FROM browser_state WHERE broker_id=? AND profile_key=?",
+        (broker_id, profile_key),
+    ).fetchone()
+    conn.close()
+    return json.loads(row["state"]) if row else None
+
+
+def save_browser_state(broker_id: str, profile_key: str, state: dict, ttl_hours: float):
+    """
+    Save (or refresh) a session. The expiry is set when the session is first
+    saved and not pushed back on later saves, so a session used every run
+    still ages out after ttl_hours.
+    """
+    conn = get_db()
+    conn.execute(
+        """INSERT INTO browser_state
+               (broker_id, profile_key, state, saved_at, expires_at)
+           VALUES (?, ?, ?, datetime('now'), datetime('now', ?))
+           ON CONFLICT (broker_id, profile_key)
+           DO UPDATE SET state=excluded.state, saved_at=excluded.saved_at""",
+        (broker_id, profile_key, json.dumps(state), f"{int(ttl_hours * 3600):+d} seconds"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def delete_browser_state(broker_id: str = None, profile_key: str = None):
+    """Forget saved state for one broker/profile, one broker, or everything."""
+    query, params = "DELETE FROM browser_state WHERE 1=1", []
+    if broker_id:
+        query += " AND broker_id=?"
+        params.append(broker_id)
+    if profile_key:
+        query += " AND profile_key=?"
+        params.append(profile_key)
+    conn = get_db()
+    conn.execute(query, params)
+    conn.commit()
+    conn.close()
+
+
+# ── Listing URLs ───────────────────────────────────────────────────────────────
+# Profile pages found by a broker search, so later runs can skip the search.
+
+def get_listing_urls(broker_id: str, profile_key: str) -> list:
+    """Unexpired listing URLs for a broker/profile, most recently found first."""
+    conn = get_db()
+    conn.execute("DELETE FROM listing_urls WHERE expires_at <= datetime('now')")
+    conn.commit()
+    rows = conn.execute(
+        """SELECT url FROM listing_urls WHERE broker_id=? AND profile_key=?
+           ORDER BY found_at DESC""",
+        (broker_id, profile_key),
+    ).fetchall()
+    conn.close()
+    return [r["url"] for r in rows]
+
+
+def save_listing_url(broker_id: str, profile_key: str, url: str, ttl_days: float):
+    conn = get_db()
+    conn.execute(
+        """INSERT OR REPLACE INTO listing_urls
+               (broker_id, profile_key, url, found_at, expires_at)
+           VALUES (?, ?, ?, datetime('now'), datetime('now', ?))""",
+        (broker_id, profile_key, url, f"{int(ttl_days * 86400):+d} seconds"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def delete_listing_urls(broker_id: str, profile_key: str, url: str = None):
+    query, params = "DELETE FROM listing_urls WHERE broker_id=? AND profile_key=?", [broker_id, profile_key]
+    if url:
+        query += " AND url=?"
+        params.append(url)
+    conn = get_db()
+    conn.execute(query, params)
+    conn.commit()
+    conn.close()
+
+
+# ── Exposures ──────────────────────────────────────────────────────────────────
+# Result of the latest scan per broker: status is listed | not_listed | unknown.
+
+def save_exposure(broker_id: str, profile_key: str, status: str, listing_url: str = None, notes: str = ""):
+    conn = get_db()
+    conn.execute(
+        """INSERT OR REPLACE INTO exposures
+               (broker_id, profile_key, status, listing_url, notes, checked_at)
+           VALUES (?, ?, ?, ?, ?, datetime('now'))""",
+        (broker_id, profile_key, status, listing_url, notes),
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_exposures(profile_key: str, since_days: float = None) -> dict:
+    """Latest scan result per broker for a profile (optionally only recent ones), keyed by broker_id."""
+    query, params = "SELECT * FROM exposures WHERE profile_key=?", [profile_key]
+    if since_days is not None:
+        query += " AND checked_at >= datetime('now', ?)"
+        params.append(f"-{int(since_days * 86400)} seconds")
+    conn = get_db()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return {r["broker_id"]: dict(r) for r in rows}
+
+
+# ── CAPTCHA sitekeys ───────────────────────────────────────────────────────────
+# Sitekey found on a broker page (origin + path), per kind: turnstile | recaptcha_v2.
+
+def get_sitekey(origin: str, path: str, kind: str) -> str | None:
+    conn = get_db()
+    row = conn.execute(
+        "SELECT sitekey FROM sitekeys WHERE origin=? AND path=? AND kind=?", (origin, path, kind)
+    ).fetchone()
+    conn.close()
+    return row["sitekey"] if row else None
+
+
+def save_sitekey(origin: str, path: str, kind: str, sitekey: str):
+    conn = get_db()
+    conn.execute(
+        """INSERT OR REPLACE INTO sitekeys (origin, path, kind, sitekey, seen_at)
+           VALUES (?, ?, ?, ?, datetime('now'))""",
+        (origin, path, kind, sitekey),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ── CAPTCHA solves ─────────────────────────────────────────────────────────────
+# One row per solve attempt: outcome solved | failed | timeout | over_budget,
+# solver latency and estimated cost (see capsolver_helper.SOLVE_PRICES).
+
+def record_captcha_solve(run_id, broker_id: str, profile_key: str, task_type: str,
+                         outcome: str, ms: int, cost: float):
+    conn = get_db()
+    conn.execute(
+        """INSERT INTO captcha_solves (run_id, broker_id, profile_key, task_type, outcome, ms, cost)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (run_id, broker_id, profile_key, task_type, outcome, ms, cost),
+    )
+    conn.commit()
+    conn.close()
+
+
+_CAPTCHA_TOTALS = """
+    COUNT(*) AS attempts, SUM(outcome = 'solved') AS solved,
+    SUM(outcome IN ('failed', 'timeout')) AS failed, SUM(outcome = 'over_budget') AS over_budget,
+    CAST(AVG(CASE WHEN outcome != 'over_budget' THEN ms END) AS INTEGER) AS avg_ms,
+    ROUND(COALESCE(SUM(cost), 0), 4) AS cost
+"""
+
+
+def get_captcha_totals(run_id=None, since_days: float = None) -> dict:
+    """Attempts, solved, failed, over_budget, avg_ms and cost — for one run or all."""
+    query = f"SELECT {_CAPTCHA_TOTALS} FROM captcha_solves WHERE 1=1"
+    params = []
+    if run_id:
+        query += " AND run_id=?"
+        params.append(run_id)
+    if since_days is not None:
+        query += " AND solved_at >= datetime('now', ?)"
+        params.append(f"-{int(since_days * 86400)} seconds")
+    conn = get_db()
+    row = conn.execute(query, params).fetchone()
+    conn.close()
+    return {k: row[k] or 0 for k in row.keys()}
+
+
+def get_captcha_stats(since_days: float = None) -> list:
+    """The totals per broker, highest cost first."""
+    query = f"SELECT broker_id, {_CAPTCHA_TOTALS} FROM captcha_solves"
+    params = []
+    if since_days is not None:
+        query += " WHERE solved_at >= datetime('now', ?)"
+        params.append(f"-{int(since_days * 86400)} seconds")
+    query += " GROUP BY broker_id ORDER BY cost DESC, attempts DESC"
+    conn = get_db()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+# ── Outbox ─────────────────────────────────────────────────────────────────────
+# Opt-out emails waiting for core/outbox.py to deliver them. status: queued →
+# sending → sent | failed; a failed attempt goes back to queued with a later
+# next_attempt_at. The request an email belongs to is linked once it exists
+# and gets its final status from whichever of link / delivery happens last.
+
+_DELIVERY_STATUS = {
+    "sent": ("submitted", "Opt-out email sent to {to_addr}"),
+    "failed": ("error", "SMTP error: {last_error}"),
+}
+
+
+def _apply_delivery(row):
+    if row and row["request_id"] and row["status"] in _DELIVERY_STATUS:
+        status, notes = _DELIVERY_STATUS[row["status"]]
+        update_request(row["request_id"], status, notes.format(**dict(row)))
+
+
+def enqueue_email(broker_id: str, to_addr: str, message: str) -> int:
+    conn = get_db()
+    cur = conn.execute(
+        "INSERT INTO outbox (broker_id, to_addr, message) VALUES (?, ?, ?)",
+        (broker_id, to_addr, message),
+    )
+    conn.commit()
+    conn.close()
+    return cur.lastrowid
+
+
+def link_outbox_request(outbox_id: int, request_id: int):
+    """Attach a queued email to its request; applies the outcome if it was already delivered."""
+    conn = get_db()
+    conn.execute("UPDATE outbox SET request_id=? WHERE id=?", (request_id, outbox_id))
+    row = conn.execute(
+        "SELECT request_id, status, to_addr, last_error FROM outbox WHERE id=?", (outbox_id,)
+    ).fetchone()
+    conn.commit()
+    conn.close()
+    _apply_delivery(row)
+
+
+def claim_email() -> dict | None:
+    """The oldest email due for an attempt, marked as sending — or None."""
+    conn = get_db()
+    try:
+        while True:
+            row = conn.execute(
+                "SELECT * FROM outbox WHERE status='queued' AND next_attempt_at <= datetime('now') "
+                "ORDER BY next_attempt_at, id LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+            claimed = conn.execute(
+                "UPDATE outbox SET status='sending', claimed_at=datetime('now') "
+                "WHERE id=? AND status='queued'",
+                (row["id"],),
+            ).rowcount
+            conn.commit()
+            if claimed:
+                return dict(row)
+    finally:
+        conn.close()
+
+
+def finish_email(outbox_id: int, status: str, error: str = None, retry_in: float = None):
+    """
+    Record an attempt: status "sent", or "failed" — which is final unless
+    retry_in (seconds) schedules another attempt.
+    """
+    conn = get_db()
+    if status == "sent":
+        conn.execute(
+            "UPDATE outbox SET status='sent', attempts=attempts+1, sent_at=datetime('now'), "
+            "last_error=NULL WHERE id=?",
+            (outbox_id,),
+        )
+    elif retry_in is not None:
+        conn.execute(
+            "UPDATE outbox SET status='queued', attempts=attempts+1, last_error=?, "
+            "next_attempt_at=datetime('now', ?) WHERE id=?",
+            (error, f"{int(retry_in):+d} seconds", outbox_id),
+        )
+    else:
+        conn.execute(
+            "UPDATE outbox SET status='failed', attempts=attempts+1, last_error=? WHERE id=?",
+            (error, outbox_id),
+        )
+    row = conn.execute(
+        "SELECT request_id, status, to_addr, last_error FROM outbox WHERE id=?", (outbox_id,)
+    ).fetchone()
+    conn.commit()
+    conn.close()
+    _apply_delivery(row)
+
+
+def requeue_stale_emails(older_than_seconds: float) -> int:
+    """Put emails left in 'sending' (the sender stopped mid-attempt) back in the queue."""
+    conn = get_db()
+    count = conn.execute(
+        "UPDATE outbox SET status='queued' WHERE status='sending' AND claimed_at < datetime('now', ?)",
+        (f"-{int(older_than_seconds)} seconds",),
+    ).rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+
+def next_email_due() -> float | None:
+    """Seconds until the next queued email is due (0 if one is due now), or None if none is queued."""
+    conn = get_db()
+    row = conn.execute(
+        "SELECT MAX(0, (julianday(MIN(next_attempt_at)) - julianday('now')) * 86400) AS wait "
+        "FROM outbox WHERE status='queued'"
+    ).fetchone()
+    conn.close()
+    return row["wait"]
+
+
+def get_outbox_counts() -> dict:
+    conn = get_db()
+    rows = conn.execute("SELECT status, COUNT(*) AS cnt FROM outbox GROUP BY status").fetchall()
+    conn.close()
+    return {r["status"]: r["cnt"] for r in rows}
+
+
+# ── Mail seen ──────────────────────────────────────────────────────────────────
+# Mailbox messages core/mail_ingest.py has dealt with, so each is read once.
+# outcome: confirmed | ignored | no_request
+
+def get_seen_mail_keys(source: str) -> set:
+    conn = get_db()
+    rows = conn.execute("SELECT msg_key FROM mail_seen WHERE source=?", (source,)).fetchall()
+    conn.close()
+    return {r["msg_key"] for r in rows}
+
+
+def mark_mail_seen(source: str, entries: list):
+    """entries: [{"msg_key", "broker_id", "request_id", "outcome"}]"""
+    if not entries:
+        return
+    conn = get_db()
+    conn.executemany(
+        """INSERT OR REPLACE INTO mail_seen (source, msg_key, broker_id, request_id, outcome)
+           VALUES (?, ?, ?, ?, ?)""",
+        [(source, e["msg_key"], e.get("broker_id"), e.get("request_id"), e["outcome"]) for e in entries],
+    )
+    conn.commit()
     conn.close()
-    return dict(row) if row else None
 
 
 # ── Snapshots ──────────────────────────────────────────────────────────────────
@@ -220,19 +1083,34 @@ def take_snapshot(label: str = "") -> int:
 
 def get_snapshots() -> list:
     conn = get_db()
-    rows = conn.execute(
+    rows = [dict(r) for r in conn.execute(
         "SELECT id, taken_at, label FROM snapshots ORDER BY taken_at DESC"
-    ).fetchall()
+    ).fetchall()]
     conn.close()
-    return [dict(r) for r in rows]
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        rows.extend(dict(r) for r in arc.execute(
+            "SELECT id, taken_at, label FROM snapshots ORDER BY taken_at DESC"
+        ).fetchall())
+        arc.close()
+    return rows
 
 
 def get_snapshot(snapshot_id: int) -> dict | None:
     conn = get_db()
     row = conn.execute("SELECT * FROM snapshots WHERE id=?", (snapshot_id,)).fetchone()
     conn.close()
-    if not row:
-        return None
-    result = dict(row)
-    result["data"] = json.loads(result["data"])
-    return result
+    if row:
+        result = dict(row)
+        result["data"] = json.loads(result["data"])
+        return result
+
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        row = arc.execute("SELECT * FROM snapshots WHERE id=?", (snapshot_id,)).fetchone()
+        arc.close()
+        if row:
+            result = dict(row)
+            result["data"] = json.loads(zlib.decompress(result["data"]))
+            return result
+    return None
@@ -0,0 +1,179 @@
+"""
+transfer.py — streaming export and batched import of tracker history.
+
+Exports walk a cursor over the hot database and then every monthly archive,
+yielding one NDJSON or CSV line at a time, so memory use does not grow with
+the size of the history. Imports insert in batched transactions and skip rows
+whose id already exists, in the hot database or in an archive, so re-importing
+the same file is harmless.
+"""
+import csv
+import io
+import json
+import zlib
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.tracker import get_db, get_archive_db, archive_paths
+
+EXPORT_COLUMNS = {
+    "requests": ["id", "broker_id", "broker_name", "submitted_at", "method", "status",
+                 "notes", "confirmed_at", "next_check_at", "run_id"],
+    "runs": ["id", "started_at", "completed_at", "total", "succeeded", "failed"],
+    "snapshots": ["id", "taken_at", "label", "data"],
+}
+
+ORDER_BY = {"requests": "submitted_at", "runs": "started_at", "snapshots": "taken_at"}
+
+FORMATS = ("ndjson", "csv")
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def iter_rows(table: str):
+    """Yield every row of `table` as a dict, hot database first, then archives."""
+    columns = EXPORT_COLUMNS[table]
+    query = f"SELECT {', '.join(columns)} FROM {table} ORDER BY {ORDER_BY[table]}"
+
+    conn = get_db()
+    try:
+        for row in conn.execute(query):
+            yield dict(row)
+    finally:
+        conn.close()
+
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        try:
+            for row in arc.execute(query):
+                row = dict(row)
+                if table == "snapshots" and row["data"] is not None:
+                    row["data"] = zlib.decompress(row["data"]).decode("utf-8")
+                yield row
+        finally:
+            arc.close()
+
+
+def export_lines(table: str, fmt: str = "ndjson"):
+    """Yield `table` serialized as NDJSON or CSV, one line at a time."""
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    if fmt == "ndjson":
+        for row in iter_rows(table):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_COLUMNS[table])
+    writer.writeheader()
+    for row in iter_rows(table):
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.getvalue():
+        yield buf.getvalue()
+
+
+def read_rows(fileobj, fmt: str = "ndjson"):
+    """Parse NDJSON or CSV from a text file object into dicts, lazily. A malformed NDJSON line yields None."""
+    if fmt == "csv":
+        for row in csv.DictReader(fileobj):
+            yield {k: (v if v != "" else None) for k, v in row.items()}
+        return
+    for line in fileobj:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+
+
+def _required_columns(conn, table: str) -> list:
+    """Export columns that are NOT NULL without a default (INSERT OR IGNORE would drop the row silently)."""
+    return [
+        r["name"] for r in conn.execute(f"PRAGMA table_info({table})")
+        if r["notnull"] and r["dflt_value"] is None and not r["pk"] and r["name"] in EXPORT_COLUMNS[table]
+    ]
+
+
+def _archived_ids(table: str, ids: list) -> set:
+    """Which of `ids` already live in a monthly archive."""
+    found = set()
+    if not ids:
+        return found
+    for path in archive_paths():
+        arc = get_archive_db(path)
+        try:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                found.update(r[0] for r in arc.execute(
+                    f"SELECT id FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk,
+                ))
+        finally:
+            arc.close()
+    return found
+
+
+def import_rows(table: str, rows, batch_size: int = IMPORT_BATCH_SIZE, log=None) -> dict:
+    """
+    Insert rows (dicts) into `table` in transactions of `batch_size`.
+    Unknown keys are ignored. Rows whose id exists in the hot database or an
+    archive are skipped; rows that aren't objects (None for a malformed line,
+    see read_rows) or miss a required column are counted as invalid.
+    Returns {"inserted", "skipped", "invalid"}.
+    """
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    columns = EXPORT_COLUMNS[table]
+    query = (
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+
+    conn = get_db()
+    counts = {"inserted": 0, "skipped": 0, "invalid": 0}
+    batch = []
+
+    def flush():
+        archived = _archived_ids(table, [r[0] for r in batch if r[0] is not None])
+        fresh = [r for r in batch if r[0] is None or r[0] not in archived]
+        with conn:
+            inserted = conn.executemany(query, fresh).rowcount if fresh else 0
+        counts["inserted"] += inserted
+        counts["skipped"] += len(batch) - inserted
+        if log:
+            log(f"Imported {counts['inserted']} {table} row(s)")
+        batch.clear()
+
+    try:
+        required = _required_columns(conn, table)
+        for n, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                counts["invalid"] += 1
+                if log:
+                    log(f"Skipped {table} row {n}: not a JSON object")
+                continue
+            missing = [c for c in required if row.get(c) is None]
+            if missing:
+                counts["invalid"] += 1
+                if log:
+                    log(f"Skipped {table} row {row.get('id')}: missing {', '.join(missing)}")
+                continue
+            if table == "snapshots" and not isinstance(row.get("data"), (str, type(None))):
+                row = {**row, "data": json.dumps(row["data"])}
+            batch.append(tuple(row.get(c) for c in columns))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        conn.close()
+    return counts
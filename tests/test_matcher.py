@@ -0,0 +1,48 @@
+"""Identity matching of search-result cards (brokers/handlers/matcher.py)."""
+from datetime import date
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from brokers.handlers.matcher import score_candidate, rank_candidates, location_matches
+
+AUSTIN = {"first_name": "John", "last_name": "Smith", "city": "Austin", "state": "TX"}
+FORT_WAYNE = {"first_name": "John", "last_name": "Smith", "city": "Fort Wayne", "state": "Indiana"}
+
+
+def card(text: str, url: str = "https://example.com/p/1") -> dict:
+    return {"index": 0, "url": url, "text": text}
+
+
+def test_namesake_elsewhere_is_not_a_match_without_dob_or_phone():
+    assert rank_candidates([card("John Smith\nPortland, OR")], AUSTIN) == []
+
+
+def test_same_name_and_city_is_a_match():
+    matches = rank_candidates([card("John Smith\nAustin, TX 78701")], AUSTIN)
+    assert [m["url"] for m in matches] == ["https://example.com/p/1"]
+
+
+def test_state_code_words_do_not_count_as_the_state():
+    text = "John Smith, 40\nLives in Portland, OR"
+    assert not location_matches(text, FORT_WAYNE)
+    assert score_candidate(text, FORT_WAYNE) < score_candidate("John Smith, 40\nGary, IN", FORT_WAYNE)
+    assert rank_candidates([card(text)], FORT_WAYNE) == []
+
+
+def test_state_code_in_an_address_counts():
+    assert location_matches("John Smith\nGary, IN 46402", FORT_WAYNE)
+    assert location_matches("John Smith\nFort Wayne IN", FORT_WAYNE)
+    assert location_matches("John Smith\nsomewhere IN 46402", FORT_WAYNE)
+    assert location_matches("John Smith\nIndianapolis, Indiana", FORT_WAYNE)
+
+
+def test_phone_or_age_corroborates_a_card_without_location():
+    profile = {**AUSTIN, "phone": "512-555-0142"}
+    assert rank_candidates([card("John Smith\n(512) 555-0142")], profile)
+    assert rank_candidates([card("John Smith\nPortland, OR")], profile) == []
+
+    profile = {**AUSTIN, "date_of_birth": f"{date.today().year - 40}-01-01"}
+    assert rank_candidates([card("John Smith\nAge 40")], profile)
+    assert rank_candidates([card("John Smith\nAge 71")], profile) == []
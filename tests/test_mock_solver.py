@@ -0,0 +1,66 @@
+"""The mock CAPTCHA backend (brokers/handlers/mock_solver.py) driven through the regular client."""
+import time
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import core.tracker as tracker
+from brokers.handlers import capsolver_helper
+from brokers.handlers.capsolver_helper import CapSolverClient, TURNSTILE, _solve, set_solver
+from brokers.handlers.mock_solver import MOCK_TOKEN_PREFIX, MockSolverServer, start_mock_solver
+
+
+@pytest.fixture(autouse=True)
+def fast_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracker, "DB_PATH", tmp_path / "tracker.db")
+    tracker.init_db()
+    monkeypatch.setattr(capsolver_helper, "FIRST_POLL_DEFAULT", 0.1)
+    monkeypatch.setattr(capsolver_helper, "FIRST_POLL_MIN", 0.1)
+    monkeypatch.setattr(capsolver_helper, "POLL_INTERVAL", 0.1)
+    yield
+    set_solver(None)
+
+
+def use_mock(**options):
+    url = start_mock_solver(latency=0.1, jitter=0, **options)
+    set_solver(CapSolverClient("mock", url, billed=False, max_wait=1.0))
+
+
+def outcomes() -> list:
+    with tracker.get_db() as conn:
+        return [r["outcome"] for r in conn.execute("SELECT outcome FROM captcha_solves")]
+
+
+def test_ready_task_returns_a_token():
+    use_mock()
+    assert _solve(TURNSTILE, "https://example.com/optout", "key").startswith(MOCK_TOKEN_PREFIX)
+    assert outcomes() == ["solved"]
+
+
+def test_failed_task_returns_none():
+    use_mock(failure_rate=1.0)
+    assert _solve(TURNSTILE, "https://example.com/optout", "key") is None
+    assert outcomes() == ["failed"]
+
+
+def test_never_finishing_task_times_out():
+    use_mock(timeout_rate=1.0)
+    started = time.monotonic()
+    assert _solve(TURNSTILE, "https://example.com/optout", "key") is None
+    assert time.monotonic() - started < 3
+    assert outcomes() == ["timeout"]
+
+
+def test_abandoned_tasks_expire():
+    server = MockSolverServer(("127.0.0.1", 0), latency=0.1, jitter=0, timeout_rate=1.0, task_ttl=0.2)
+    try:
+        first = server.create({"type": TURNSTILE, "websiteKey": "key"})["taskId"]
+        assert server.result(first)["status"] == "processing"
+        time.sleep(0.3)
+        server.create({"type": TURNSTILE, "websiteKey": "key"})
+        assert first not in server.tasks and len(server.tasks) == 1
+    finally:
+        server.server_close()